@@ -1,15 +1,39 @@
+import os
+import threading
+import time
 import uno
+import unohelper
+from com.sun.star.awt import XCallback
 from com.sun.star.awt.MessageBoxButtons import BUTTONS_OK
+from com.sun.star.beans import PropertyValue
 from com.sun.star.awt.MessageBoxType import ERRORBOX, INFOBOX
+from com.sun.star.util import XModifyListener
+from bookmark_ids import BookmarkIdTable
+from bookmark_names import COMPLETION_MARKER, NAME_INDEXES, BookmarkNameIndex, check_parent_name
+from document_changes import DOCUMENT_CHANGES, NAMES
+from hyperlinks import iter_portions, relative_links_enabled
+from notes_index import NotesIndex, workspace_root_for
+from edit_plan import (CONTENTS_SUFFIX, PLAN_CACHE, EditPlanExecutor, ParagraphSnapshot, document_key,
+                       plan_key, plan_bidirectional_link, plan_cross_document_link, title_of)
+
+# Auto-linkers of the documents where live auto-linking is switched on.
+_AUTO_LINKERS = {}
+# Seconds without an edit after which the auto-linker looks at the text.
+AUTO_LINK_IDLE = 0.8
 
 # --- Bidirectional Link Manager Class ---
 class BidirectionalLinkManager:
-    def __init__(self):
+    def __init__(self, relative_links=None):
         self.doc = XSCRIPTCONTEXT.getDocument()
         self.text = self.doc.Text
         self.view_cursor = self.doc.CurrentController.getViewCursor()
         self.ctx = XSCRIPTCONTEXT.getComponentContext()
         self.smgr = self.ctx.ServiceManager
+        self.id_table = None
+        # Set by with_short_ids: bookmarks are then named by their readable paths in prompts.
+        self.short_ids = False
+        # None follows the document's link mode (see hyperlinks.relative_links_enabled).
+        self.relative_links = relative_links_enabled(self.doc) if relative_links is None else relative_links
 
     def show_message(self, message, title="Message", boxtype=INFOBOX):
         """
@@ -53,75 +77,81 @@ class BidirectionalLinkManager:
             raise Exception("Colon not found in selection")
         return selected_text[:colon_index].strip()
 
+    def get_id_table(self):
+        """
+        Returns the short bookmark ID table of the (saved) document, loading it on first use.
+        """
+        if self.id_table is None:
+            if not self.doc.URL:
+                self.show_message("Please save the document before using short bookmark IDs.",
+                                  "Save Required", boxtype=ERRORBOX)
+                raise Exception("Document not saved")
+            self.id_table = BookmarkIdTable.for_document(uno.fileUrlToSystemPath(self.doc.URL))
+        return self.id_table
+
+    def link_base(self):
+        """
+        Returns the URL placed before "#bookmark" in intra-document links:
+        empty for fragment-only links, otherwise the document URL.
+        """
+        return "" if self.relative_links else self.doc.URL
+
+    def prompt_existing_bookmark(self, prompt, title):
+        """
+        Prompts for the name of an existing bookmark with completion:
+        a unique prefix is completed, an ambiguous one (or an answer ending
+        in "*") lists the candidates and asks again, and an unknown name is
+        refused with the closest existing names, so a typo cannot start a
+        disconnected hierarchy. Returns "" if the user leaves it blank.
+        With short IDs the names are checked as the readable paths of the
+        ID table, and the path is returned.
+        """
+        index = NAME_INDEXES.get(document_key(self.doc), self.doc,
+                                 verify=DOCUMENT_CHANGES.watch(self.doc).changed(NAMES))
+        if self.short_ids:
+            index = BookmarkNameIndex(self.get_id_table().readable_names(index.names))
+        hint = f"{prompt}\n(end with {COMPLETION_MARKER} to list completions)"
+        default_value = ""
+        for _ in range(10):
+            value = self.get_input_with_default(hint, title, default_value)
+            if not value:
+                return ""
+            wants_list = value.endswith(COMPLETION_MARKER)
+            status, candidates = check_parent_name(index, value)
+            if status in ("exact", "complete") and not wants_list:
+                return candidates[0]
+            stem = value.rstrip(COMPLETION_MARKER).rstrip()
+            if status == "unknown":
+                hint = f"No bookmark named \"{stem}\".\nClosest existing bookmarks:\n" + "\n".join(candidates)
+                default_value = ""
+            else:
+                hint = f"Bookmarks starting with \"{stem}\":\n" + "\n".join(index.completions(stem, limit=15))
+                default_value = index.extend_prefix(stem)
+        return ""
+
     def bookmark_exists(self, name):
         """
         Checks if a bookmark with the given name already exists.
         """
         return self.doc.getBookmarks().hasByName(name)
 
-    def create_main_bookmark(self, clean_title, main_bookmark):
+    def remove_bookmark(self, name):
         """
-        Creates the main bookmark covering the clean_title in the current paragraph.
+        Removes the bookmark called name (not the text it covers), if it exists.
         """
-        line_cursor = self.text.createTextCursorByRange(self.view_cursor.getStart())
-        line_cursor.gotoStartOfParagraph(False)
-        if not line_cursor.goRight(len(clean_title), True):
-            self.show_message("Error selecting the title text.", "Error", boxtype=ERRORBOX)
-            raise Exception("Error selecting title text")
-        main_bm_obj = self.doc.createInstance("com.sun.star.text.Bookmark")
-        main_bm_obj.Name = main_bookmark
-        self.text.insertTextContent(line_cursor, main_bm_obj, True)
-
-    def apply_marker_hyperlink(self, clean_title, toc_bookmark, replacement_char):
-        """
-        Applies a hyperlink on the marker immediately following the clean_title.
-        If replacement_char is not the default colon, it replaces the marker.
-        """
-        marker_cursor = self.text.createTextCursorByRange(self.view_cursor.getStart())
-        if marker_cursor.goRight(len(clean_title), False) and marker_cursor.goRight(1, True):
-            marker_text = marker_cursor.getString()
-            if marker_text == ":":
-                # Replace colon with alternate character if needed
-                if replacement_char != ":":
-                    marker_cursor.String = replacement_char
-                full_doc_url = self.doc.URL
-                # if not full_doc_url:
-                #     self.show_message("Please save the document before running this macro.",
-                #                       "Save Required", boxtype=ERRORBOX)
-                #     raise Exception("Document not saved")
-                marker_cursor.HyperLinkURL = full_doc_url + "#" + toc_bookmark
-                marker_cursor.HyperLinkName = toc_bookmark
-                marker_cursor.HyperLinkTarget = ""
-        else:
-            self.show_message("Error applying hyperlink to marker.", "Error", boxtype=ERRORBOX)
-            raise Exception("Error in marker hyperlink")
-
-    def insert_navigation_line(self, clean_title, main_bookmark, toc_bookmark):
-        """
-        Inserts a navigation line above the original paragraph that displays the clean title.
-        Applies a hyperlink (linking back to the main bookmark) and adds a TOC bookmark.
-        """
-        insert_cursor = self.text.createTextCursorByRange(self.view_cursor.getStart())
-        insert_cursor.gotoStartOfParagraph(False)
-        navigation_line = clean_title + chr(13)
-        self.text.insertString(insert_cursor, navigation_line, False)
-        if not insert_cursor.goLeft(len(navigation_line), True):
-            self.show_message("Error selecting the inserted navigation text.", "Error", boxtype=ERRORBOX)
-            raise Exception("Error selecting navigation text")
-        insert_cursor.collapseToStart()
-        if not insert_cursor.goRight(len(clean_title), True):
-            self.show_message("Error refining the selection for the navigation text.", "Error", boxtype=ERRORBOX)
-            raise Exception("Error refining navigation text")
-        full_doc_url = self.doc.URL
-        if not full_doc_url:
-            self.show_message("Please save the document before running this macro.",
-                              "Save Required", boxtype=ERRORBOX)
-            raise Exception("Document not saved")
-        insert_cursor.HyperLinkURL = full_doc_url + "#" + main_bookmark
+        bookmarks = self.doc.getBookmarks()
+        if bookmarks.hasByName(name):
+            self.text.removeTextContent(bookmarks.getByName(name))
 
-        toc_bm_obj = self.doc.createInstance("com.sun.star.text.Bookmark")
-        toc_bm_obj.Name = toc_bookmark
-        self.text.insertTextContent(insert_cursor, toc_bm_obj, True)
+    def snapshot_current_paragraph(self):
+        """
+        Returns (paragraph, snapshot) for the paragraph holding the start of the selection.
+        """
+        para_cursor = self.text.createTextCursorByRange(self.view_cursor.getStart())
+        para_cursor.gotoStartOfParagraph(False)
+        para_cursor.gotoEndOfParagraph(True)
+        paragraph = para_cursor.createEnumeration().nextElement()
+        return paragraph, ParagraphSnapshot(0, paragraph.getString())
 
     def process_link(self, naming_strategy, replacement_char=":"):
         """
@@ -129,10 +159,11 @@ class BidirectionalLinkManager:
          1. Validate selection and extract clean title.
          2. Use the provided naming_strategy to generate bookmark names.
          3. Check for existing bookmarks.
-         4. Create the main bookmark, apply the marker hyperlink,
-            and insert the navigation line with the TOC bookmark.
+         4. Plan the main bookmark, the marker hyperlink and the navigation
+            line with the TOC bookmark, then apply the plan in one batch.
          5. Notify the user on success.
         The replacement_char parameter lets you customize the marker (e.g. "↑").
+        With relative_links, the hyperlinks are fragment-only ("#bookmark").
         """
         try:
             clean_title = self.get_selected_clean_title()
@@ -149,14 +180,202 @@ class BidirectionalLinkManager:
                               "Bookmark Exists", boxtype=ERRORBOX)
             return
 
+        full_doc_url = self.link_base()
+        if not full_doc_url and not self.relative_links:
+            self.show_message("Please save the document before running this macro.",
+                              "Save Required", boxtype=ERRORBOX)
+            return
+
+        paragraph, snapshot = self.snapshot_current_paragraph()
+        key = plan_key("bidirectional_link", [snapshot], clean_title=clean_title, main=main_bookmark,
+                       toc=toc_bookmark, doc_url=full_doc_url, replacement_char=replacement_char)
+        plan = PLAN_CACHE.get_or_build(key, lambda: plan_bidirectional_link(
+            snapshot, clean_title, main_bookmark, toc_bookmark, full_doc_url, replacement_char))
+        executor = EditPlanExecutor(self.doc)
+        executor.apply(plan, [paragraph], undo_title="Bi-directional link")
+        if executor.skipped:
+            self.show_message("Error selecting the title text.", "Error", boxtype=ERRORBOX)
+            return
+        PLAN_CACHE.mark_applied(document_key(self.doc), key)
+        if self.id_table is not None:
+            self.id_table.save()
+
+        self.show_message(success_msg, "Success", boxtype=INFOBOX)
+
+    def auto_link_paragraph(self, cursor):
+        """
+        Links the paragraph holding cursor like custom_bidirectional_link
+        (bookmarks named after the title) if it is a bare "Title:" line: no
+        leading blanks, a single colon at the end, and no bookmark or
+        hyperlink yet. Reads and edits only that paragraph.
+        Returns True if a link was created.
+        """
+        cursor.gotoStartOfParagraph(False)
+        cursor.gotoEndOfParagraph(True)
+        paragraph = cursor.createEnumeration().nextElement()
+        line = paragraph.getString()
+        clean_title = title_of(line)
+        if not clean_title or line != line.lstrip() or line.count(":") != 1 or not line.rstrip().endswith(":"):
+            return False
+        main_bookmark, toc_bookmark = clean_title, clean_title + CONTENTS_SUFFIX
+        if self.bookmark_exists(main_bookmark) or self.bookmark_exists(toc_bookmark):
+            return False
+        for portion in iter_portions(paragraph):
+            if portion.TextPortionType == "Bookmark" or portion.HyperLinkURL:
+                return False
+
+        full_doc_url = self.link_base()
+        snapshot = ParagraphSnapshot(0, line)
+        key = plan_key("bidirectional_link", [snapshot], clean_title=clean_title, main=main_bookmark,
+                       toc=toc_bookmark, doc_url=full_doc_url, replacement_char=":")
+        plan = PLAN_CACHE.get_or_build(key, lambda: plan_bidirectional_link(
+            snapshot, clean_title, main_bookmark, toc_bookmark, full_doc_url))
+        executor = EditPlanExecutor(self.doc)
+        executor.apply(plan, [paragraph], undo_title=f"Auto link {clean_title}")
+        if executor.skipped:
+            return False
+        PLAN_CACHE.mark_applied(document_key(self.doc), key)
+        return True
+
+    # --- Cross-document links ---
+    def get_workspace_root(self, doc_path):
+        """
+        Returns the notes root (see notes_index.workspace_root_for), asking
+        for the notes folder the first time; None if none was given.
+        """
+        return workspace_root_for(doc_path, ask=lambda suggestion: self.get_input_with_default(
+            "Folder that holds all your notes (asked once)", "Notes Folder", suggestion))
+
+    def resolve_target_bookmark(self, index, prefix, exclude_path):
+        """
+        Resolves a typed prefix to a (bookmark, document path) pair through a
+        prefix search over the workspace index, asking the user to refine the
+        prefix while it is ambiguous. Bookmarks of exclude_path are ignored.
+        """
+        for _ in range(5):
+            matches = [m for m in index.bookmarks_with_prefix(prefix, limit=40) if m[1] != exclude_path]
+            if not matches:
+                self.show_message(f"No bookmark in the notes starts with:\n{prefix}",
+                                  "Bookmark Not Found", boxtype=ERRORBOX)
+                raise Exception("Target bookmark not found")
+            exact = [m for m in matches if m[0] == prefix]
+            if exact or len(matches) == 1:
+                return (exact or matches)[0]
+            listing = "\n".join(f"{name}   ({os.path.basename(path)})" for name, path in matches[:15])
+            prefix = self.get_input_with_default(f"Several bookmarks match. Refine the name:\n{listing}",
+                                                 "Target Bookmark", matches[0][0])
+        raise Exception("Target bookmark still ambiguous")
+
+    def open_target_document(self, target_url):
+        """
+        Returns (document, opened_hidden): an already open document with
+        target_url, or the document loaded hidden in the background.
+        """
+        desktop = self.smgr.createInstanceWithContext("com.sun.star.frame.Desktop", self.ctx)
+        components = desktop.getComponents().createEnumeration()
+        while components.hasMoreElements():
+            component = components.nextElement()
+            if getattr(component, "URL", None) == target_url:
+                return component, False
+        hidden = PropertyValue()
+        hidden.Name = "Hidden"
+        hidden.Value = True
+        return desktop.loadComponentFromURL(target_url, "_blank", 0, (hidden,)), True
+
+    def insert_return_link(self, target_doc, target_bookmark, label, url):
+        """
+        Inserts a new paragraph holding label right after the paragraph of
+        target_bookmark in target_doc, hyperlinked to url.
+        """
+        anchor = target_doc.getBookmarks().getByName(target_bookmark).getAnchor()
+        text = anchor.getText()
+        cursor = text.createTextCursorByRange(anchor.getEnd())
+        cursor.gotoEndOfParagraph(False)
+        text.insertString(cursor, chr(13) + label, False)
+        cursor.goLeft(len(label), True)
+        cursor.setPropertyValues(("HyperLinkName", "HyperLinkTarget", "HyperLinkURL"), (label, "", url))
+
+    def process_cross_document_link(self, replacement_char=":"):
+        """
+        Links the selected "Title:" heading to a bookmark in another document
+        of the notes workspace and adds the return link in that document:
+         1. Refresh the workspace index (only changed files are re-parsed).
+         2. Resolve the target bookmark by prefix search over the index.
+         3. Bookmark the title here and check that the bookmark exists.
+         4. Open the target (hidden, unless it is already open), insert the
+            return link below the target bookmark, then store and close it.
+            If that fails, the bookmark of step 3 is removed again.
+         5. Link the title's marker to the target.
+        """
+        if not self.doc.URL:
+            self.show_message("Please save the document before running this macro.",
+                              "Save Required", boxtype=ERRORBOX)
+            return
         try:
-            self.create_main_bookmark(clean_title, main_bookmark)
-            self.apply_marker_hyperlink(clean_title, toc_bookmark, replacement_char)
-            self.insert_navigation_line(clean_title, main_bookmark, toc_bookmark)
+            clean_title = self.get_selected_clean_title()
+            main_bookmark, _, _ = naming_strategy_custom(self, clean_title)
         except Exception:
             return
+        if self.bookmark_exists(main_bookmark):
+            self.show_message("Bookmark name already exists. Please choose a different name.",
+                              "Bookmark Exists", boxtype=ERRORBOX)
+            return
 
-        self.show_message(success_msg, "Success", boxtype=INFOBOX)
+        doc_path = uno.fileUrlToSystemPath(self.doc.URL)
+        root = self.get_workspace_root(doc_path)
+        if root is None:
+            return
+        with NotesIndex(root) as index:
+            try:
+                index.update(parallel="thread")
+            except ValueError as e:
+                self.show_message(str(e), "Notes Folder", boxtype=ERRORBOX)
+                return
+            prefix = self.get_input_with_default("Enter the start of the target bookmark name",
+                                                 "Target Bookmark", "")
+            if not prefix:
+                return
+            try:
+                target_bookmark, target_path = self.resolve_target_bookmark(index, prefix, doc_path)
+            except Exception:
+                return
+
+        target_url = uno.systemPathToFileUrl(target_path)
+        forward_url = target_url + "#" + target_bookmark
+        # Links between documents stay absolute in relative link mode too:
+        # Writer would resolve a "../" link against the wrong folder until
+        # the documents are reopened (see hyperlinks).
+        return_url = self.doc.URL + "#" + main_bookmark
+
+        paragraph, snapshot = self.snapshot_current_paragraph()
+        bookmark_plan, marker_plan = plan_cross_document_link(snapshot, clean_title, main_bookmark,
+                                                              target_bookmark, forward_url, replacement_char)
+        executor = EditPlanExecutor(self.doc)
+        # The local bookmark comes first: the return link must never point at a bookmark that is not there.
+        executor.apply(bookmark_plan, [paragraph], undo_title="Cross-document link")
+        if executor.skipped or not self.bookmark_exists(main_bookmark):
+            self.show_message(f"The bookmark \"{main_bookmark}\" could not be created.", "Error", boxtype=ERRORBOX)
+            return
+        try:
+            target_doc, opened_hidden = self.open_target_document(target_url)
+            try:
+                if not target_doc.getBookmarks().hasByName(target_bookmark):
+                    raise LookupError(f"The bookmark no longer exists in:\n{target_path}")
+                self.insert_return_link(target_doc, target_bookmark, f"↩ {clean_title}", return_url)
+                if opened_hidden:
+                    target_doc.store()
+            finally:
+                if opened_hidden:
+                    target_doc.close(True)
+        except Exception as e:
+            # Nothing links to the new bookmark yet, so it is taken out again.
+            self.remove_bookmark(main_bookmark)
+            self.show_message(f"{e}\n\nNo link was created.", "Return Link Failed", boxtype=ERRORBOX)
+            return
+
+        executor.apply(marker_plan, [paragraph], undo_title="Cross-document link")
+        self.show_message(f"✅ Linked to {target_bookmark} in {os.path.basename(target_path)}",
+                          "Success", boxtype=INFOBOX)
 
 
 # --- Naming Strategies (Strategy Pattern) ---
@@ -175,8 +394,8 @@ def naming_strategy_parent(manager, clean_title):
     """Naming strategy for bidirectional_link_with_parent:
        Prompts for a parent bookmark and prepends it to the clean title.
     """
-    parent_bm = manager.get_input_with_default("Enter the name of the parent bookmark",
-                                                "Parent Bookmark", "")
+    parent_bm = manager.prompt_existing_bookmark("Enter the name of the parent bookmark",
+                                                 "Parent Bookmark")
     if not parent_bm:
         manager.show_message("Parent bookmark name cannot be empty.",
                              "Input Error", boxtype=ERRORBOX)
@@ -199,6 +418,111 @@ def naming_strategy_custom(manager, clean_title):
     toc_bookmark = main_bookmark + " Contents"
     return main_bookmark, toc_bookmark, f"✅ Bi-directional link created for: {main_bookmark}"
 
+def with_short_ids(naming_strategy):
+    """Wraps a naming strategy so the document stores a short hash-based ID
+       instead of the full name. The full name is kept in the side table,
+       and the TOC bookmark becomes "{id} Contents".
+    """
+    def strategy(manager, clean_title):
+        manager.short_ids = True
+        main_bookmark, _, success_msg = naming_strategy(manager, clean_title)
+        main_id = manager.get_id_table().id_for(main_bookmark)
+        return main_id, main_id + " Contents", success_msg + f" ({main_id})"
+    return strategy
+
+
+# --- Live auto-linking ---
+class AutoLinker(unohelper.Base, XModifyListener, XCallback):
+    """
+    Watches the edits of one document. A keystroke only records its time;
+    once the document has been idle for AUTO_LINK_IDLE seconds, a timer
+    hands over to an AsyncCallback, which runs after the modify
+    notification has returned (so the document is not changed from inside
+    its own event) and looks at where the cursor is. If it has moved to
+    another paragraph since the last look, the paragraph just finished is
+    linked: the one before the cursor (Enter at the end of a "Title:"
+    line), or the one edited at the last look if the cursor jumped away.
+    """
+    def __init__(self, manager):
+        self.manager = manager
+        self.key = document_key(manager.doc)
+        self.pending = None
+        self.busy = False
+        self.last_edit = 0.0
+        self.timer = None
+        self.lock = threading.Lock()
+        self.async_callback = manager.smgr.createInstanceWithContext("com.sun.star.awt.AsyncCallback",
+                                                                      manager.ctx)
+
+    def modified(self, event):
+        if self.busy:
+            return
+        self.last_edit = time.monotonic()
+        with self.lock:
+            if self.timer is None:
+                self.start_timer(AUTO_LINK_IDLE)
+
+    def start_timer(self, delay):
+        self.timer = threading.Timer(delay, self.on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def on_timer(self):
+        with self.lock:
+            if self.timer is None:
+                return  # cancelled
+            remaining = self.last_edit + AUTO_LINK_IDLE - time.monotonic()
+            if remaining > 0:
+                self.start_timer(remaining)
+                return
+            self.timer = None
+        self.async_callback.addCallback(self, None)
+
+    def cancel(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+    def finished_paragraphs(self):
+        """
+        Returns cursors at the paragraphs finished since the last look, and
+        remembers the cursor's paragraph for the next one.
+        """
+        manager = self.manager
+        if manager.doc.hasControllersLocked():
+            return []
+        try:
+            cursor = manager.text.createTextCursorByRange(manager.view_cursor.getStart())
+        except Exception:  # the view cursor is in a header, frame, ...
+            return []
+        cursor.gotoStartOfParagraph(False)
+        pending, self.pending = self.pending, cursor
+        if pending is None or manager.text.compareRegionStarts(cursor, pending) == 0:
+            return []  # still typing in the same paragraph
+        finished = []
+        previous = manager.text.createTextCursorByRange(cursor)
+        if previous.gotoPreviousParagraph(False):
+            finished.append(previous)
+        if not finished or manager.text.compareRegionStarts(previous, pending) != 0:
+            finished.append(pending)
+        return finished
+
+    def notify(self, data):
+        self.busy = True
+        try:
+            for cursor in self.finished_paragraphs():
+                self.manager.auto_link_paragraph(cursor)
+        except Exception as e:
+            # Never let a failed link interrupt typing.
+            print(f"Auto link skipped: {e}")
+        finally:
+            self.busy = False
+
+    def disposing(self, event):
+        self.cancel()
+        _AUTO_LINKERS.pop(self.key, None)
+
 
 # --- Module-level API Functions ---
 def bidirectional_link():
@@ -236,3 +560,45 @@ def custom_bidirectional_link_for_code():
     """
     manager = BidirectionalLinkManager()
     manager.process_link(naming_strategy_custom, replacement_char="↑")
+
+def bidirectional_link_with_parent_short_ids():
+    """
+    Function:
+        - Same as bidirectional_link_with_parent, but stores a short hash-based bookmark ID
+        - in the document and the full hierarchical name in <document>.bookmarks.json.
+    """
+    manager = BidirectionalLinkManager()
+    manager.process_link(with_short_ids(naming_strategy_parent), replacement_char=":")
+
+def cross_document_bidirectional_link():
+    """
+    Function:
+        - Links the selected heading to a bookmark in another note (found by prefix search over
+        - the workspace index) and adds the return link in that note.
+    """
+    manager = BidirectionalLinkManager()
+    manager.process_cross_document_link(replacement_char=":")
+
+def toggle_auto_bidirectional_links():
+    """
+    Function:
+        - Switches live auto-linking on or off for the current document: every "Title:" line
+        - gets its bookmark pair and marker hyperlink (named after the title) at the first pause
+        - in typing after the cursor has moved on to another paragraph.
+    """
+    manager = BidirectionalLinkManager()
+    linker = _AUTO_LINKERS.pop(document_key(manager.doc), None)
+    if linker is not None:
+        manager.doc.removeModifyListener(linker)
+        linker.cancel()
+        manager.show_message("Live auto-linking is off.", "Auto Links")
+        return
+    if not manager.link_base() and not manager.relative_links:
+        manager.show_message("Please save the document before running this macro.",
+                             "Save Required", boxtype=ERRORBOX)
+        return
+    linker = AutoLinker(manager)
+    manager.doc.addModifyListener(linker)
+    _AUTO_LINKERS[linker.key] = linker
+    manager.show_message("Live auto-linking is on: finished \"Title:\" lines are linked automatically.",
+                         "Auto Links")
@@ -0,0 +1,138 @@
+import unohelper
+from com.sun.star.awt import XActionListener, XTextListener
+from com.sun.star.awt.MessageBoxButtons import BUTTONS_OK
+from com.sun.star.awt.MessageBoxType import ERRORBOX, INFOBOX
+from bookmark_names import NAME_INDEXES
+from bookmark_search import TRIGRAM_INDEXES
+from document_changes import DOCUMENT_CHANGES, NAMES
+from edit_plan import document_key
+
+# com.sun.star.awt.PushButtonType values (the model property is a plain short).
+PUSH_OK = 1
+PUSH_CANCEL = 2
+
+
+# --- Dialog listeners ---
+class QueryListener(unohelper.Base, XTextListener):
+    """
+    Re-ranks the result list on every keystroke in the query field.
+    """
+    def __init__(self, navigator):
+        self.navigator = navigator
+
+    def textChanged(self, event):
+        self.navigator.refresh_results(event.Source.getText())
+
+    def disposing(self, event):
+        pass
+
+
+class ResultActivateListener(unohelper.Base, XActionListener):
+    """
+    Closes the dialog with OK when a result is double-clicked.
+    """
+    def __init__(self, dialog):
+        self.dialog = dialog
+
+    def actionPerformed(self, event):
+        self.dialog.endDialog(1)
+
+    def disposing(self, event):
+        pass
+
+
+# --- Bookmark Navigator Class ---
+class BookmarkNavigator:
+    def __init__(self):
+        self.doc = XSCRIPTCONTEXT.getDocument()
+        self.view_cursor = self.doc.CurrentController.getViewCursor()
+        self.ctx = XSCRIPTCONTEXT.getComponentContext()
+        self.smgr = self.ctx.ServiceManager
+        self.dialog = None
+        self.results = []
+        doc_key = document_key(self.doc)
+        verify = DOCUMENT_CHANGES.watch(self.doc).changed(NAMES)
+        self.index = TRIGRAM_INDEXES.get(doc_key, NAME_INDEXES.get(doc_key, self.doc, verify=verify))
+
+    def show_message(self, message, title="Message", boxtype=INFOBOX):
+        """
+        Displays a message box.
+        """
+        frame = self.doc.CurrentController.Frame
+        container_window = frame.ContainerWindow
+        toolkit = self.smgr.createInstance("com.sun.star.awt.Toolkit")
+        box = toolkit.createMessageBox(container_window, boxtype, BUTTONS_OK, title, message)
+        box.execute()
+
+    def add_control(self, model, kind, name, x, y, width, height, **properties):
+        control = model.createInstance(f"com.sun.star.awt.UnoControl{kind}Model")
+        control.PositionX, control.PositionY, control.Width, control.Height = x, y, width, height
+        for key, value in properties.items():
+            setattr(control, key, value)
+        model.insertByName(name, control)
+
+    def create_dialog(self):
+        """
+        Builds the navigator dialog: a query field, a live result list and
+        Go / Cancel buttons.
+        """
+        model = self.smgr.createInstanceWithContext("com.sun.star.awt.UnoControlDialogModel", self.ctx)
+        model.Width, model.Height = 260, 190
+        model.Title = f"Go to Bookmark ({len(self.index.names)} bookmarks)"
+        self.add_control(model, "Edit", "query", 6, 6, 248, 14)
+        self.add_control(model, "ListBox", "results", 6, 24, 248, 142)
+        self.add_control(model, "Button", "go", 148, 172, 50, 14, Label="Go", PushButtonType=PUSH_OK,
+                         DefaultButton=True)
+        self.add_control(model, "Button", "cancel", 204, 172, 50, 14, Label="Cancel", PushButtonType=PUSH_CANCEL)
+
+        dialog = self.smgr.createInstanceWithContext("com.sun.star.awt.UnoControlDialog", self.ctx)
+        dialog.setModel(model)
+        dialog.createPeer(self.smgr.createInstance("com.sun.star.awt.Toolkit"), None)
+        dialog.getControl("query").addTextListener(QueryListener(self))
+        dialog.getControl("results").addActionListener(ResultActivateListener(dialog))
+        return dialog
+
+    def refresh_results(self, query):
+        """
+        Replaces the result list with the best fuzzy matches for query.
+        """
+        self.results = [name for _, name in self.index.search(query, limit=30)]
+        results = self.dialog.getControl("results")
+        results.removeItems(0, results.getItemCount())
+        if self.results:
+            results.addItems(tuple(self.results), 0)
+            results.selectItemPos(0, True)
+
+    def go_to_bookmark(self, name):
+        """
+        Moves the view cursor to the start of bookmark name.
+        """
+        bookmarks = self.doc.getBookmarks()
+        if not bookmarks.hasByName(name):
+            self.show_message(f"Bookmark not found: {name}", "Go to Bookmark", boxtype=ERRORBOX)
+            return
+        self.view_cursor.gotoRange(bookmarks.getByName(name).getAnchor().getStart(), False)
+
+    def run(self):
+        if not self.index.names:
+            self.show_message("This document has no bookmarks.", "Go to Bookmark")
+            return
+        self.dialog = self.create_dialog()
+        try:
+            if self.dialog.execute() != 1:
+                return
+            selected = self.dialog.getControl("results").getSelectedItem()
+        finally:
+            self.dialog.dispose()
+        if selected or self.results:
+            self.go_to_bookmark(selected or self.results[0])
+
+
+# --- Module-level API Functions ---
+def go_to_bookmark():
+    """
+    Function:
+        - Fuzzy "go to bookmark": type any part of a bookmark name (typos allowed), pick
+        - from the live-ranked list and jump there.
+    """
+    BookmarkNavigator().run()
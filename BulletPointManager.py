@@ -1,7 +1,15 @@
+import os
 import uno
 from com.sun.star.awt.MessageBoxButtons import BUTTONS_OK
 from com.sun.star.awt.MessageBoxType import ERRORBOX, INFOBOX
-from com.sun.star.awt.FontWeight import BOLD
+from bookmark_ids import BookmarkIdTable
+from bookmark_names import COMPLETION_MARKER, NAME_INDEXES, BookmarkNameIndex
+from document_changes import DOCUMENT_CHANGES, NAMES
+from hyperlinks import iter_paragraphs, iter_portions, relative_links_enabled, to_relative_url
+from outline import DEFAULT_LIST_STYLE, OutlineItem, plan_outline_import, read_outline, write_outline
+from edit_plan import (LEVEL_MISMATCH, PLAN_CACHE, EditPlanExecutor, ParagraphSnapshot, build_bookmark_chain,
+                       describe_plan, diff_plans, document_key, levels_match_lines, plan_key,
+                       plan_nested_bookmark_summary, plan_title_styles, title_of)
 """
 Summary
 Helper Functions:
@@ -23,7 +31,7 @@ Each of these functions works together to enable dynamic creation of nested book
 """
 
 class BulletPointManager:
-    def __init__(self, doc=None):
+    def __init__(self, doc=None, relative_links=None):
         # Use the provided document or get it from the global XSCRIPTCONTEXT.
         self.doc = doc if doc is not None else XSCRIPTCONTEXT.getDocument()
         self.text = self.doc.Text
@@ -31,6 +39,8 @@ class BulletPointManager:
         self.view_cursor = self.controller.getViewCursor()
         self.ctx = XSCRIPTCONTEXT.getComponentContext()
         self.smgr = self.ctx.ServiceManager
+        # None follows the document's link mode (see hyperlinks.relative_links_enabled).
+        self.relative_links = relative_links_enabled(self.doc) if relative_links is None else relative_links
 
     def show_message(self, message, title="Message", boxtype=INFOBOX):
         """
@@ -42,6 +52,13 @@ class BulletPointManager:
         box = toolkit.createMessageBox(container_window, boxtype, BUTTONS_OK, title, message)
         box.execute()
 
+    def link_base(self):
+        """
+        Returns the URL placed before "#bookmark" in intra-document links:
+        empty for fragment-only links, otherwise the document URL.
+        """
+        return "" if self.relative_links else self.doc.URL
+
     def get_paragraphs_within_range(self, text_range):
         """
         Returns a list of paragraphs (elements that support the
@@ -55,6 +72,44 @@ class BulletPointManager:
                 paragraphs.append(element)
         return paragraphs
 
+    def get_selected_paragraphs(self):
+        """
+        Returns the paragraphs covered by the current selection, which may be
+        a collection of ranges or a single range.
+        """
+        selection = self.doc.getCurrentSelection()
+        paragraphs = []
+        try:
+            count = selection.getCount()
+            for i in range(count):
+                paragraphs.extend(self.get_paragraphs_within_range(selection.getByIndex(i)))
+        except AttributeError:
+            paragraphs = self.get_paragraphs_within_range(selection)
+        return paragraphs
+
+    def snapshot_selection(self, with_styles=False):
+        """
+        Reads the selected paragraphs once and returns (paragraphs, snapshots),
+        where snapshots are plain ParagraphSnapshot tuples the planners work on.
+        With with_styles, the root title's character style is captured too.
+        """
+        paragraphs = self.get_selected_paragraphs()
+        snapshots = []
+        for index, para in enumerate(paragraphs):
+            text = para.getString()
+            try:
+                level = 0 if index == 0 else para.getPropertyValue("NumberingLevel") + 1
+            except Exception:
+                level = 0
+            char_style = None
+            title = title_of(text)
+            if with_styles and index == 0 and title:
+                title_cursor = self.text.createTextCursorByRange(para.getStart())
+                if title_cursor.goRight(len(title), True):
+                    char_style = title_cursor.getPropertyValue("CharStyleName")
+            snapshots.append(ParagraphSnapshot(index, text, level, char_style))
+        return paragraphs, snapshots
+
     def identify_bullet_levels(self):
         """
         Iterates through the paragraphs of the current selection and
@@ -97,10 +152,52 @@ class BulletPointManager:
         selected_string = self.view_cursor.getString()
         return selected_string.splitlines()
 
-    def get_parent_bookmark_from_user(self, default_value):
+    def get_parent_bookmark_from_user(self, default_value, root_title=None, id_table=None):
         """
         Prompts the user for a parent bookmark using an input dialog.
-        If the user leaves the input blank, returns the provided default_value.
+        If the user leaves the input blank, the current default is taken.
+        The answer is checked against the document's bookmark names:
+         - ending it with "*" lists the bookmarks starting with it and offers
+           their common prefix as the new default (autocompletion);
+         - an existing name is refused, since the root would duplicate it;
+         - a name that extends no existing bookmark (a likely typo that would
+           start a disconnected hierarchy) must be entered twice to confirm.
+        Defaults, the initial one included, are checked the same way when
+        accepted with a blank answer. Returns None if no acceptable name was
+        given after 10 tries. With an id_table (short IDs) the names are the
+        readable paths of the table.
+        """
+        index = NAME_INDEXES.get(document_key(self.doc), self.doc,
+                                 verify=DOCUMENT_CHANGES.watch(self.doc).changed(NAMES))
+        if id_table is not None:
+            index = BookmarkNameIndex(id_table.readable_names(index.names))
+        message = ""
+        unconfirmed = None
+        for _ in range(10):
+            value = self.ask_parent_bookmark(f"{message}Leave blank to use default:\n{default_value}")
+            value = value or default_value
+            stem = value.rstrip(COMPLETION_MARKER).rstrip()
+            if value.endswith(COMPLETION_MARKER):
+                completions = index.completions(stem, limit=15)
+                default_value = index.extend_prefix(stem) if completions else default_value
+                message = f"Bookmarks starting with \"{stem}\":\n" + "\n".join(completions) + "\n\n"
+                continue
+            if stem in index:
+                suggestion = f"{stem} {root_title}" if root_title else stem
+                message = f"\"{stem}\" already exists. Did you mean \"{suggestion}\"?\n\n"
+                default_value = suggestion
+                continue
+            if index.nearest_ancestor(stem) is None and stem != unconfirmed:
+                unconfirmed = stem
+                message = (f"No existing bookmark is a parent of \"{stem}\".\n"
+                           f"Enter it again to start a new hierarchy.\n\n")
+                continue
+            return stem
+        return None
+
+    def ask_parent_bookmark(self, message):
+        """
+        Shows the "Parent Bookmark" input box and returns the trimmed answer.
         """
         ctx = XSCRIPTCONTEXT.getComponentContext()
         smgr = ctx.ServiceManager
@@ -110,12 +207,12 @@ class BulletPointManager:
         script = script_provider.getScript(
             "vnd.sun.star.script:Standard.Module1.InputBoxWrapper?language=Basic&location=application"
         )
-        args = (f"Leave blank to use default:\n{default_value}", "Parent Bookmark", "")
+        args = (message, "Parent Bookmark", "")
         result_tuple = script.invoke(args, (), ())
         if result_tuple and isinstance(result_tuple, tuple):
             result = result_tuple[0]
-            return result.strip() if result and isinstance(result, str) else default_value
-        return default_value
+            return result.strip() if result and isinstance(result, str) else ""
+        return ""
 
     def build_bookmark_chain(self, lines, levels, base_parent):
         """
@@ -124,309 +221,107 @@ class BulletPointManager:
          - titles is a list of extracted titles (text before colon, or the whole line)
          - bookmarks is the corresponding fully qualified nested bookmark name.
         """
-        parent_chain = {}
-        bookmarks = []
-        titles = []
-        for i, line in enumerate(lines):
-            if ":" not in line:
-                continue
-            title = line.split(":")[0].strip()
-            titles.append(title)
-            current_level = levels[i]
-            if current_level == 0:
-                full_bm = base_parent
-            else:
-                parent_bm = parent_chain.get(current_level - 1, base_parent)
-                full_bm = parent_bm + " " + title
-            parent_chain[current_level] = full_bm
-            # Clear any deeper levels from the chain.
-            for k in list(parent_chain.keys()):
-                if k > current_level:
-                    del parent_chain[k]
-            bookmarks.append(full_bm)
-        return titles, bookmarks
-
-    def insert_summary_line(self, titles, bookmarks, separator=", ", add_extra_bookmarks=False):
-        """
-        Inserts a summary line above the current selection that lists all titles,
-        and applies hyperlinks linking to the corresponding bookmarks.
-        Optionally, inserts additional bookmarks on the summary text.
-        """
-        summary_text = separator.join(titles)
-        summary_cursor = self.text.createTextCursorByRange(self.view_cursor.getStart())
-        summary_cursor.gotoStartOfParagraph(False)
-        self.text.insertString(summary_cursor, summary_text + "\n", False)
-        summary_cursor.goLeft(len(summary_text) + 1, True)
-        summary_cursor.collapseToStart()
-
-        full_doc_url = self.doc.URL
-
-        # Apply hyperlinks to each title within the summary line.
-        summary_line_cursor = self.text.createTextCursorByRange(summary_cursor.getStart())
-        for i, title in enumerate(titles):
-            title_cursor = self.text.createTextCursorByRange(summary_line_cursor.getStart())
-            if not title_cursor.goRight(len(title), True):
-                continue
-            hyperlink_url = full_doc_url + "#" + bookmarks[i]
-            title_cursor.HyperLinkURL = hyperlink_url
-            title_cursor.HyperLinkName = title
-            title_cursor.HyperLinkTarget = ""
-            if add_extra_bookmarks:
-                # For extended summaries, add an additional bookmark.
-                additional_bookmark = self.doc.createInstance("com.sun.star.text.Bookmark")
-                additional_bookmark.Name = bookmarks[i] + " Contents"
-                self.text.insertTextContent(title_cursor, additional_bookmark, True)
-            # Move the cursor past the current title and separator.
-            title_length = len(title)
-            summary_line_cursor.goRight(title_length, False)
-            if i < len(titles) - 1:
-                summary_line_cursor.goRight(len(separator), False)
-
-    def insert_bullet_bookmarks(self, titles, bookmarks):
-        """
-        For each bullet (except the root), this version uses a while loop to search for the correct paragraph
-        matching the expected title. Only when the paragraph text (obtained via a temporary cursor)
-        begins with the expected title and contains a colon is the bookmark inserted.
-        """
-        full_doc_url = self.doc.URL
-        # Start from the paragraph after the summary (assumed to be immediately after the view cursor position).
-        current_cursor = self.text.createTextCursorByRange(self.view_cursor.getStart())
-        current_cursor.gotoNextParagraph(False)
-
-        # Process each title starting from index 1 (skip root)
-        for i in range(1, len(titles)):
-            expected_title = titles[i]
-            full_bm = bookmarks[i]
-            found = False
-            attempts = 0
-
-            # Try up to a maximum of 10 paragraphs to find the expected text
-            while attempts < 10:
-                # Create a temporary cursor for the current paragraph so we can inspect its full text.
-                temp_cursor = self.text.createTextCursorByRange(current_cursor)
-                temp_cursor.gotoEndOfParagraph(True)
-                para_text = temp_cursor.getString().strip()
-
-                # If no meaningful text exists, move on
-                if not para_text:
-                    if not current_cursor.gotoNextParagraph(False):
-                        break
-                    attempts += 1
-                    continue
-
-                # If the paragraph does not contain a colon, it’s not eligible for processing,
-                # so move to the next paragraph.
-                if ":" not in para_text:
-                    if not current_cursor.gotoNextParagraph(False):
-                        break
-                    attempts += 1
-                    continue
-
-                # Now, check if the paragraph starts with the expected title.
-                if para_text.startswith(expected_title):
-                    found = True
-                    break
-                else:
-                    # Otherwise, move to the next paragraph and try again.
-                    if not current_cursor.gotoNextParagraph(False):
-                        break
-                    attempts += 1
-
-            if not found:
-                # If after several attempts no matching paragraph is found, skip to the next title.
-                continue
-
-            # At this point, current_cursor points to the paragraph matching expected_title.
-            # Create a new cursor for that paragraph for precise bookmarking.
-            line_cursor = self.text.createTextCursorByRange(current_cursor)
-            line_cursor.gotoStartOfParagraph(False)
-            if not line_cursor.goRight(len(expected_title), True):
-                continue  # If we cannot cover the expected title, skip this bullet.
-
-            # Insert the bookmark over the expected title.
-            bookmark = self.doc.createInstance("com.sun.star.text.Bookmark")
-            bookmark.Name = full_bm
-            self.text.insertTextContent(line_cursor, bookmark, True)
-
-            # Create another cursor to check if a colon immediately follows the expected title.
-            colon_cursor = self.text.createTextCursorByRange(line_cursor.getStart())
-            if colon_cursor.goRight(len(expected_title), False) and colon_cursor.goRight(1, True):
-                if colon_cursor.getString() == ":":
-                    colon_cursor.HyperLinkURL = full_doc_url + "#" + full_bm + " Contents"
-                    colon_cursor.HyperLinkName = full_bm + " Contents"
-                    colon_cursor.HyperLinkTarget = ""
-
-            # Move the main cursor past this paragraph for the next iteration.
-            current_cursor.gotoNextParagraph(False)
+        return build_bookmark_chain(lines, levels, base_parent)
 
     def propagate_title_character_style(self):
         """
         Reads the parent's bullet title portion (exact text run) to retrieve its
         character style name, then assigns that style to the child's title text.
+        The style changes are planned from a snapshot and applied in one batch.
         """
-
-        selection = self.doc.getCurrentSelection()
-        paragraphs = []
-        try:
-            count = selection.getCount()
-            for i in range(count):
-                sel_range = selection.getByIndex(i)
-                paragraphs.extend(self.get_paragraphs_within_range(sel_range))
-        except AttributeError:
-            paragraphs = self.get_paragraphs_within_range(selection)
-
+        paragraphs, snapshots = self.snapshot_selection(with_styles=True)
         if not paragraphs:
             self.show_message("No bullet paragraphs found in the selection.", "Error", boxtype=ERRORBOX)
             return
 
-        style_stack = {}
-
-        for idx, para in enumerate(paragraphs):
-            full_text = para.getString()
-            if ":" not in full_text:
-                # not a bullet with a "title:"
-                continue
-
-            # bullet "level" (like your color example)
-            try:
-                level = 0 if idx == 0 else para.getPropertyValue("NumberingLevel") + 1
-            except Exception:
-                level = 0
-
-            # Extract text before the colon => "title"
-            title = full_text.split(":", 1)[0].strip()
-
-            # Create a cursor for just that "title" portion
-            title_cursor = self.text.createTextCursorByRange(para)
-            title_cursor.gotoStartOfParagraph(False)
-            if not title_cursor.goRight(len(title), True):
-                continue
-
-            if level == 0:
-                # "Parent" bullet. Grab this bullet's style (exact text run).
-                parent_style_name = title_cursor.getPropertyValue("CharStyleName")
-                if parent_style_name and parent_style_name != "No Character Style":
-                    style_stack[level] = parent_style_name
-            else:
-                # A nested bullet => find closest parent’s style
-                inherited_style = None
-                for lvl in range(level - 1, -1, -1):
-                    if lvl in style_stack:
-                        inherited_style = style_stack[lvl]
-                        break
-
-                # If the parent has a real style name, apply it to the child
-                if inherited_style and inherited_style != "No Character Style":
-                    title_cursor.setPropertyValue("CharStyleName", inherited_style)
-                    title_cursor.setPropertyValue("CharWeight", BOLD)
-                    # So deeper children can inherit from us
-                    style_stack[level] = inherited_style
-
-            # Clear out deeper levels from style_stack if we moved back up
-            for deeper_lvl in list(style_stack.keys()):
-                if deeper_lvl > level:
-                    del style_stack[deeper_lvl]
+        plan = plan_title_styles(snapshots)
+        EditPlanExecutor(self.doc).apply(plan, paragraphs, undo_title="Propagate title styles")
 
         self.show_message("Character styles propagated to nested bullet titles.",
                           "Style Propagation Success")
 
-    def insert_parent_bookmark_hyperlink(self, titles, bookmarks):
-        """
-        Locates the *parent* bullet (titles[0]) in the current selection,
-        inserts a bookmark on its text, and hyperlinks the colon.
-        """
-        if not titles:
-            return
-
-        parent_title = titles[0]
-        parent_bookmark = bookmarks[0]
-
-        # Start searching from the view cursor (which presumably
-        # points to the start of the bullet selection).
-        cur = self.text.createTextCursorByRange(self.view_cursor.getStart())
-
-        found = False
-        attempts = 0
-        while attempts < 10:
-            tmp_cursor = self.text.createTextCursorByRange(cur)
-            tmp_cursor.gotoEndOfParagraph(True)
-            p_text = tmp_cursor.getString().strip()
-
-            if p_text and ":" in p_text and p_text.startswith(parent_title):
-                found = True
-                break
-
-            if not cur.gotoNextParagraph(False):
-                break
-            attempts += 1
-
-        if not found:
-            # If you like, you can show a warning or just return
-            print(f"Could not find parent bullet titled: {parent_title}")
-            return
-
-        # Insert the bookmark over the bullet title portion
-        line_cursor = self.text.createTextCursorByRange(cur)
-        line_cursor.gotoStartOfParagraph(False)
-        if line_cursor.goRight(len(parent_title), True):
-            bm = self.doc.createInstance("com.sun.star.text.Bookmark")
-            bm.Name = parent_bookmark
-            self.text.insertTextContent(line_cursor, bm, True)
-
-            # Optional: hyperlink the colon
-            colon_cursor = self.text.createTextCursorByRange(line_cursor.getStart())
-            if colon_cursor.goRight(len(parent_title), False) and colon_cursor.goRight(1, True):
-                if colon_cursor.getString() == ":":
-                    doc_url = self.doc.URL
-                    colon_cursor.HyperLinkURL = doc_url + "#" + parent_bookmark + " Contents"
-                    colon_cursor.HyperLinkName = parent_bookmark + " Contents"
-                    colon_cursor.HyperLinkTarget = ""
-
-    def process_nested_bookmark_summary(self, separator=", ", add_extra_bookmarks=False):
+    def process_nested_bookmark_summary(self, separator=", ", add_extra_bookmarks=False, dry_run=False,
+                                        short_ids=False):
         """
         Main template method that performs the following steps:
          1. Validates the selection.
-         2. Extracts the selection lines.
-         3. Determines bullet levels.
-         4. Verifies that the first line contains a colon.
-         5. Obtains a base parent bookmark from the user.
-         6. Builds the bookmark chain (titles & full bookmark names).
-         7. Inserts the summary line with hyperlinks.
-         8. Adds bullet bookmarks to each bullet paragraph.
+         2. Snapshots the selected paragraphs (text and bullet level) in one pass
+            and checks that they match the selected lines.
+         3. Verifies that the first line contains a colon.
+         4. Obtains a base parent bookmark from the user.
+         5. Plans the edits: bookmark chain, summary line with hyperlinks,
+            and bullet bookmarks (pure Python, cached per selection content).
+         6. Applies the plan in one batch, unless it was already applied.
         The separator and add_extra_bookmarks flag allow you to adjust the behavior
-        (for example, basic vs. extended summary).
+        (for example, basic vs. extended summary). With dry_run, the plan and its
+        diff against the previous plan are shown instead of being applied.
+        With short_ids, bookmarks get short hash-based IDs and the hierarchical
+        names are kept in the document's side table (see bookmark_ids).
         """
         if self.view_cursor.isCollapsed():
             print("Please select bullet-point text.")
             return
 
-        lines = self.get_selection_lines()
-        if not lines:
+        paragraphs, snapshots = self.snapshot_selection()
+        if not snapshots:
             print("No text selected.")
             self.show_message(
                 "No text selected.",
                 "Formatting Error", boxtype=ERRORBOX)
             return
-
-        levels = self.identify_bullet_levels()
-        if len(levels) != len(lines):
-            print("Mismatch between bullet levels and selected lines. Make sure the selection includes only the intended bullet paragraphs.")
-            self.show_message("Mismatch between bullet levels and selected lines. Make sure the selection includes only the intended bullet paragraphs.",
-                              "Formatting Error", boxtype=ERRORBOX)
+        lines = self.get_selection_lines()
+        if not levels_match_lines(snapshots, lines):
+            print(LEVEL_MISMATCH)
+            self.show_message(LEVEL_MISMATCH, "Formatting Error", boxtype=ERRORBOX)
             return
 
-        if ":" not in lines[0]:
+        root_title = title_of(snapshots[0].text)
+        if root_title is None:
             print("Root title (first line) must contain a colon.")
             self.show_message("Root title (first line) must contain a colon.",
                               "Formatting Error", boxtype=ERRORBOX)
             return
 
-        root_title = lines[0].split(":")[0].strip()
-        base_parent = self.get_parent_bookmark_from_user(f"Section 1 {root_title}")
-        titles, bookmarks = self.build_bookmark_chain(lines, levels, base_parent)
-        self.insert_parent_bookmark_hyperlink(titles, bookmarks)
-        self.insert_summary_line(titles, bookmarks, separator, add_extra_bookmarks)
-        self.insert_bullet_bookmarks(titles, bookmarks)
+        id_table = None
+        if short_ids:
+            if not self.doc.URL:
+                self.show_message("Please save the document before using short bookmark IDs.",
+                                  "Save Required", boxtype=ERRORBOX)
+                return
+            id_table = BookmarkIdTable.for_document(uno.fileUrlToSystemPath(self.doc.URL))
+        base_parent = self.get_parent_bookmark_from_user(f"Section 1 {root_title}", root_title, id_table)
+        if base_parent is None:
+            self.show_message("No parent bookmark was chosen; nothing was changed.",
+                              "Parent Bookmark", boxtype=ERRORBOX)
+            return
+        doc_url = self.link_base()
+
+        key = plan_key("nested_bookmark_summary", snapshots, base_parent=base_parent, doc_url=doc_url,
+                       separator=separator, add_extra_bookmarks=add_extra_bookmarks, short_ids=short_ids,
+                       lines=lines)
+
+        def build():
+            return plan_nested_bookmark_summary(snapshots, base_parent, doc_url, separator, add_extra_bookmarks,
+                                                naming=id_table.id_for if id_table else None, lines=lines)
+        # Short IDs are registered in the side table while planning, so that plan is always rebuilt.
+        plan = build() if id_table else PLAN_CACHE.get_or_build(key, build)
+
+        doc_key = document_key(self.doc)
+        if dry_run:
+            self.show_plan_preview(plan, PLAN_CACHE.last_plan(doc_key, "nested_bookmark_summary"))
+            PLAN_CACHE.remember(doc_key, "nested_bookmark_summary", plan)
+            return
+
+        executor = EditPlanExecutor(self.doc)
+        if PLAN_CACHE.was_applied(doc_key, key) and executor.is_applied(plan):
+            self.show_message("Nothing to do: these bullets already carry this summary.",
+                              "Nested Bookmarks", boxtype=INFOBOX)
+            return
+        executor.apply(plan, paragraphs, undo_title="Nested bookmark summary")
+        if id_table:
+            id_table.save()
+        PLAN_CACHE.mark_applied(doc_key, key)
+        PLAN_CACHE.remember(doc_key, "nested_bookmark_summary", plan)
 
         if add_extra_bookmarks:
             self.show_message(
@@ -439,6 +334,126 @@ class BulletPointManager:
                 "Nested Bookmarks Success", boxtype=INFOBOX)
             print("✅ Nested bookmarks with hierarchy inserted.")
 
+    # --- Outline export / import ---
+    def get_input_with_default(self, prompt, title, default_value):
+        """
+        Prompts the user for input using a BASIC input box.
+        Returns the trimmed answer or default_value if input is blank.
+        """
+        script_provider = self.smgr.createInstanceWithContext(
+            "com.sun.star.script.provider.MasterScriptProviderFactory", self.ctx
+        ).createScriptProvider("")
+        script = script_provider.getScript(
+            "vnd.sun.star.script:Standard.Module1.InputBoxWrapper?language=Basic&location=application"
+        )
+        args = (f"{prompt}\nLeave blank to use default: {default_value}", title, "")
+        result_tuple = script.invoke(args, (), ())
+        if result_tuple and isinstance(result_tuple, tuple):
+            result = result_tuple[0]
+            if result and isinstance(result, str) and result.strip():
+                return result.strip()
+        return default_value
+
+    def outline_path(self, title):
+        """
+        Asks for an outline file path, defaulting to <document>.outline.jsonl
+        next to the document. Returns "" for an unsaved document.
+        """
+        if not self.doc.URL:
+            self.show_message("Please save the document before running this macro.",
+                              "Save Required", boxtype=ERRORBOX)
+            return ""
+        doc_path = uno.fileUrlToSystemPath(self.doc.URL)
+        default_path = os.path.splitext(doc_path)[0] + ".outline.jsonl"
+        path = self.get_input_with_default("Outline file (.jsonl, or .md for Markdown)", title, default_path)
+        return os.path.join(os.path.dirname(doc_path), os.path.expanduser(path))
+
+    def read_outline_items(self, paragraphs):
+        """
+        Yields an OutlineItem per paragraph, reading each paragraph's text
+        portions once: bookmark offsets, merged hyperlink ranges (links into
+        this document in "#bookmark" form) and the list level.
+        """
+        doc_url = self.doc.URL
+        for index, para in enumerate(paragraphs):
+            numbering_level, list_style = para.getPropertyValues(("NumberingLevel", "NumberingStyleName"))
+            level = 0 if index == 0 else numbering_level + 1
+            offset = 0
+            opened = {}
+            bookmarks = []
+            links = []
+            for portion in iter_portions(para):
+                if portion.TextPortionType == "Bookmark":
+                    name = portion.Bookmark.Name
+                    if portion.IsCollapsed:
+                        bookmarks.append((name, offset, offset))
+                    elif portion.IsStart:
+                        opened[name] = offset
+                    else:
+                        bookmarks.append((name, opened.pop(name, 0), offset))
+                    continue
+                length = len(portion.getString())
+                url = portion.HyperLinkURL
+                if url:
+                    # Only links into this document are shortened: a "../" file link
+                    # would not resolve when the outline is imported (see hyperlinks).
+                    relative_url = to_relative_url(url, doc_url)
+                    if relative_url is not None and relative_url.startswith("#"):
+                        url = relative_url
+                    if links and links[-1][1] == offset and links[-1][2] == url:
+                        links[-1] = (links[-1][0], offset + length, url, links[-1][3])
+                    else:
+                        links.append((offset, offset + length, url, portion.HyperLinkName))
+                offset += length
+            # Bookmarks running on into the next paragraph end with this one.
+            bookmarks.extend((name, start, offset) for name, start in opened.items())
+            yield OutlineItem(level, numbering_level if list_style else None, para.getString(),
+                              tuple(bookmarks), tuple(links))
+
+    def export_outline(self, path):
+        """
+        Streams the selected paragraphs (the whole document when nothing is
+        selected) into path as JSON Lines or Markdown. Returns the count.
+        """
+        if self.view_cursor.isCollapsed():
+            paragraphs = iter_paragraphs(self.text)
+        else:
+            paragraphs = self.get_selected_paragraphs()
+        return write_outline(self.read_outline_items(paragraphs), path)
+
+    def import_outline(self, path):
+        """
+        Inserts the outline stored in path above the paragraph holding the
+        cursor, as one batched edit plan (one undo step). Bookmarks whose
+        names already exist are skipped. Returns (paragraphs, skipped names).
+        """
+        items = read_outline(path)
+        if not items:
+            return 0, []
+        anchor = self.text.createTextCursorByRange(self.view_cursor.getStart())
+        paragraph = anchor.createEnumeration().nextElement()
+        list_style = paragraph.getPropertyValue("NumberingStyleName") or DEFAULT_LIST_STYLE
+        index = NAME_INDEXES.get(document_key(self.doc), self.doc,
+                                 verify=DOCUMENT_CHANGES.watch(self.doc).changed(NAMES))
+        skipped = [name for item in items for name, _, _ in item.bookmarks if name in index]
+        plan = plan_outline_import(items, 0, self.link_base(), existing=index.names, list_style=list_style)
+        EditPlanExecutor(self.doc).apply(plan, [paragraph], undo_title="Import outline")
+        return len(items), skipped
+
+    def show_plan_preview(self, plan, previous_plan=None):
+        """
+        Shows a dry run of plan and, when a previous plan exists,
+        the operations it adds and removes.
+        """
+        message = f"{len(plan)} planned edits:\n" + describe_plan(plan)
+        if previous_plan is not None:
+            removed, added = diff_plans(previous_plan, plan)
+            message += f"\n\nCompared with the previous plan: +{len(added)} / -{len(removed)}"
+            message += "".join("\n+ " + describe_plan([op]) for op in added[:10])
+            message += "".join("\n- " + describe_plan([op]) for op in removed[:10])
+        print(message)
+        self.show_message(message, "Edit Plan Preview", boxtype=INFOBOX)
+
 
 # Module-level API functions to maintain existing interface.
 
@@ -471,6 +486,24 @@ def insert_nested_bookmark_summaries():
     manager = BulletPointManager()
     manager.process_nested_bookmark_summary(separator="| ", add_extra_bookmarks=True)
 
+def insert_nested_bookmark_summaries_short_ids():
+    """
+    Function:
+        - Same as insert_nested_bookmark_summaries, but names every bookmark with a short,
+        - stable hash-based ID and records the hierarchical name in <document>.bookmarks.json.
+    """
+    manager = BulletPointManager()
+    manager.process_nested_bookmark_summary(separator="| ", add_extra_bookmarks=True, short_ids=True)
+
+def preview_nested_bookmark_summaries():
+    """
+    Function:
+        - Dry run of insert_nested_bookmark_summaries: shows the planned edits for the
+        - current selection, and what changed since the last plan, without touching the document.
+    """
+    manager = BulletPointManager()
+    manager.process_nested_bookmark_summary(separator="| ", add_extra_bookmarks=True, dry_run=True)
+
 def change_character_style():
     """
     Function:
@@ -479,4 +512,36 @@ def change_character_style():
     Shortcut: Ctrl + Shift + Alt + S
     """
     manager = BulletPointManager()
-    manager.propagate_title_character_style()
\ No newline at end of file
+    manager.propagate_title_character_style()
+
+def export_outline():
+    """
+    Function:
+        - Writes the selected bullet hierarchy (or the whole document) with its bookmark names
+        - and hyperlinks to a JSON Lines file, or to Markdown when the path ends in .md.
+    """
+    manager = BulletPointManager()
+    path = manager.outline_path("Export Outline")
+    if not path:
+        return
+    count = manager.export_outline(path)
+    manager.show_message(f"✅ {count} paragraphs exported to:\n{path}", "Export Outline")
+
+def import_outline():
+    """
+    Function:
+        - Inserts an outline exported with export_outline (JSON Lines or Markdown) above the
+        - cursor as a nested, bookmarked and hyperlinked list, in one batched edit.
+    """
+    manager = BulletPointManager()
+    path = manager.outline_path("Import Outline")
+    if not path:
+        return
+    if not os.path.isfile(path):
+        manager.show_message(f"File not found:\n{path}", "Import Outline", boxtype=ERRORBOX)
+        return
+    count, skipped = manager.import_outline(path)
+    message = f"✅ {count} paragraphs imported."
+    if skipped:
+        message += f"\n{len(skipped)} bookmarks already existed and were left out:\n" + "\n".join(skipped[:15])
+    manager.show_message(message, "Import Outline")
@@ -0,0 +1,135 @@
+import time
+import unohelper
+from com.sun.star.awt import XCallback
+from com.sun.star.document import XDocumentEventListener
+from bookmark_names import NAME_INDEXES
+from bookmark_search import TRIGRAM_INDEXES, TrigramIndex
+from document_changes import DOCUMENT_CHANGES, LINKS, NAMES
+from edit_plan import document_key
+from hyperlinks import LINK_INDEXES, LinkIndex
+
+# Longest time one slice may keep the UI thread busy.
+SLICE_SECONDS = 0.015
+# Bookmark names added to the trigram index between two time checks.
+NAMES_PER_STEP = 500
+
+# Document keys being prewarmed right now.
+_RUNNING = set()
+# The global event listener, once enable_cache_prewarming has run.
+_EVENT_LISTENER = []
+
+
+# --- Cache Prewarmer Class ---
+class CachePrewarmer(unohelper.Base, XCallback):
+    """
+    Builds the bookmark-name set, its trigram index and the link index of a
+    document in short slices. Each slice runs from an AsyncCallback on the
+    UI thread for at most SLICE_SECONDS and then queues the next one, so
+    keystrokes and repaints are handled in between. Edits made while a
+    slice is pending are recorded by document_changes and picked up by the
+    usual incremental refresh.
+    """
+    def __init__(self, ctx, doc):
+        self.doc = doc
+        self.key = document_key(doc)
+        self.async_callback = ctx.ServiceManager.createInstanceWithContext("com.sun.star.awt.AsyncCallback", ctx)
+        self.steps = self.warm_steps()
+
+    def is_warm(self):
+        name_index = NAME_INDEXES.indexes.get(self.key)
+        return (self.key in LINK_INDEXES and name_index is not None
+                and TRIGRAM_INDEXES.is_current(self.key, name_index))
+
+    def warm_steps(self):
+        """
+        Yields between small units of work; caches that are already warm are skipped.
+        """
+        changes = DOCUMENT_CHANGES.watch(self.doc)
+        name_index = NAME_INDEXES.get(self.key, self.doc, verify=changes.changed(NAMES))
+        yield
+        if self.key in TRIGRAM_INDEXES.entries:
+            # A cached index only needs the names that changed.
+            TRIGRAM_INDEXES.get(self.key, name_index)
+        elif not TRIGRAM_INDEXES.is_current(self.key, name_index):
+            # The names can change between slices: the build belongs to the
+            # stamp taken with the copy, and is dropped if it went stale.
+            stamp = TRIGRAM_INDEXES.stamp(name_index)
+            names = list(name_index.names)
+            trigram_index = TrigramIndex()
+            for start in range(0, len(names), NAMES_PER_STEP):
+                trigram_index.extend(names[start:start + NAMES_PER_STEP])
+                yield
+            if TRIGRAM_INDEXES.stamp(name_index) == stamp:
+                TRIGRAM_INDEXES.store(self.key, name_index, trigram_index, stamp)
+        if self.key not in LINK_INDEXES:
+            changes.take(LINKS)
+            link_index = LinkIndex(self.doc.URL)
+            yield from link_index.index_document(self.doc)
+            LINK_INDEXES[self.key] = link_index
+
+    def start(self):
+        if self.key in _RUNNING or self.is_warm():
+            return
+        _RUNNING.add(self.key)
+        self.async_callback.addCallback(self, None)
+
+    def notify(self, data):
+        deadline = time.perf_counter() + SLICE_SECONDS
+        try:
+            while time.perf_counter() < deadline:
+                next(self.steps)
+        except StopIteration:
+            _RUNNING.discard(self.key)
+            return
+        except Exception as e:
+            # The document was closed or changed underneath; the macros will build on demand.
+            print(f"Cache prewarming stopped: {e}")
+            _RUNNING.discard(self.key)
+            return
+        self.async_callback.addCallback(self, None)
+
+
+class PrewarmEventListener(unohelper.Base, XDocumentEventListener):
+    """
+    Starts a CachePrewarmer whenever a text document is loaded or focused.
+    """
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def documentEventOccured(self, event):
+        if event.EventName in ("OnLoad", "OnFocus"):
+            prewarm_document(self.ctx, event.Source)
+
+    def disposing(self, event):
+        _EVENT_LISTENER.clear()
+
+
+def prewarm_document(ctx, doc):
+    if hasattr(doc, "supportsService") and doc.supportsService("com.sun.star.text.TextDocument"):
+        CachePrewarmer(ctx, doc).start()
+
+
+# --- Module-level API Functions ---
+def prewarm_caches(*args):
+    """
+    Function:
+        - Builds the bookmark-name, fuzzy-search and link indexes of the current document in
+        - small background slices, so the first macro run is as fast as later ones.
+        - Can be bound to the "Open Document" / "Activate Document" events.
+    """
+    prewarm_document(XSCRIPTCONTEXT.getComponentContext(), XSCRIPTCONTEXT.getDocument())
+
+def enable_cache_prewarming(*args):
+    """
+    Function:
+        - Prewarms the caches of every text document as it is opened or focused, for the rest
+        - of the session. Bind it to the "Start Application" event to make it permanent.
+    """
+    if _EVENT_LISTENER:
+        return
+    ctx = XSCRIPTCONTEXT.getComponentContext()
+    broadcaster = ctx.getValueByName("/singletons/com.sun.star.frame.theGlobalEventBroadcaster")
+    listener = PrewarmEventListener(ctx)
+    broadcaster.addDocumentEventListener(listener)
+    _EVENT_LISTENER.append(listener)
+    prewarm_document(ctx, XSCRIPTCONTEXT.getDocument())
@@ -1,14 +1,34 @@
 import uno
 import unohelper
+import functools
 import os
-import glob
-import shutil
 from com.sun.star.awt import MessageBoxButtons as BUTTONS_OK
-from com.sun.star.awt.MessageBoxType import ERRORBOX, INFOBOX
+from com.sun.star.awt.MessageBoxButtons import BUTTONS_YES_NO
+from com.sun.star.awt.MessageBoxResults import YES
+from com.sun.star.awt.MessageBoxType import ERRORBOX, INFOBOX, QUERYBOX
+from attach_journal import AttachJournal
+from attachment_manifest import AttachmentManifest
+from attachment_store import (DOCUMENT_EXTENSIONS, FLAT_LAYOUT, MEDIA_EXTENSIONS, QUARANTINE_FOLDER, find_orphans,
+                              folder_names, format_size, list_files, move_files, numbered_names, quarantine,
+                              referenced_by_documents, resolve_link_path, sanitize_filename, shard_subdir)
+from duplicates import find_duplicate
+from hyperlinks import iter_paragraphs, iter_portions
+from outline import DEFAULT_LIST_STYLE
+from png_recompress import record_savings, recompress_pngs
+from source_scan import SourceRoot, newest_across
+
+# How attachments are filed in References/, Outputs/ and PDF/: FLAT_LAYOUT,
+# or "date" / "hash" to shard huge folders into bounded subfolders.
+ATTACHMENT_LAYOUT = FLAT_LAYOUT
+
+# Folders the latest media / document is picked from, scanned concurrently.
+# Add a SourceRoot per capture folder or share, with the suffixes to take from it.
+MEDIA_SOURCES = (SourceRoot("~/Pictures/Screenshots", MEDIA_EXTENSIONS),)
+DOCUMENT_SOURCES = (SourceRoot("~/vmshare", DOCUMENT_EXTENSIONS),)
 
 
 class FileManager:
-    def __init__(self, media_dir=None):
+    def __init__(self, media_dir=None, recompress_png=False, layout=ATTACHMENT_LAYOUT):
         self.ctx = uno.getComponentContext()
         self.smgr = self.ctx.ServiceManager
         self.desktop = self.smgr.createInstanceWithContext("com.sun.star.frame.Desktop", self.ctx)
@@ -17,48 +37,60 @@ class FileManager:
         self.text = self.doc.Text
         self.doc_url = uno.fileUrlToSystemPath(self.doc.URL)
         self.doc_dir = os.path.dirname(self.doc_url)
-        self.media_dir = media_dir or os.path.expanduser("~/Pictures/Screenshots")
+        self.media_sources = (SourceRoot(media_dir, MEDIA_EXTENSIONS),) if media_dir else MEDIA_SOURCES
+        self.document_sources = DOCUMENT_SOURCES
+        self.recompress_png = recompress_png
+        self.layout = layout
+        self.manifest = AttachmentManifest.for_folder(self.doc_dir)
+        self.journal = AttachJournal(self.doc_dir, self.doc.URL)
 
     # --- 📦 Latest Media File Retrieval ---
+    def get_latest_files(self, sources, count=1):
+        """
+        Returns the count newest files across sources, oldest first, within
+        the scan's latency budget. Roots that were cut short or could not be
+        read are logged; what was found in time is still returned.
+        """
+        result = newest_across(sources, count)
+        if result.unreachable:
+            print("Source folders not scanned: " + ", ".join(result.unreachable))
+        elif not result.complete:
+            print("Source scan ran out of time; using the newest files found so far.")
+        return result.files
+
+    def describe_sources(self, sources):
+        return "\n".join(os.path.expanduser(root.path) for root in sources)
+
     def get_latest_media_file(self):
         """
-        Finds the most recent .png, .mp4, or .webm file in the media directory.
+        Finds the most recent .png, .mp4, or .webm file in the media source folders.
         If no such files exist, displays an error and halts the process.
         """
-        extensions = ['*.png', '*.mp4', '*.webm', '*.mov', '*.avi']
-        files = []
-        for ext in extensions:
-            files.extend(glob.glob(os.path.join(self.media_dir, ext)))
-
+        files = self.get_latest_files(self.media_sources)
         if not files:
             self.show_message(
                 title="No Media Files Found",
-                message=f"No image or video files found in:\n{self.media_dir}",
+                message=f"No image or video files found in:\n{self.describe_sources(self.media_sources)}",
                 boxtype=ERRORBOX
             )
             raise FileNotFoundError("No media files found.")
 
-        return max(files, key=os.path.getmtime)
+        return files[-1]
 
     def get_latest_document_file(self):
         """
-        Looks in the vmshare directory for the most recent PDF or DOCX file.
+        Looks in the document source folders (~/vmshare) for the most recent PDF or DOCX file.
         """
-        doc_dir = os.path.expanduser("~/vmshare")
-        extensions = ['*.pdf', '*.docx']
-        files = []
-        for ext in extensions:
-            files.extend(glob.glob(os.path.join(doc_dir, ext)))
-
+        files = self.get_latest_files(self.document_sources)
         if not files:
             self.show_message(
                 title="No Documents Found",
-                message=f"No PDF or DOCX files found in:\n{doc_dir}",
+                message=f"No PDF or DOCX files found in:\n{self.describe_sources(self.document_sources)}",
                 boxtype=ERRORBOX
             )
             raise FileNotFoundError("No document files found in vmshare.")
 
-        return max(files, key=os.path.getmtime)
+        return files[-1]
 
     # --- 🧠 Text Selection from Document ---
     def get_selected_text_and_range(self):
@@ -71,15 +103,146 @@ class FileManager:
             raise ValueError("Selected text is empty.")
         return selected_text, text_range
 
+    def get_selected_ranges(self):
+        """
+        Returns (text, range) for every range of a multi-selection, in
+        document order. A single range spanning several paragraphs (e.g.
+        consecutive bullet lines) yields one entry per non-empty paragraph.
+        """
+        selection = self.doc.getCurrentSelection()
+        if not selection or selection.getCount() == 0:
+            raise ValueError("No text selected.")
+        ranges = [selection.getByIndex(i) for i in range(selection.getCount())]
+        ranges = [r for r in ranges if r.getString().strip()]
+        if len(ranges) == 1 and "\n" in ranges[0].getString().replace("\r", "\n"):
+            paragraphs = []
+            enum = ranges[0].createEnumeration()
+            while enum.hasMoreElements():
+                element = enum.nextElement()
+                if element.supportsService("com.sun.star.text.Paragraph") and element.getString().strip():
+                    paragraphs.append(element)
+            ranges = paragraphs
+        if not ranges:
+            raise ValueError("Selected text is empty.")
+        # Selections made with Ctrl are returned in the order they were made.
+        if len(ranges) > 1:
+            text = ranges[0].getText()
+            ranges.sort(key=functools.cmp_to_key(lambda a, b: -text.compareRegionStarts(a, b)))
+        return [(r.getString().strip(), r) for r in ranges]
+
     # --- 📁 File Path Prep & Move ---
-    def prepare_target_path(self, folder_name, filename):
+    def target_dir(self, folder_name, filename, mtime=None):
+        """
+        Returns the folder filename is filed in under folder_name with the
+        current layout (mtime picks the shard of the date layout).
+        """
         target_dir = os.path.join(self.doc_dir, folder_name)
-        os.makedirs(target_dir, exist_ok=True)
-        return os.path.join(target_dir, filename)
+        shard = shard_subdir(filename, self.layout, mtime)
+        return os.path.join(target_dir, shard) if shard else target_dir
 
-    def move_and_rename(self, src_path, dest_path):
-        shutil.move(src_path, dest_path)
-        return dest_path
+    def unique_target_paths(self, folder_name, files):
+        """
+        Naming stage: returns a safe, unused target path for every
+        (stem, extension, mtime) in files, in order. Stems are sanitised; a
+        name already in its target folder, filed in another shard of
+        folder_name, or handed out earlier in the batch gets " (2)",
+        " (3)", ... appended. Checked against the in-memory name index of
+        each target folder (one scandir, cached), which records the names
+        handed out; the disk is not probed per file.
+        """
+        indexes = {}
+        targets = []
+        for stem, extension, mtime in files:
+            for name in numbered_names(sanitize_filename(stem, extension)):
+                target_dir = self.target_dir(folder_name, name, mtime)
+                if target_dir not in indexes:
+                    indexes[target_dir] = folder_names(target_dir)
+                if name not in indexes[target_dir] and self.manifest.lookup(folder_name, name) is None:
+                    indexes[target_dir].add(name)
+                    targets.append(os.path.join(target_dir, name))
+                    break
+        for target_dir in indexes:
+            os.makedirs(target_dir, exist_ok=True)
+        return targets
+
+    def unique_target_path(self, folder_name, label, source_path):
+        extension = os.path.splitext(source_path)[-1]
+        return self.unique_target_paths(folder_name, [(label, extension, os.path.getmtime(source_path))])[0]
+
+    def record_attachments(self, folder_name, paths):
+        """
+        Adds the files just filed in folder_name to the attachment manifest,
+        with their size, mtime and hash (reusing the hash of a journaled copy).
+        """
+        self.manifest.add_files(folder_name, paths, {path: self.journal.file_info(path) for path in paths})
+        self.manifest.save()
+
+    def move_and_rename(self, src_path, dest_path, label="", anchor=None):
+        """
+        Moves src_path to dest_path through the attach journal, so an
+        interrupted copy can be resumed by resume_attachments.
+        """
+        self.journal.begin(src_path, dest_path, label, anchor)
+        return self.journal.move(src_path, dest_path)
+
+    def text_anchors(self, ranges):
+        """
+        Returns, for ranges in document order, where each one's stripped
+        text starts in the body text: (index of its paragraph among the
+        top-level paragraphs and tables, character offset in the paragraph).
+        None for a range outside the body text (a table cell, a frame).
+        The document is enumerated once for all of them.
+        """
+        anchors = []
+        elements = self.text.createEnumeration()
+        index, paragraph = -1, None
+        for text_range in ranges:
+            anchor = None
+            start = text_range.getStart()
+            try:
+                while paragraph is None or self.text.compareRegionStarts(paragraph.getEnd(), start) > 0:
+                    if not elements.hasMoreElements():
+                        break
+                    element = elements.nextElement()
+                    index += 1
+                    if element.supportsService("com.sun.star.text.Paragraph"):
+                        paragraph = element
+                if paragraph is not None and self.text.compareRegionStarts(paragraph, start) >= 0 \
+                        and self.text.compareRegionStarts(paragraph.getEnd(), start) <= 0:
+                    cursor = self.text.createTextCursorByRange(paragraph.getStart())
+                    cursor.gotoRange(start, True)
+                    selected = text_range.getString()
+                    anchor = (index, len(cursor.getString()) + len(selected) - len(selected.lstrip()))
+            except Exception:
+                # Not part of the body text.
+                pass
+            anchors.append(anchor)
+        return anchors
+
+    def anchored_label(self, entry):
+        """
+        Returns the range at a journaled attach's anchor if it still holds
+        the label, unlinked; None if there is no anchor or the text there
+        changed, in which case nothing should be linked.
+        """
+        label, index, offset = entry.get("label"), entry.get("paragraph"), entry.get("label_offset")
+        if not label or index is None:
+            return None
+        elements = self.text.createEnumeration()
+        element = None
+        for _ in range(index + 1):
+            if not elements.hasMoreElements():
+                return None
+            element = elements.nextElement()
+        if not element.supportsService("com.sun.star.text.Paragraph") \
+                or element.getString()[offset:offset + len(label)] != label:
+            return None
+        cursor = self.text.createTextCursorByRange(element.getStart())
+        cursor.goRight(offset, False)
+        cursor.goRight(len(label), True)
+        if cursor.getString() != label or cursor.HyperLinkURL:
+            return None
+        return cursor
 
     # --- 🔗 LibreOffice Hyperlink Injection ---
     def insert_hyperlink(self, text_range, file_path, label):
@@ -88,6 +251,48 @@ class FileManager:
         text_range.HyperLinkName = label
         text_range.HyperLinkTarget = ""
 
+    def insert_hyperlinked_list(self, entries):
+        """
+        Inserts one new paragraph per (label, file path) entry below the
+        paragraph holding the cursor, formatted as a bullet list, each label
+        hyperlinked to its file. One insertString and one list-style call for
+        the whole list, then three bridge calls per entry.
+        """
+        cursor = self.text.createTextCursorByRange(self.view_cursor.getEnd())
+        cursor.gotoEndOfParagraph(False)
+        list_style = cursor.getPropertyValue("NumberingStyleName") or DEFAULT_LIST_STYLE
+        block = "".join(chr(13) + label for label, _ in entries)
+        self.text.insertString(cursor, block, False)
+        cursor.goLeft(len(block) - 1, True)
+        cursor.setPropertyValue("NumberingStyleName", list_style)
+
+        item = self.text.createTextCursorByRange(cursor.getStart())
+        for label, path in entries:
+            item.gotoEndOfParagraph(True)
+            # XMultiPropertySet expects the names in ascending order.
+            item.setPropertyValues(("HyperLinkName", "HyperLinkTarget", "HyperLinkURL"),
+                                   (label, "", uno.systemPathToFileUrl(path)))
+            item.gotoNextParagraph(False)
+
+    def get_input_with_default(self, prompt, title, default_value):
+        """
+        Prompts the user for input using a BASIC input box.
+        Returns the trimmed answer or default_value if input is blank.
+        """
+        script_provider = self.smgr.createInstanceWithContext(
+            "com.sun.star.script.provider.MasterScriptProviderFactory", self.ctx
+        ).createScriptProvider("")
+        script = script_provider.getScript(
+            "vnd.sun.star.script:Standard.Module1.InputBoxWrapper?language=Basic&location=application"
+        )
+        args = (f"{prompt}\nLeave blank to use default: {default_value}", title, "")
+        result_tuple = script.invoke(args, (), ())
+        if result_tuple and isinstance(result_tuple, tuple):
+            result = result_tuple[0]
+            if result and isinstance(result, str) and result.strip():
+                return result.strip()
+        return default_value
+
     # --- 🧾 Error / Info Message ---
     def show_message(self, message, title="Message", boxtype=INFOBOX):
         frame = self.doc.CurrentController.Frame
@@ -96,6 +301,78 @@ class FileManager:
         box = toolkit.createMessageBox(container_window, boxtype, 1, title, message)
         box.execute()
 
+    def ask_yes_no(self, message, title):
+        frame = self.doc.CurrentController.Frame
+        toolkit = self.smgr.createInstance("com.sun.star.awt.Toolkit")
+        box = toolkit.createMessageBox(frame.ContainerWindow, QUERYBOX, BUTTONS_YES_NO, title, message)
+        return box.execute() == YES
+
+    # --- 👯 Duplicate Check ---
+    def existing_copies(self, sources):
+        """
+        Returns {source: attachment} for the sources whose content is already
+        filed below References/, Outputs/ or PDF/, if the user chooses to link
+        those copies instead of moving the duplicates in; {} otherwise.
+        """
+        duplicates = {}
+        for source in sources:
+            existing = find_duplicate(source, self.doc_dir)
+            if existing:
+                duplicates[source] = existing
+        if not duplicates:
+            return {}
+        listing = "\n".join(f"{os.path.basename(source)} = {os.path.relpath(existing, self.doc_dir)}"
+                             for source, existing in list(duplicates.items())[:15])
+        if self.ask_yes_no(f"Already attached:\n{listing}\n\n"
+                           "Link the existing copies instead? (The duplicates are left where they are.)",
+                           "Duplicate Attachments"):
+            return duplicates
+        return {}
+
+    def file_attachments(self, folder_name, sources, stems, anchors=None):
+        """
+        Files sources into folder_name under the (sanitised, unique) stems,
+        moving them concurrently, unless the user chose to link an existing
+        copy. Every move is journaled (with the text_anchors of the labels,
+        if given), and the moved files go through the ingest stage before
+        they are recorded. Returns one entry per source (the attachment
+        path, or the exception that stopped the move), the number of
+        existing copies used and the ingest message line.
+        """
+        existing = self.existing_copies(sources)
+        anchors = anchors or [None] * len(sources)
+        pending = [(source, stem, anchor) for source, stem, anchor in zip(sources, stems, anchors)
+                   if source not in existing]
+        targets = self.unique_target_paths(
+            folder_name, [(stem, os.path.splitext(source)[-1], os.path.getmtime(source))
+                          for source, stem, _ in pending])
+        for (source, stem, anchor), target in zip(pending, targets):
+            self.journal.begin(source, target, stem, anchor)
+        moved = move_files([(source, target) for (source, _, _), target in zip(pending, targets)],
+                           move=self.journal.move)
+        filed = [result for result in moved if not isinstance(result, Exception)]
+        savings = self.ingest(filed)
+        self.record_attachments(folder_name, filed)
+        moved = iter(moved)
+        results = [existing[source] if source in existing else next(moved) for source in sources]
+        return results, len(existing), savings
+
+    # --- 🗜️ Ingest ---
+    def ingest(self, paths):
+        """
+        Optional stage run on freshly moved media: recompresses PNGs losslessly
+        (in parallel) and records the bytes saved next to the document.
+        Returns a line for the confirmation message, or "".
+        """
+        if not self.recompress_png:
+            return ""
+        saved = recompress_pngs(paths)
+        if not saved:
+            return ""
+        stats = record_savings(self.doc_dir, saved)
+        return (f"\nPNG recompression saved {format_size(sum(saved.values()))} "
+                f"({format_size(stats['png_bytes_saved'])} in total).")
+
     # --- 🔧 Entry Method ---
     def attach_latest_media_to(self, folder_name):
         """
@@ -106,19 +383,77 @@ class FileManager:
         - Insert hyperlink over the selected text
         """
         try:
+            self.resume_attachments()
             media_path = self.get_latest_media_file()
             selected_text, text_range = self.get_selected_text_and_range()
 
-            ext = os.path.splitext(media_path)[-1].lower()
-            safe_name = selected_text + ext
-            target_path = self.prepare_target_path(folder_name, safe_name)
-            final_path = self.move_and_rename(media_path, target_path)
+            final_path = self.existing_copies([media_path]).get(media_path)
+            if final_path:
+                self.insert_hyperlink(text_range, final_path, selected_text)
+                self.show_message(f"Linked the existing copy: {os.path.relpath(final_path, self.doc_dir)}",
+                                  "✅ Media Linked")
+                return
+            target_path = self.unique_target_path(folder_name, selected_text, media_path)
+            final_path = self.move_and_rename(media_path, target_path, selected_text,
+                                              self.text_anchors([text_range])[0])
+            savings = self.ingest([final_path])
+            self.record_attachments(folder_name, [final_path])
 
             self.insert_hyperlink(text_range, final_path, selected_text)
-            self.show_message("✅ Media Linked", f"Stored in: {folder_name}/")
+            self.journal.linked([final_path])
+            self.show_message(f"Stored in: {os.path.relpath(final_path, self.doc_dir)}{savings}", "✅ Media Linked")
+
+        except Exception as e:
+            self.show_message(str(e), "❌ Error", boxtype=ERRORBOX)
+
+    def attach_latest_media_burst(self, folder_name):
+        """
+        Burst version of attach_latest_media_to for a whole recording session:
+        - Pairs the N selected ranges (or selected bullet lines), in document
+          order, with the N newest media files, oldest first
+        - Moves all files concurrently on a thread pool
+        - Hyperlinks every range inside one undo step, with the view locked
+        The media folders are listed once; taken or repeated names get a
+        numbered suffix.
+        """
+        try:
+            self.resume_attachments()
+            selections = self.get_selected_ranges()
+            media_files = self.get_latest_files(self.media_sources, len(selections))
+            if len(media_files) < len(selections):
+                raise FileNotFoundError(f"{len(selections)} selections but only {len(media_files)} "
+                                        f"media files in:\n{self.describe_sources(self.media_sources)}")
+
+            results, reused, savings = self.file_attachments(
+                folder_name, media_files, [label for label, _ in selections],
+                self.text_anchors([text_range for _, text_range in selections]))
+            undo_manager = self.doc.getUndoManager()
+            undo_manager.enterUndoContext("Attach media burst")
+            self.doc.lockControllers()
+            try:
+                for (label, text_range), result in zip(selections, results):
+                    if isinstance(result, Exception):
+                        continue
+                    # XMultiPropertySet expects the names in ascending order.
+                    text_range.setPropertyValues(("HyperLinkName", "HyperLinkTarget", "HyperLinkURL"),
+                                                 (label, "", uno.systemPathToFileUrl(result)))
+            finally:
+                self.doc.unlockControllers()
+                undo_manager.leaveUndoContext()
+            self.journal.linked([result for result in results if not isinstance(result, Exception)])
+
+            failed = [f"{os.path.basename(src)}: {result}" for src, result in zip(media_files, results)
+                      if isinstance(result, Exception)]
+            message = f"✅ {len(results) - len(failed)} media files linked.\nStored in: {folder_name}/"
+            if reused:
+                message += f"\n{reused} of them to copies that were already attached."
+            message += savings
+            if failed:
+                message += "\n\nNot moved:\n" + "\n".join(failed)
+            self.show_message(message, "Media Burst", boxtype=ERRORBOX if failed else INFOBOX)
 
         except Exception as e:
-            self.show_message("❌ Error", str(e), boxtype=ERRORBOX)
+            self.show_message(str(e), "❌ Error", boxtype=ERRORBOX)
 
     def attach_latest_document_to_pdf_folder(self, folder_name):
         """
@@ -127,19 +462,240 @@ class FileManager:
         renames it based on selected text, and hyperlinks it in the document.
         """
         try:
+            self.resume_attachments()
             doc_path = self.get_latest_document_file()
             selected_text, text_range = self.get_selected_text_and_range()
 
-            ext = os.path.splitext(doc_path)[-1].lower()
-            safe_name = selected_text + ext
-            target_path = self.prepare_target_path(folder_name, safe_name)
-            final_path = self.move_and_rename(doc_path, target_path)
+            final_path = self.existing_copies([doc_path]).get(doc_path)
+            if final_path:
+                self.insert_hyperlink(text_range, final_path, selected_text)
+                self.show_message(f"Linked the existing copy: {os.path.relpath(final_path, self.doc_dir)}",
+                                  "✅ Document Linked")
+                return
+            target_path = self.unique_target_path(folder_name, selected_text, doc_path)
+            final_path = self.move_and_rename(doc_path, target_path, selected_text,
+                                              self.text_anchors([text_range])[0])
+            self.record_attachments(folder_name, [final_path])
 
             self.insert_hyperlink(text_range, final_path, selected_text)
-            self.show_message("✅ Document Linked", "Stored in: PDF/")
+            self.journal.linked([final_path])
+            self.show_message(f"Stored in: {os.path.relpath(final_path, self.doc_dir)}", "✅ Document Linked")
 
         except Exception as e:
-            self.show_message("❌ Error", str(e), boxtype=ERRORBOX)
+            self.show_message(str(e), "❌ Error", boxtype=ERRORBOX)
+
+
+    def import_folder(self, folder_name, extensions=DOCUMENT_EXTENSIONS, move=True):
+        """
+        Attaches a whole folder at once:
+        - Asks for the source folder (default ~/vmshare) and lists it once
+        - Moves every matching file into the subfolder in parallel
+          (or, with move=False, links the files where they are)
+        - Inserts one hyperlinked bullet list, one paragraph per file
+        """
+        try:
+            self.resume_attachments()
+            source_dir = os.path.expanduser(self.get_input_with_default(
+                "Folder to attach", "Attach Folder", "~/vmshare"))
+            files = list_files(source_dir, extensions)
+            if not files:
+                raise FileNotFoundError(f"No {', '.join(extensions)} files found in:\n{source_dir}")
+
+            reused = 0
+            if move:
+                results, reused, _ = self.file_attachments(
+                    folder_name, files, [os.path.splitext(os.path.basename(path))[0] for path in files])
+            else:
+                results = files
+
+            entries = [(os.path.splitext(os.path.basename(path))[0], result)
+                       for path, result in zip(files, results) if not isinstance(result, Exception)]
+            if entries:
+                undo_manager = self.doc.getUndoManager()
+                undo_manager.enterUndoContext("Attach folder")
+                self.doc.lockControllers()
+                try:
+                    self.insert_hyperlinked_list(entries)
+                finally:
+                    self.doc.unlockControllers()
+                    undo_manager.leaveUndoContext()
+                if move:
+                    self.journal.linked([path for _, path in entries])
+
+            failed = [f"{os.path.basename(src)}: {result}" for src, result in zip(files, results)
+                      if isinstance(result, Exception)]
+            message = f"✅ {len(entries)} files linked."
+            if move:
+                message += f"\nStored in: {folder_name}/"
+            if reused:
+                message += f"\n{reused} of them to copies that were already attached."
+            if failed:
+                message += "\n\nNot moved:\n" + "\n".join(failed[:15])
+            self.show_message(message, "Attach Folder", boxtype=ERRORBOX if failed else INFOBOX)
+
+        except Exception as e:
+            self.show_message(str(e), "❌ Error", boxtype=ERRORBOX)
+
+
+    # --- 🧹 Orphaned Attachments ---
+    def referenced_in_document(self):
+        """
+        Returns the local files hyperlinked from the open document
+        (one property read per text portion, unsaved edits included).
+        """
+        referenced = set()
+        for paragraph in iter_paragraphs(self.text):
+            for portion in iter_portions(paragraph):
+                path = resolve_link_path(portion.HyperLinkURL, self.doc_dir)
+                if path:
+                    referenced.add(path)
+        graphics = self.doc.getGraphicObjects()
+        for name in graphics.getElementNames():
+            graphic = graphics.getByName(name).Graphic
+            # Linked (not embedded) images keep the file they were loaded from.
+            path = resolve_link_path(graphic.getPropertyValue("OriginURL"), self.doc_dir) if graphic else None
+            if path:
+                referenced.add(path)
+        return referenced
+
+    def collect_orphaned_attachments(self, move_to_quarantine=False):
+        """
+        Finds the files in References/, Outputs/ and PDF/ that no document in
+        this folder links to (or shows as an image) any more: the open
+        document is read live, the other documents from their saved
+        content.xml. Reports them with the space they take, and with
+        move_to_quarantine moves them under .attachment_quarantine/ instead
+        of deleting them. Nothing is moved while some document cannot be
+        read, since its attachments would look orphaned.
+        """
+        try:
+            referenced = self.referenced_in_document()
+            saved, unreadable = referenced_by_documents(self.doc_dir, exclude=[self.doc_url])
+            referenced |= saved
+            warning = ""
+            if unreadable:
+                warning = ("\n\nThese documents could not be read; files only they link to are listed too:\n"
+                           + "\n".join(f"{os.path.basename(path)}: {error}" for path, error in unreadable))
+            orphans = find_orphans(self.doc_dir, referenced)
+            total = sum(size for _, size in orphans)
+            if not orphans:
+                self.show_message("No orphaned attachments found." + warning, "Orphaned Attachments")
+                return
+            listing = "\n".join(f"{os.path.relpath(path, self.doc_dir)} ({format_size(size)})"
+                                 for path, size in orphans[:20])
+            if len(orphans) > 20:
+                listing += f"\n... and {len(orphans) - 20} more"
+            print("\n".join(path for path, _ in orphans))
+            if not move_to_quarantine:
+                self.show_message(f"{len(orphans)} unreferenced files, {format_size(total)}:\n{listing}{warning}",
+                                  "Orphaned Attachments")
+                return
+            if unreadable:
+                self.show_message(f"Nothing was moved.{warning}\n\nFix or remove these documents, then try again.",
+                                  "Orphaned Attachments", boxtype=ERRORBOX)
+                return
+            moved, reclaimed = quarantine(orphans, self.doc_dir)
+            self.show_message(f"✅ {len(moved)} of {len(orphans)} unreferenced files moved to "
+                              f"{QUARANTINE_FOLDER}/, {format_size(reclaimed)} reclaimed:\n{listing}",
+                              "Orphaned Attachments")
+        except Exception as e:
+            self.show_message(str(e), "❌ Error", boxtype=ERRORBOX)
+
+
+    # --- ♻️ Interrupted Attaches ---
+    def resume_attachments(self, report=False):
+        """
+        Finishes the attaches the journal shows were interrupted: partial
+        copies continue from their last verified chunk, completed files are
+        renamed into place, recorded in the manifest and, for this document,
+        linked over their label if it is still unlinked at the journaled
+        anchor (see text_anchors); otherwise the file is only filed. Attaches of other documents in the
+        folder wait until one of those runs a FileManager macro. Silent when
+        there is nothing to do, unless report is set.
+        """
+        pending = self.journal.pending()
+        if not pending:
+            if report:
+                self.show_message("No interrupted attaches.", "Resume Attachments")
+            return
+        filed, unlinked, failed = [], [], []
+        for entry in pending:
+            name = os.path.basename(entry["destination"])
+            try:
+                if not self.journal.resume(entry):
+                    failed.append(f"{name}: {entry.get('reason', 'abandoned')}")
+                    continue
+            except OSError as e:
+                failed.append(f"{name}: {e} (will retry)")
+                continue
+            if entry["document"] != self.doc.URL:
+                continue
+            text_range = self.anchored_label(entry)
+            if text_range is None:
+                unlinked.append(entry["destination"])
+                self.journal.abandon(entry, "label not found at its anchor; the file is in place")
+            else:
+                self.insert_hyperlink(text_range, entry["destination"], entry["label"])
+                filed.append(entry["destination"])
+        for path in filed + unlinked:
+            self.record_attachments(os.path.relpath(path, self.doc_dir).split(os.sep)[0], [path])
+        self.journal.linked(filed)
+        if not (filed or unlinked or failed or report):
+            return
+
+        message = f"♻️ {len(filed)} interrupted attaches finished and linked."
+        if unlinked:
+            message += "\n\nFiled, but their link text moved or changed (link them by hand):\n" + "\n".join(
+                os.path.relpath(path, self.doc_dir) for path in unlinked)
+        if failed:
+            message += "\n\nNot finished:\n" + "\n".join(failed)
+        self.show_message(message, "Resume Attachments", boxtype=ERRORBOX if failed else INFOBOX)
+
+    # --- 🩹 Relink ---
+    def relink_attachments(self):
+        """
+        Fixes every file hyperlink of the document whose target no longer
+        exists (after the notes folder was moved or synced to another
+        machine) from the attachment manifest, in one pass and one undo
+        step. The manifest is refreshed from the attachment folders only
+        if some links cannot be resolved from it as it is.
+        """
+        try:
+            broken = []
+            for paragraph in iter_paragraphs(self.text):
+                for portion in iter_portions(paragraph):
+                    if portion.TextPortionType != "Text":
+                        continue
+                    path = resolve_link_path(portion.HyperLinkURL, self.doc_dir)
+                    if path and not os.path.exists(path):
+                        broken.append((self.text.createTextCursorByRange(portion), path))
+            if not broken:
+                self.show_message("No broken file links found.", "Relink Attachments")
+                return
+
+            targets = {path: self.manifest.locate(path) for path in {path for _, path in broken}}
+            if None in targets.values() and self.manifest.refresh():
+                self.manifest.save()
+                targets = {path: target or self.manifest.locate(path) for path, target in targets.items()}
+
+            undo_manager = self.doc.getUndoManager()
+            undo_manager.enterUndoContext("Relink attachments")
+            self.doc.lockControllers()
+            try:
+                for cursor, path in broken:
+                    if targets[path]:
+                        cursor.HyperLinkURL = uno.systemPathToFileUrl(targets[path])
+            finally:
+                self.doc.unlockControllers()
+                undo_manager.leaveUndoContext()
+
+            missing = sorted(path for path, target in targets.items() if not target)
+            message = f"✅ {len(targets) - len(missing)} of {len(targets)} broken file links fixed."
+            if missing:
+                message += "\n\nNot found in the attachment manifest:\n" + "\n".join(missing[:15])
+            self.show_message(message, "Relink Attachments", boxtype=ERRORBOX if missing else INFOBOX)
+        except Exception as e:
+            self.show_message(str(e), "❌ Error", boxtype=ERRORBOX)
 
 
 # --- 🧷 LibreOffice Macro-Compatible Entrypoints ---
@@ -169,6 +725,37 @@ def insert_media_into_outputs_folder():
     """
     FileManager().attach_latest_media_to("Outputs")
 
+def insert_media_burst_into_references_folder():
+    """
+    Function:
+        - Links the N newest media files (oldest first) to the N selected ranges or bullet
+        - lines, moving them into "References" in parallel and linking them in one undo step.
+    """
+    FileManager().attach_latest_media_burst("References")
+
+def insert_media_burst_into_outputs_folder():
+    """
+    Function:
+        - Same as insert_media_burst_into_references_folder, but stores the files in "Outputs".
+    """
+    FileManager().attach_latest_media_burst("Outputs")
+
+def insert_media_into_references_folder_recompressed():
+    """
+    Function:
+        - Same as insert_media_into_references_folder, but recompresses a PNG losslessly
+        - after moving it and reports the bytes saved.
+    """
+    FileManager(recompress_png=True).attach_latest_media_to("References")
+
+def insert_media_burst_into_references_folder_recompressed():
+    """
+    Function:
+        - Same as insert_media_burst_into_references_folder, but recompresses the PNGs
+        - losslessly in parallel and reports the bytes saved.
+    """
+    FileManager(recompress_png=True).attach_latest_media_burst("References")
+
 def insert_latest_pdf_into_document():
     """
         Function:
@@ -178,3 +765,52 @@ def insert_latest_pdf_into_document():
         Shortcut: Ctrl + Shift + Alt + P
     """
     FileManager().attach_latest_document_to_pdf_folder("PDF")
+
+def insert_folder_into_pdf_folder():
+    """
+        Function:
+            - Moves every PDF/DOCX of a folder (default ~/vmshare) into the 'PDF' subfolder
+            - in parallel and inserts them as one hyperlinked bullet list.
+    """
+    FileManager().import_folder("PDF")
+
+def link_folder_in_place():
+    """
+        Function:
+            - Inserts every PDF/DOCX of a folder as one hyperlinked bullet list,
+            - linking the files where they are instead of moving them.
+    """
+    FileManager().import_folder("PDF", move=False)
+
+def report_orphaned_attachments():
+    """
+        Function:
+            - Lists the files in References/, Outputs/ and PDF/ that no document in this
+            - folder links to any more, with the space they take.
+    """
+    FileManager().collect_orphaned_attachments()
+
+def quarantine_orphaned_attachments():
+    """
+        Function:
+            - Moves the unreferenced files of References/, Outputs/ and PDF/ into
+            - .attachment_quarantine/<timestamp>/ and reports the space reclaimed.
+    """
+    FileManager().collect_orphaned_attachments(move_to_quarantine=True)
+
+def relink_attachments():
+    """
+        Function:
+            - Repairs the file links broken by moving the notes folder (or opening it on
+            - another machine) from the attachment manifest, in one pass.
+    """
+    FileManager().relink_attachments()
+
+def resume_interrupted_attachments():
+    """
+        Function:
+            - Finishes attaches cut short by a crash or a dropped share: resumes partial
+            - copies from the last verified chunk and links the files over their text.
+            - Runs automatically before every attach; bind it to "Open Document" to run it earlier.
+    """
+    FileManager().resume_attachments(report=True)
@@ -0,0 +1,398 @@
+import os
+import uno
+from com.sun.star.awt.MessageBoxButtons import BUTTONS_OK, BUTTONS_YES_NO
+from com.sun.star.awt.MessageBoxResults import YES
+from com.sun.star.awt.MessageBoxType import ERRORBOX, INFOBOX, QUERYBOX
+from bookmark_ids import BookmarkIdTable, is_short_id, table_path_for_document
+from bookmark_names import NAME_INDEXES
+from document_changes import DOCUMENT_CHANGES, LINKS
+from edit_plan import CONTENTS_SUFFIX, document_key
+from link_graph import LinkGraph
+from notes_index import workspace_root_for
+from hyperlinks import (LINK_INDEXES, LinkIndex, iter_paragraphs, iter_portions, relative_links_enabled,
+                        set_relative_links, to_relative_url)
+
+
+# --- Hyperlink Manager Class ---
+class HyperlinkManager:
+    def __init__(self, doc=None):
+        self.doc = doc if doc is not None else XSCRIPTCONTEXT.getDocument()
+        self.text = self.doc.Text
+        self.ctx = XSCRIPTCONTEXT.getComponentContext()
+        self.smgr = self.ctx.ServiceManager
+
+    def show_message(self, message, title="Message", boxtype=INFOBOX):
+        """
+        Displays a message box.
+        """
+        frame = self.doc.CurrentController.Frame
+        container_window = frame.ContainerWindow
+        toolkit = self.smgr.createInstance("com.sun.star.awt.Toolkit")
+        box = toolkit.createMessageBox(container_window, boxtype, BUTTONS_OK, title, message)
+        box.execute()
+
+    def rewrite_links_relative(self):
+        """
+        Converts the absolute links in the document to relative form in one
+        streaming pass over the text portions: links into the document become
+        "#bookmark", file:// links to attachments next to the document
+        (References/, Outputs/, PDF/) become relative paths.
+        Returns the number of rewritten links.
+        """
+        doc_url = self.doc.URL
+        if not doc_url:
+            self.show_message("Please save the document before running this macro.",
+                              "Save Required", boxtype=ERRORBOX)
+            return 0
+
+        rewritten = 0
+        undo_manager = self.doc.getUndoManager()
+        undo_manager.enterUndoContext("Rewrite links as relative")
+        self.doc.lockControllers()
+        try:
+            for paragraph in iter_paragraphs(self.text):
+                # Collect first, then write: changing attributes while the
+                # portion enumeration is open can merge the remaining portions.
+                changes = []
+                for portion in iter_portions(paragraph):
+                    if portion.TextPortionType != "Text":
+                        continue
+                    relative_url = to_relative_url(portion.HyperLinkURL, doc_url)
+                    if relative_url is not None:
+                        changes.append((portion, relative_url))
+                for portion, relative_url in changes:
+                    portion.HyperLinkURL = relative_url
+                rewritten += len(changes)
+        finally:
+            self.doc.unlockControllers()
+            undo_manager.leaveUndoContext()
+        return rewritten
+
+    def ask_yes_no(self, message, title):
+        frame = self.doc.CurrentController.Frame
+        toolkit = self.smgr.createInstance("com.sun.star.awt.Toolkit")
+        box = toolkit.createMessageBox(frame.ContainerWindow, QUERYBOX, BUTTONS_YES_NO, title, message)
+        return box.execute() == YES
+
+    def get_workspace_root(self, doc_path):
+        """
+        Returns the notes root (see notes_index.workspace_root_for), asking
+        for the notes folder the first time; None if none was given.
+        """
+        return workspace_root_for(doc_path, ask=lambda suggestion: self.get_input_with_default(
+            "Folder that holds all your notes (asked once)", "Notes Folder", suggestion))
+
+    def get_input_with_default(self, prompt, title, default_value):
+        """
+        Prompts the user for input using a BASIC input box.
+        Returns the trimmed answer or default_value if input is blank.
+        """
+        script_provider = self.smgr.createInstanceWithContext(
+            "com.sun.star.script.provider.MasterScriptProviderFactory", self.ctx
+        ).createScriptProvider("")
+        script = script_provider.getScript(
+            "vnd.sun.star.script:Standard.Module1.InputBoxWrapper?language=Basic&location=application"
+        )
+        args = (f"{prompt}\nLeave blank to use default: {default_value}", title, "")
+        result_tuple = script.invoke(args, (), ())
+        if result_tuple and isinstance(result_tuple, tuple):
+            result = result_tuple[0]
+            if result and isinstance(result, str) and result.strip():
+                return result.strip()
+        return default_value
+
+    def build_link_index(self):
+        """
+        Builds the hyperlink/bookmark inverted index of the document in one pass.
+        """
+        index = LinkIndex.build(self.doc)
+        LINK_INDEXES[document_key(self.doc)] = index
+        return index
+
+    def get_link_index(self):
+        """
+        Returns the cached link index of the document. Paragraphs edited since
+        the last call are re-indexed in place; the index is rebuilt when the
+        set of bookmark names or the paragraph structure changed.
+        """
+        cursors, structural = DOCUMENT_CHANGES.watch(self.doc).take(LINKS)
+        index = LINK_INDEXES.get(document_key(self.doc))
+        if (index is None or structural
+                or index.bookmarks != set(self.doc.getBookmarks().getElementNames())
+                or not index.refresh(self.text, cursors)):
+            index = self.build_link_index()
+        return index
+
+    def get_id_table(self):
+        """
+        Returns the short bookmark ID table of the document if it has one, else None.
+        """
+        if not self.doc.URL:
+            return None
+        doc_path = uno.fileUrlToSystemPath(self.doc.URL)
+        return BookmarkIdTable.for_document(doc_path) if os.path.exists(table_path_for_document(doc_path)) else None
+
+    def bookmark_title(self, name):
+        """
+        Returns the text a bookmark covers: the title of its bullet or heading.
+        """
+        return self.doc.getBookmarks().getByName(name).getAnchor().getString().strip()
+
+    @staticmethod
+    def _plan_rename(index, old_name, new_name, include_descendants=False, id_table=None, title_for=None):
+        """
+        Returns (mapping, affected, paths): old -> new bookmark names, the
+        (link, new target) pairs that have to be rewritten, and old -> new
+        readable paths of the renamed short IDs (for the ID table).
+        Names are compared as readable paths (see bookmark_ids): new_name is
+        a path, and a renamed short ID gets the ID of its new path.
+        With include_descendants, the bookmarks nested below old_name are
+        renamed too. A bookmark is nested below its parent when its path is
+        the parent's path plus its own title (title_for(name), the text it
+        covers), so a sibling whose title merely starts with the same words
+        ("Foo Bar" next to "Foo") is left alone.
+        """
+        def readable(name):
+            return id_table.path_for(name) if id_table is not None else name
+
+        old_path = readable(old_name)
+        renamed = {old_path: old_name}
+        if include_descendants:
+            renamed.update(HyperlinkManager._nested_names(index, old_name, id_table, title_for))
+
+        mapping = {}
+        paths = {}
+        for path, name in renamed.items():
+            new_path = new_name + path[len(old_path):]
+            if id_table is not None and is_short_id(name):
+                new = id_table.id_for(new_path)
+                paths[path] = new_path
+            else:
+                new = new_path
+            mapping[name] = new
+            if name + CONTENTS_SUFFIX in index.bookmarks:
+                mapping[name + CONTENTS_SUFFIX] = new + CONTENTS_SUFFIX
+        clashes = [new for new in mapping.values() if new in index.bookmarks and new not in mapping]
+        if clashes:
+            raise ValueError(f"Bookmark already exists: {readable(clashes[0])}")
+        affected = [(ref, mapping[name]) for name in mapping for ref in index.links_to(name)]
+        return mapping, affected, paths
+
+    @staticmethod
+    def _nested_names(index, name, id_table, title_for):
+        """
+        Returns {readable path: bookmark name} for the bookmarks nested below
+        name. A bookmark is nested below its parent when its path is the
+        parent's path plus its own title (title_for(bookmark)).
+        """
+        def readable(bookmark):
+            return id_table.path_for(bookmark) if id_table is not None else bookmark
+
+        root = readable(name)
+        candidates = {readable(bookmark): bookmark for bookmark in index.bookmarks
+                      if not bookmark.endswith(CONTENTS_SUFFIX) and readable(bookmark).startswith(root + " ")}
+        parents = {root}
+        nested = {}
+        # Parents are shorter than their children, so they are settled first.
+        for path in sorted(candidates, key=len):
+            title = title_for(candidates[path])
+            if title and path.endswith(" " + title) and path[:-len(title) - 1] in parents:
+                parents.add(path)
+                nested[path] = candidates[path]
+        return nested
+
+    def resolve_bookmark_name(self, name, id_table=None):
+        """
+        Returns the bookmark called name, or with short IDs, the ID of the
+        readable path name. Raises ValueError if there is none.
+        """
+        bookmarks = self.doc.getBookmarks()
+        if bookmarks.hasByName(name):
+            return name
+        if id_table is not None and bookmarks.hasByName(id_table.paths.get(name, "")):
+            return id_table.paths[name]
+        raise ValueError(f"Bookmark not found: {name}")
+
+    def nested_bookmarks(self, old_name):
+        """
+        Returns the bookmarks (short IDs shown as paths) a rename of old_name
+        with include_descendants would carry along, besides old_name itself
+        and its " Contents" partner.
+        """
+        id_table = self.get_id_table()
+        old_name = self.resolve_bookmark_name(old_name, id_table)
+        return sorted(self._nested_names(self.get_link_index(), old_name, id_table, self.bookmark_title))
+
+    def rename_bookmark(self, old_name, new_name, include_descendants=False):
+        """
+        Renames old_name to new_name together with its " Contents" partner and
+        rewrites every hyperlink that targets them. With include_descendants,
+        the bookmarks nested below it in the outline (see _plan_rename) are
+        renamed the same way, so renumbering "Section 1 Foo" also renumbers
+        "Section 1 Foo Child". With short IDs, the names are readable paths:
+        renamed IDs are replaced by the IDs of their new paths, and the ID
+        table is updated to match.
+        Work is proportional to the renamed bookmarks and their inbound links:
+        the links are found through the inverted index, not by scanning.
+        Returns (renamed bookmark count, rewritten link count).
+        """
+        bookmarks = self.doc.getBookmarks()
+        id_table = self.get_id_table()
+        old_name = self.resolve_bookmark_name(old_name, id_table)
+
+        index = self.get_link_index()
+        plan = (old_name, new_name, include_descendants, id_table, self.bookmark_title)
+        mapping, affected, paths = self._plan_rename(index, *plan)
+        # A range that no longer carries the indexed URL means the index is stale.
+        if any(portion.HyperLinkURL != ref.url for ref, _ in affected for portion in ref.ranges):
+            index = self.build_link_index()
+            mapping, affected, paths = self._plan_rename(index, *plan)
+
+        undo_manager = self.doc.getUndoManager()
+        undo_manager.enterUndoContext(f"Rename bookmark {old_name}")
+        self.doc.lockControllers()
+        try:
+            for old, new in mapping.items():
+                bookmarks.getByName(old).setName(new)
+                index.bookmarks.discard(old)
+                index.bookmarks.add(new)
+            for ref, new_target in affected:
+                new_url = ref.url.partition("#")[0] + "#" + new_target
+                for portion in ref.ranges:
+                    if portion.HyperLinkName in mapping:
+                        portion.setPropertyValues(("HyperLinkName", "HyperLinkURL"),
+                                                  (mapping[portion.HyperLinkName], new_url))
+                    else:
+                        portion.HyperLinkURL = new_url
+                index.retarget(ref, new_target, new_url)
+        finally:
+            self.doc.unlockControllers()
+            undo_manager.leaveUndoContext()
+        if paths:
+            for old_path in paths:
+                id_table.forget(old_path)
+            for new_path in paths.values():
+                id_table.id_for(new_path)
+            id_table.save()
+        NAME_INDEXES.note_renamed(document_key(self.doc), mapping)
+        # The index was updated in place above; these edits need no refresh.
+        DOCUMENT_CHANGES.watch(self.doc).take(LINKS)
+        return len(mapping), len(affected)
+
+    def format_link_report(self, index, limit=25):
+        """
+        Returns (summary, full_report) listing broken links (their target
+        bookmark is missing) and orphaned bookmarks (nothing links to them).
+        summary is truncated to limit entries per section for the message box.
+        """
+        broken = index.broken_links()
+        orphaned = index.orphaned_bookmarks()
+        broken_lines = [f"¶{ref.paragraph + 1} \"{ref.text}\" -> #{ref.target}" for ref in broken]
+        orphaned_lines = list(orphaned)
+
+        def section(title, lines, cap):
+            shown = lines if cap is None else lines[:cap]
+            body = "\n".join("  " + line for line in shown)
+            if cap is not None and len(lines) > cap:
+                body += f"\n  ... and {len(lines) - cap} more"
+            return f"{title} ({len(lines)}):" + ("\n" + body if body else "")
+
+        header = f"{len(index.links)} links, {len(index.bookmarks)} bookmarks."
+        summary = "\n\n".join([header, section("Broken links", broken_lines, limit),
+                                section("Orphaned bookmarks", orphaned_lines, limit)])
+        full_report = "\n\n".join([header, section("Broken links", broken_lines, None),
+                                    section("Orphaned bookmarks", orphaned_lines, None)])
+        return summary, full_report
+
+
+# --- Module-level API Functions ---
+def rewrite_links_relative():
+    """
+    Function:
+        - Rewrites every absolute link in the document to relative form: "#bookmark" for
+        - links into this document, relative paths for attached media and PDFs, and switches
+        - the document to relative link mode. Links to files are followed correctly once the
+        - document has been saved and reopened.
+    """
+    manager = HyperlinkManager()
+    count = manager.rewrite_links_relative()
+    if manager.doc.URL:
+        set_relative_links(manager.doc, True)
+        manager.show_message(f"✅ {count} links rewritten as relative links.\n"
+                             "Save and reopen the document before following links to files.", "Relative Links")
+
+def toggle_relative_links():
+    """
+    Function:
+        - Switches the document between relative link mode (the bookmark macros write
+        - "#bookmark" links) and absolute links that embed the document URL. The mode is
+        - saved with the document in its "RelativeLinks" custom property.
+    """
+    manager = HyperlinkManager()
+    enabled = not relative_links_enabled(manager.doc)
+    set_relative_links(manager.doc, enabled)
+    if enabled:
+        manager.show_message("New bookmark links are written as \"#bookmark\".", "Relative Links")
+    else:
+        manager.show_message("New bookmark links embed the document URL.", "Relative Links")
+
+def report_broken_links():
+    """
+    Function:
+        - Lists hyperlinks whose target bookmark is missing and bookmarks that no hyperlink
+        - points to (full report is printed to the console). Only paragraphs edited since
+        - the last run are re-scanned.
+    """
+    manager = HyperlinkManager()
+    summary, full_report = manager.format_link_report(manager.get_link_index())
+    print(full_report)
+    manager.show_message(summary, "Link Report", boxtype=INFOBOX)
+
+def rename_bookmark():
+    """
+    Function:
+        - Renames a bookmark and its " Contents" partner and rewrites all hyperlinks that point
+        - at them (e.g. after renumbering a section). Asks before also renaming the bookmarks
+        - nested below it in the outline. With short IDs, names are entered as readable paths.
+    """
+    manager = HyperlinkManager()
+    selected = manager.doc.CurrentController.getViewCursor().getString().strip()
+    old_name = manager.get_input_with_default("Enter the bookmark to rename", "Rename Bookmark", selected)
+    if not old_name:
+        return
+    new_name = manager.get_input_with_default(f"Enter the new name for:\n{old_name}", "Rename Bookmark", "")
+    if not new_name or new_name == old_name:
+        return
+    try:
+        nested = manager.nested_bookmarks(old_name)
+        include_descendants = bool(nested) and manager.ask_yes_no(
+            f"Also rename the {len(nested)} bookmarks nested below \"{old_name}\"?\n"
+            + "\n".join(nested[:15]) + ("\n..." if len(nested) > 15 else ""), "Rename Bookmark")
+        renamed, rewritten = manager.rename_bookmark(old_name, new_name, include_descendants)
+    except ValueError as e:
+        manager.show_message(str(e), "Rename Bookmark", boxtype=ERRORBOX)
+        return
+    manager.show_message(f"✅ {renamed} bookmarks renamed, {rewritten} links updated.", "Rename Bookmark")
+
+def report_link_graph():
+    """
+    Function:
+        - Checks the navigation graph of every note in the workspace: broken links, unreachable
+        - sections, dead ends, missing " Contents" back-links and link cycles (full report is
+        - printed to the console).
+    """
+    manager = HyperlinkManager()
+    if not manager.doc.URL:
+        manager.show_message("Please save the document before running this macro.",
+                             "Save Required", boxtype=ERRORBOX)
+        return
+    root = manager.get_workspace_root(uno.fileUrlToSystemPath(manager.doc.URL))
+    if root is None:
+        return
+    try:
+        graph = LinkGraph.load([root], parallel="thread")
+    except ValueError as e:
+        manager.show_message(str(e), "Notes Folder", boxtype=ERRORBOX)
+        return
+    print(graph.report(limit=None))
+    manager.show_message(graph.report(limit=10), "Link Graph")
@@ -0,0 +1,132 @@
+import os
+import uno
+from com.sun.star.awt.MessageBoxButtons import BUTTONS_OK
+from com.sun.star.awt.MessageBoxType import ERRORBOX, INFOBOX
+from com.sun.star.beans import PropertyValue
+from notes_index import NotesIndex, workspace_root_for
+
+
+# --- Note Search Manager Class ---
+class NoteSearchManager:
+    def __init__(self):
+        self.doc = XSCRIPTCONTEXT.getDocument()
+        self.ctx = XSCRIPTCONTEXT.getComponentContext()
+        self.smgr = self.ctx.ServiceManager
+        self.desktop = self.smgr.createInstanceWithContext("com.sun.star.frame.Desktop", self.ctx)
+
+    def show_message(self, message, title="Message", boxtype=INFOBOX):
+        """
+        Displays a message box.
+        """
+        frame = self.doc.CurrentController.Frame
+        container_window = frame.ContainerWindow
+        toolkit = self.smgr.createInstance("com.sun.star.awt.Toolkit")
+        box = toolkit.createMessageBox(container_window, boxtype, BUTTONS_OK, title, message)
+        box.execute()
+
+    def get_input_with_default(self, prompt, title, default_value):
+        """
+        Prompts the user for input using a BASIC input box.
+        Returns the trimmed answer or default_value if input is blank.
+        """
+        script_provider = self.smgr.createInstanceWithContext(
+            "com.sun.star.script.provider.MasterScriptProviderFactory", self.ctx
+        ).createScriptProvider("")
+        script = script_provider.getScript(
+            "vnd.sun.star.script:Standard.Module1.InputBoxWrapper?language=Basic&location=application"
+        )
+        args = (f"{prompt}\nLeave blank to use default: {default_value}", title, "")
+        result_tuple = script.invoke(args, (), ())
+        if result_tuple and isinstance(result_tuple, tuple):
+            result = result_tuple[0]
+            if result and isinstance(result, str) and result.strip():
+                return result.strip()
+        return default_value
+
+    def get_workspace_root(self, doc_path):
+        """
+        Returns the notes root (see notes_index.workspace_root_for), asking
+        for the notes folder the first time; None if none was given.
+        """
+        return workspace_root_for(doc_path, ask=lambda suggestion: self.get_input_with_default(
+            "Folder that holds all your notes (asked once)", "Notes Folder", suggestion))
+
+    def open_index(self):
+        """
+        Opens the workspace index of the current document and brings it up to
+        date (only documents whose mtime changed are re-parsed).
+        """
+        if not self.doc.URL:
+            self.show_message("Please save the document before searching the notes.",
+                              "Save Required", boxtype=ERRORBOX)
+            raise Exception("Document not saved")
+        root = self.get_workspace_root(uno.fileUrlToSystemPath(self.doc.URL))
+        if root is None:
+            raise Exception("No notes folder")
+        index = NotesIndex(root)
+        try:
+            index.update(parallel="thread")
+        except ValueError as e:
+            index.close()
+            self.show_message(str(e), "Notes Folder", boxtype=ERRORBOX)
+            raise
+        return index
+
+    def open_at_bookmark(self, path, bookmark):
+        """
+        Brings the document at path to the front (loading it if needed) and
+        moves the view cursor to bookmark.
+        """
+        url = uno.systemPathToFileUrl(path)
+        components = self.desktop.getComponents().createEnumeration()
+        while components.hasMoreElements():
+            component = components.nextElement()
+            if getattr(component, "URL", None) == url:
+                frame = component.CurrentController.Frame
+                frame.getContainerWindow().toFront()
+                frame.activate()
+                if bookmark and component.getBookmarks().hasByName(bookmark):
+                    anchor = component.getBookmarks().getByName(bookmark).getAnchor()
+                    component.CurrentController.getViewCursor().gotoRange(anchor.getStart(), False)
+                return component
+        jump_mark = PropertyValue()
+        jump_mark.Name = "JumpMark"
+        jump_mark.Value = bookmark or ""
+        return self.desktop.loadComponentFromURL(url, "_default", 0, (jump_mark,))
+
+    def search_and_open(self):
+        """
+        Prompts for a query, searches every note's paragraphs through FTS5 and
+        opens the chosen hit at its enclosing bookmark.
+        """
+        query = self.get_input_with_default("Search all notes for", "Search Notes", "")
+        if not query:
+            return
+        try:
+            index = self.open_index()
+        except Exception:
+            return
+        with index:
+            hits = index.search(query, limit=15)
+        if not hits:
+            self.show_message(f"No note mentions:\n{query}", "Search Notes")
+            return
+
+        listing = "\n".join(f"{number}. {os.path.basename(path)} › {bookmark or '(start)'}\n    {snippet}"
+                            for number, (path, bookmark, snippet) in enumerate(hits, 1))
+        choice = self.get_input_with_default(f"{listing}\n\nOpen which result?", "Search Notes", "1")
+        try:
+            path, bookmark, _ = hits[int(choice) - 1]
+        except (ValueError, IndexError):
+            return
+        self.open_at_bookmark(path, bookmark)
+
+
+# --- Module-level API Functions ---
+def search_notes():
+    """
+    Function:
+        - Full-text search over every note in the workspace (SQLite FTS5, refreshed by mtime)
+        - and jump straight to the bookmark enclosing the chosen hit.
+    """
+    NoteSearchManager().search_and_open()
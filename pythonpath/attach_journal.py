@@ -0,0 +1,302 @@
+"""
+Write-ahead journal for attach operations.
+
+Attaching a file is several steps that can each be cut short by a crash
+or a dropped VM share: the copy into the notes folder (a move across file
+systems is a copy), the rename into place, removing the source and
+hyperlinking the selected text. AttachJournal logs each step, before the
+next one starts, to JOURNAL_FILENAME in the notes folder (append-only JSON
+Lines, fsynced), so an interrupted attach can be finished later instead
+of leaving a half-copied file or a link to nothing.
+
+Cross-device moves copy in CHUNK_SIZE chunks to a hidden ".<name>.part"
+file next to the destination, logging every chunk after it is on disk.
+resume() continues such a copy from the last chunk whose bytes still
+verify, rather than restarting a multi-GB copy, as long as the source is
+unchanged. Once every logged attach is linked (or abandoned), the journal
+file is removed.
+
+States of an entry, in order: begun -> (chunk ...) -> copied -> committed
+-> linked; abandoned when it cannot be finished.
+"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+JOURNAL_FILENAME = ".attach_journal.jsonl"
+CHUNK_SIZE = 8 * 1024 * 1024
+
+BEGUN = "begun"
+CHUNK = "chunk"
+COPIED = "copied"
+COMMITTED = "committed"
+LINKED = "linked"
+ABANDONED = "abandoned"
+FINISHED = (LINKED, ABANDONED)
+
+
+def temp_path_for(destination):
+    folder, name = os.path.split(destination)
+    return os.path.join(folder, f".{name}.part")
+
+
+def chunk_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class AttachJournal:
+    def __init__(self, doc_dir, document=""):
+        self.path = os.path.join(doc_dir, JOURNAL_FILENAME)
+        self.document = document
+        self.lock = threading.Lock()
+        # Entry id -> merged entry, and destination -> entry id, for this session's attaches.
+        self.entries = {}
+        self.by_destination = {}
+
+    # --- Log ---
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            entry = self.entries.setdefault(record["id"], {})
+            entry.update(record)
+
+    def log(self, entry, state, **fields):
+        self.append(dict(fields, id=entry["id"], state=state))
+        return self.entries[entry["id"]]
+
+    def replay(self):
+        """
+        Reads the journal back into merged entries, in the order they were
+        begun. A torn last line (a crash mid-append) is ignored.
+        """
+        entries = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    entries.setdefault(record["id"], {}).update(record)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def pending(self):
+        """
+        Returns the logged entries that are neither linked nor abandoned.
+        """
+        if not os.path.exists(self.path):
+            return []
+        entries = self.replay()
+        with self.lock:
+            self.entries.update(entries)
+        return [entry for entry in entries.values() if entry["state"] not in FINISHED]
+
+    def compact(self):
+        """
+        Removes the journal once nothing in it is pending.
+        """
+        with self.lock:
+            if all(entry["state"] in FINISHED for entry in self.replay().values()):
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+
+    # --- Attach steps ---
+    def begin(self, source, destination, label="", anchor=None):
+        """
+        Logs the intent to file source as destination and link it as label.
+        anchor is where the label stands in the document, (paragraph index,
+        character offset), so a resume links that text and no other.
+        """
+        stat = os.stat(source)
+        entry_id = uuid.uuid4().hex
+        paragraph, offset = anchor or (None, None)
+        self.append({"id": entry_id, "state": BEGUN, "source": source, "destination": destination,
+                     "temp": temp_path_for(destination), "size": stat.st_size, "mtime": stat.st_mtime_ns,
+                     "document": self.document, "label": label, "paragraph": paragraph,
+                     "label_offset": offset})
+        with self.lock:
+            self.by_destination[destination] = entry_id
+        return self.entries[entry_id]
+
+    def move(self, source, destination):
+        """
+        Moves a begun source to destination: a rename on the same file
+        system, otherwise a journaled chunked copy. Returns destination.
+        A move that fails is abandoned (and its partial copy removed) before
+        the error is raised; only a crash leaves an entry for resume().
+        Usable as attachment_store.move_files' move function.
+        """
+        entry = self.entries[self.by_destination[destination]]
+        try:
+            try:
+                os.rename(source, destination)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                self.copy(entry)
+                self.commit(entry)
+            else:
+                self.log(entry, COMMITTED)
+        except Exception as e:
+            # Once committed the file is in place; only removing the source failed.
+            if entry["state"] != COMMITTED:
+                self.abandon(entry, e)
+            raise
+        return destination
+
+    def copy(self, entry, offset=0, digest=None):
+        """
+        Copies the source into the temp file from offset on (digest holds
+        the hash of the bytes before it), logging every chunk.
+        """
+        digest = digest or hashlib.blake2b(digest_size=16)
+        with open(entry["source"], "rb") as source, open(entry["temp"], "r+b" if offset else "wb") as temp:
+            source.seek(offset)
+            temp.seek(offset)
+            temp.truncate()
+            while True:
+                data = source.read(CHUNK_SIZE)
+                if not data:
+                    break
+                temp.write(data)
+                temp.flush()
+                os.fsync(temp.fileno())
+                digest.update(data)
+                offset += len(data)
+                self.log(entry, CHUNK, offset=offset, chunk_start=offset - len(data), chunk_hash=chunk_hash(data))
+        if offset != entry["size"]:
+            raise OSError(f"{entry['source']} changed while it was copied")
+        self.log(entry, COPIED, hash=digest.hexdigest())
+
+    def commit(self, entry):
+        """
+        Renames the complete temp file into place and removes the source.
+        """
+        if os.path.exists(entry["temp"]) or not os.path.exists(entry["destination"]):
+            os.replace(entry["temp"], entry["destination"])
+            try:
+                shutil.copystat(entry["source"], entry["destination"])
+            except FileNotFoundError:
+                pass
+        # else: the rename was done before an interruption, only its log record is missing.
+        self.log(entry, COMMITTED)
+        try:
+            os.remove(entry["source"])
+        except FileNotFoundError:
+            pass
+
+    def linked(self, destinations):
+        """
+        Logs that destinations are hyperlinked, then compacts the journal.
+        """
+        for destination in destinations:
+            entry_id = self.by_destination.get(destination)
+            if entry_id is not None and self.entries[entry_id]["state"] == COMMITTED:
+                self.log(self.entries[entry_id], LINKED)
+        self.compact()
+
+    def file_info(self, destination):
+        """
+        Returns attachment_manifest-style info (size, mtime, hash) for a
+        destination copied in this session, from the hash taken while
+        copying; None if it was renamed into place, changed or is unknown.
+        """
+        entry_id = self.by_destination.get(destination)
+        entry = self.entries.get(entry_id, {})
+        if "hash" not in entry:
+            return None
+        stat = os.stat(destination)
+        if stat.st_size != entry["size"]:
+            # Rewritten since (e.g. recompressed); the hash is stale.
+            return None
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": entry["hash"]}
+
+    def abandon(self, entry, reason):
+        try:
+            os.remove(entry["temp"])
+        except OSError:
+            pass
+        self.log(entry, ABANDONED, reason=str(reason))
+
+    # --- Recovery ---
+    def verified_offset(self, entry):
+        """
+        Returns (offset, digest) to continue the copy of entry from: the end
+        of the last logged chunk if the temp file still holds it intact,
+        with the hash of everything before it; (0, None) otherwise.
+        """
+        offset = entry.get("offset", 0)
+        if not offset:
+            return 0, None
+        try:
+            if os.path.getsize(entry["temp"]) < offset:
+                return 0, None
+            digest = hashlib.blake2b(digest_size=16)
+            with open(entry["temp"], "rb") as temp:
+                position = 0
+                while position < offset:
+                    data = temp.read(min(CHUNK_SIZE, offset - position))
+                    if not data:
+                        return 0, None
+                    if position == entry["chunk_start"] and chunk_hash(data) != entry["chunk_hash"]:
+                        return 0, None
+                    digest.update(data)
+                    position += len(data)
+        except OSError:
+            return 0, None
+        return offset, digest
+
+    def resume(self, entry):
+        """
+        Finishes the file side of an interrupted attach. Returns True if the
+        file is in place (still to be linked), False if the attach had to be
+        abandoned. Raises OSError (keeping the entry and its partial copy for
+        the next attempt) if the source cannot be read right now.
+        A copied entry whose temp file and destination are both gone is
+        copied again from the source, or abandoned without it; a committed
+        entry whose file has disappeared since is abandoned.
+        """
+        with self.lock:
+            self.entries[entry["id"]] = entry
+            self.by_destination[entry["destination"]] = entry["id"]
+        if entry["state"] == COMMITTED:
+            if os.path.exists(entry["destination"]):
+                return True
+            self.abandon(entry, "the filed copy is gone")
+            return False
+        if entry["state"] == COPIED and (os.path.exists(entry["temp"]) or os.path.exists(entry["destination"])):
+            self.commit(entry)
+            return True
+        # Anything else (including a copy whose temp file was lost) starts
+        # from the source again.
+        try:
+            stat = os.stat(entry["source"])
+        except FileNotFoundError:
+            if os.path.exists(entry["destination"]):
+                self.log(entry, COMMITTED)
+                return True
+            self.abandon(entry, "source is gone")
+            return False
+        if os.path.exists(entry["destination"]):
+            self.abandon(entry, "destination was taken")
+            return False
+        if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime"]):
+            offset, digest = 0, None
+            self.log(entry, BEGUN, size=stat.st_size, mtime=stat.st_mtime_ns, offset=0)
+        else:
+            offset, digest = self.verified_offset(entry)
+        self.copy(entry, offset, digest)
+        self.commit(entry)
+        return True
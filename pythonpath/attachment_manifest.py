@@ -0,0 +1,213 @@
+"""
+Manifest of the attachments filed next to the notes documents of a folder.
+
+With a sharded layout (see attachment_store.shard_subdir) a file's place on
+disk depends on more than its name, so FileManager records every attachment
+it files: the key is the category folder plus the display name
+("References/Login screen.png"), the value the path relative to the notes
+folder ("References/3f/Login screen.png"). Lookups by display name are
+dictionary lookups, and relative paths keep the manifest valid when the
+notes folder moves. It is stored as JSON in MANIFEST_FILENAME and cached
+per folder until the file changes on disk.
+
+Each entry also holds the file's size, mtime and content hash. When the
+notes folder is moved or opened on another machine, the absolute file URLs
+in the documents break; locate() maps such a stale path back to the
+attachment's current place from the manifest alone, so every broken link
+can be fixed in one pass without searching the disk.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from attachment_store import ATTACHMENT_FOLDERS, walk_attachments
+
+MANIFEST_FILENAME = ".attachments.json"
+HASH_CHUNK_SIZE = 1 << 20
+# Hashing is I/O bound (hashlib releases the GIL on large buffers).
+HASH_WORKERS = 4
+
+# Notes folder -> (manifest file mtime, AttachmentManifest).
+_MANIFESTS = {}
+
+
+def manifest_key(folder, name):
+    return f"{folder}/{name}" if folder else name
+
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def describe_file(path):
+    """
+    Returns the size, mtime and hash recorded for the file at path.
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": file_hash(path)}
+
+
+def describe_files(paths, workers=HASH_WORKERS):
+    """
+    Returns describe_file for every path, in order, hashing concurrently.
+    """
+    if len(paths) < 2:
+        return [describe_file(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        return list(pool.map(describe_file, paths))
+
+
+class AttachmentManifest:
+    def __init__(self, doc_dir):
+        self.doc_dir = doc_dir
+        self.path = os.path.join(doc_dir, MANIFEST_FILENAME)
+        self.entries = {}
+        self.dirty = False
+        # Relative path -> key and file name -> keys, built on first locate().
+        self._by_path = None
+        self._by_name = None
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @classmethod
+    def for_folder(cls, doc_dir):
+        """
+        Returns the manifest of doc_dir, reusing the cached one unless the
+        file was changed since it was read.
+        """
+        try:
+            mtime = os.stat(os.path.join(doc_dir, MANIFEST_FILENAME)).st_mtime_ns
+        except OSError:
+            mtime = None
+        cached = _MANIFESTS.get(doc_dir)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        manifest = cls(doc_dir)
+        _MANIFESTS[doc_dir] = (mtime, manifest)
+        return manifest
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, folder, name):
+        """
+        Returns the absolute path filed under folder/name, or None.
+        """
+        entry = self.entries.get(manifest_key(folder, name))
+        return os.path.join(self.doc_dir, *entry["path"].split("/")) if entry else None
+
+    def relative(self, path):
+        return os.path.relpath(path, self.doc_dir).replace(os.sep, "/")
+
+    def add(self, folder, name, path, info=None):
+        """
+        Records that the attachment shown as name in folder is stored at
+        path, with its describe_file info (computed if not given).
+        """
+        self._store(manifest_key(folder, name), path, info or describe_file(path))
+
+    def _store(self, key, path, info):
+        entry = {"path": self.relative(path)}
+        entry.update(info)
+        self.entries[key] = entry
+        self._by_path = self._by_name = None
+        self.dirty = True
+
+    def add_files(self, folder, paths, known=None):
+        """
+        Records every path as filed in folder under its own file name.
+        known maps paths to info already at hand (e.g. hashed while copied);
+        only the others are read.
+        """
+        known = dict(known or {})
+        unknown = [path for path in paths if known.get(path) is None]
+        known.update(zip(unknown, describe_files(unknown)))
+        for path in paths:
+            self.add(folder, os.path.basename(path), path, known[path])
+
+    def refresh(self, folders=ATTACHMENT_FOLDERS):
+        """
+        Brings the manifest in line with the attachment folders: files it
+        does not know (or whose size or mtime changed) are described, entries
+        of files that are gone are dropped. Only new or changed files are
+        read. Returns the number of entries added, updated or dropped.
+        """
+        keys = {entry["path"]: key for key, entry in self.entries.items()}
+        seen = set()
+        stale = []
+        for path, size in walk_attachments(self.doc_dir, folders):
+            relative = self.relative(path)
+            seen.add(relative)
+            entry = self.entries.get(keys.get(relative))
+            if entry is None or entry.get("size") != size or entry.get("mtime") != os.stat(path).st_mtime_ns:
+                stale.append((relative, path))
+        prefixes = tuple(folder + "/" for folder in folders)
+        gone = [key for key, entry in self.entries.items()
+                if entry["path"].startswith(prefixes) and entry["path"] not in seen]
+        for key in gone:
+            del self.entries[key]
+
+        for (relative, path), info in zip(stale, describe_files([path for _, path in stale])):
+            key = keys.get(relative)
+            if key is None:
+                folder = relative.split("/", 1)[0]
+                key = manifest_key(folder, os.path.basename(path))
+                if key in self.entries:
+                    # The same name filed in two shards: key the newcomer by its path.
+                    key = relative
+            self._store(key, path, info)
+        if gone:
+            self._by_path = self._by_name = None
+            self.dirty = True
+        return len(stale) + len(gone)
+
+    def locate(self, path):
+        """
+        Returns where the attachment that a (possibly stale) absolute path
+        refers to is stored now, or None. The longest tail of path that is a
+        recorded relative path wins ("…/old/notes/References/3f/a.png"
+        -> "References/3f/a.png"), then a unique file name. The file must
+        still exist with its recorded size.
+        """
+        if self._by_path is None:
+            self._by_path = {entry["path"]: key for key, entry in self.entries.items()}
+            self._by_name = {}
+            for key, entry in self.entries.items():
+                self._by_name.setdefault(entry["path"].rsplit("/", 1)[-1], []).append(key)
+        parts = os.path.normpath(path).replace(os.sep, "/").split("/")
+        key = None
+        for start in range(max(len(parts) - 4, 0), len(parts)):
+            key = self._by_path.get("/".join(parts[start:]))
+            if key:
+                break
+        if key is None:
+            named = self._by_name.get(parts[-1], ())
+            key = named[0] if len(named) == 1 else None
+        if key is None:
+            return None
+        entry = self.entries[key]
+        current = os.path.join(self.doc_dir, *entry["path"].split("/"))
+        try:
+            size = os.stat(current).st_size
+        except OSError:
+            return None
+        return current if entry.get("size", size) == size else None
+
+    def save(self):
+        """
+        Writes the manifest if it changed since it was loaded.
+        """
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        _MANIFESTS[self.doc_dir] = (os.stat(self.path).st_mtime_ns, self)
@@ -0,0 +1,260 @@
+"""
+File-side helpers for FileManager's attachments.
+
+FileManager moves media and documents into folders next to the note
+(References/, Outputs/, PDF/) and hyperlinks them. The helpers here touch
+only the file system, so batches of files can be handled in one pass
+(a single scandir per folder) and moved on a thread pool while the macro
+does the document edits in one go.
+"""
+import hashlib
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+from notes_index import DOCUMENT_EXTENSIONS as NOTE_EXTENSIONS, parse_document
+
+MEDIA_EXTENSIONS = (".png", ".mp4", ".webm", ".mov", ".avi")
+DOCUMENT_EXTENSIONS = (".pdf", ".docx")
+
+# Subfolders of a note's folder that FileManager files attachments into.
+ATTACHMENT_FOLDERS = ("References", "Outputs", "PDF")
+# Unreferenced attachments are moved here (under the note's folder), not deleted.
+QUARANTINE_FOLDER = ".attachment_quarantine"
+
+# Attachment layouts: every file directly in its category folder, or sharded
+# into subfolders by month ("2024-05") or by a hash prefix of its name ("3f").
+FLAT_LAYOUT = "flat"
+DATE_LAYOUT = "date"
+HASH_LAYOUT = "hash"
+# Two hex digits: at most 256 shards, each holding 1/256 of the files.
+HASH_PREFIX_LENGTH = 2
+
+# Characters that are not allowed (or are risky to sync) in file names, and
+# names Windows reserves whatever their extension.
+_UNSAFE_CHARS = re.compile(r'[\x00-\x1f\x7f<>:"/\\|?*]+')
+_RESERVED_NAMES = {"con", "prn", "aux", "nul", *(f"com{i}" for i in range(1, 10)), *(f"lpt{i}" for i in range(1, 10))}
+# Longest file name stem, in UTF-8 bytes; leaves room for " (NN)" and the extension.
+MAX_STEM_BYTES = 200
+
+# Moves run on this many threads; they are I/O bound (and often on a network share).
+MOVE_WORKERS = 8
+
+
+def list_files(folder, extensions):
+    """
+    Returns the paths of the files in folder whose extension is in
+    extensions, sorted by name, from a single scandir.
+    """
+    with os.scandir(folder) as entries:
+        return sorted((entry.path for entry in entries
+                       if entry.name.lower().endswith(extensions) and entry.is_file()),
+                      key=lambda path: os.path.basename(path).lower())
+
+
+def shard_subdir(name, layout=FLAT_LAYOUT, mtime=None):
+    """
+    Returns the subfolder of its category folder a file named name is filed
+    in under layout ("" for the flat layout). The date layout uses mtime
+    (default: now); the hash prefix depends on the name only, so it is
+    stable across machines.
+    """
+    if layout == DATE_LAYOUT:
+        return time.strftime("%Y-%m", time.localtime(mtime))
+    if layout == HASH_LAYOUT:
+        digest = hashlib.blake2b(name.lower().encode("utf-8"), digest_size=8).hexdigest()
+        return digest[:HASH_PREFIX_LENGTH]
+    if layout != FLAT_LAYOUT:
+        raise ValueError(f"Unknown attachment layout: {layout}")
+    return ""
+
+
+# --- Target names ---
+def sanitize_filename(stem, extension=""):
+    """
+    Returns a file name made from stem (typically the selected text) that is
+    valid on every platform the notes are synced to: separators and control
+    characters become "-", whitespace runs one space, leading/trailing dots
+    and spaces are dropped and the stem is cut to MAX_STEM_BYTES.
+    """
+    stem = " ".join(_UNSAFE_CHARS.sub("-", stem).split()).strip(" .")
+    stem = stem.encode("utf-8")[:MAX_STEM_BYTES].decode("utf-8", "ignore").rstrip(" .")
+    if not stem:
+        stem = "attachment"
+    if stem.lower() in _RESERVED_NAMES:
+        stem += "_"
+    return stem + extension.lower()
+
+
+def numbered_names(filename):
+    """
+    Yields filename, then "stem (2).ext", "stem (3).ext", ...
+    """
+    stem, extension = os.path.splitext(filename)
+    yield filename
+    number = 2
+    while True:
+        yield f"{stem} ({number}){extension}"
+        number += 1
+
+
+class FolderNameIndex:
+    """
+    The (case-folded) names in one folder, from a single scandir. Names are
+    added as they are handed out, so a batch of targets is checked against
+    memory rather than the disk. Cached per folder and rebuilt when the
+    folder's mtime shows it was changed by something else.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        try:
+            self.mtime = os.stat(folder).st_mtime_ns
+            with os.scandir(folder) as entries:
+                self.names = {entry.name.casefold() for entry in entries}
+        except FileNotFoundError:
+            self.mtime = None
+            self.names = set()
+
+    def __contains__(self, name):
+        return name.casefold() in self.names
+
+    def add(self, name):
+        self.names.add(name.casefold())
+
+
+# Folder -> FolderNameIndex.
+_FOLDER_NAMES = {}
+
+
+def folder_names(folder):
+    """
+    Returns the name index of folder, reusing the cached one while the
+    folder's mtime is unchanged (one stat instead of a scandir).
+    """
+    index = _FOLDER_NAMES.get(folder)
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if index is None or index.mtime != mtime:
+        index = _FOLDER_NAMES[folder] = FolderNameIndex(folder)
+    return index
+
+
+def move_files(moves, workers=MOVE_WORKERS, move=shutil.move):
+    """
+    Moves every (source, destination) pair concurrently with move. Returns
+    one entry per pair, in order: the destination path, or the exception
+    that stopped that move.
+    """
+    def move_pair(pair):
+        source, destination = pair
+        try:
+            return move(source, destination)
+        except OSError as e:
+            return e
+
+    if len(moves) < 2:
+        return [move_pair(pair) for pair in moves]
+    with ThreadPoolExecutor(max_workers=min(workers, len(moves))) as pool:
+        return list(pool.map(move_pair, moves))
+
+
+# --- Orphaned attachments ---
+def resolve_link_path(url, doc_dir):
+    """
+    Returns the local file a hyperlink URL points at (file:// URLs and paths
+    relative to doc_dir), or None for bookmarks and web links.
+    """
+    if not url or url.startswith("#"):
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return os.path.normpath(unquote(parsed.path))
+    if parsed.scheme or parsed.netloc:
+        return None
+    return os.path.normpath(os.path.join(doc_dir, unquote(parsed.path)))
+
+
+def walk_attachments(doc_dir, folders=ATTACHMENT_FOLDERS):
+    """
+    Yields (path, size) for every file below the attachment folders of
+    doc_dir, with one scandir per directory. Hidden entries are skipped.
+    """
+    stack = [os.path.join(doc_dir, folder) for folder in folders]
+    while stack:
+        folder = stack.pop()
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield os.path.normpath(entry.path), entry.stat(follow_symlinks=False).st_size
+
+
+def referenced_by_documents(doc_dir, exclude=()):
+    """
+    Returns (referenced, unreadable): the local files linked (or shown as
+    images) from the notes documents saved in doc_dir other than exclude,
+    read offline from their content.xml, and (path, error) for every
+    document that could not be read. The references of an unreadable
+    document are unknown, so callers must not treat files as orphans then.
+    """
+    excluded = {os.path.abspath(path) for path in exclude}
+    referenced = set()
+    unreadable = []
+    with os.scandir(doc_dir) as entries:
+        documents = [entry.path for entry in entries
+                     if entry.name.lower().endswith(NOTE_EXTENSIONS) and not entry.name.startswith(".~lock")]
+    for path in documents:
+        if os.path.abspath(path) in excluded:
+            continue
+        try:
+            _, _, media, _ = parse_document(path)
+        except Exception as e:
+            unreadable.append((path, str(e) or type(e).__name__))
+            continue
+        referenced.update(os.path.normpath(media_path) for media_path in media)
+    return referenced, unreadable
+
+
+def find_orphans(doc_dir, referenced, folders=ATTACHMENT_FOLDERS):
+    """
+    Returns (path, size) for every attachment below doc_dir that is not in
+    referenced, sorted by path.
+    """
+    referenced = {os.path.normcase(path) for path in referenced}
+    return sorted((path, size) for path, size in walk_attachments(doc_dir, folders)
+                  if os.path.normcase(path) not in referenced)
+
+
+def quarantine(orphans, doc_dir):
+    """
+    Moves orphans into a time-stamped folder under QUARANTINE_FOLDER,
+    keeping their paths relative to doc_dir. Returns (moved paths, bytes moved).
+    """
+    batch = os.path.join(doc_dir, QUARANTINE_FOLDER, time.strftime("%Y%m%d-%H%M%S"))
+    moves = []
+    for path, _ in orphans:
+        destination = os.path.join(batch, os.path.relpath(path, doc_dir))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        moves.append((path, destination))
+    results = move_files(moves)
+    moved = [path for (path, _), result in zip(orphans, results) if not isinstance(result, Exception)]
+    sizes = dict(orphans)
+    return moved, sum(sizes[path] for path in moved)
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
@@ -0,0 +1,117 @@
+"""
+Short, stable bookmark IDs.
+
+Hierarchical names such as "Section 1 Root Child Grandchild" grow with every
+level of the outline and are repeated in every hyperlink that points at them.
+With this naming scheme the document only holds a short ID derived from a
+hash of the human-readable path ("bm-k3v9q2mx7a"), and a side table next to
+the document maps each ID back to its path.
+
+The ID depends only on the path, so re-running a macro on the same outline
+produces the same names. On the (unlikely) collision of two paths, the later
+path gets a longer prefix of its hash.
+"""
+import base64
+import hashlib
+import json
+import os
+
+ID_PREFIX = "bm-"
+ID_LENGTH = 10
+TABLE_SUFFIX = ".bookmarks.json"
+
+
+def short_bookmark_id(path, length=ID_LENGTH):
+    """
+    Returns the deterministic short ID for a human-readable bookmark path.
+    """
+    digest = hashlib.blake2b(path.encode("utf-8"), digest_size=20).digest()
+    return ID_PREFIX + base64.b32encode(digest).decode("ascii").lower()[:length]
+
+
+def is_short_id(name):
+    return name.startswith(ID_PREFIX)
+
+
+def table_path_for_document(doc_path):
+    """
+    Returns the path of the ID table that belongs to the document at doc_path
+    ("notes.odt" -> "notes.bookmarks.json" in the same folder).
+    """
+    return os.path.splitext(doc_path)[0] + TABLE_SUFFIX
+
+
+class BookmarkIdTable:
+    """
+    Mapping from short bookmark IDs to human-readable paths, stored as JSON.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.ids = {}
+        self.paths = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for bookmark_id, bookmark_path in json.load(f).items():
+                    self.ids[bookmark_id] = bookmark_path
+                    self.paths[bookmark_path] = bookmark_id
+
+    @classmethod
+    def for_document(cls, doc_path):
+        return cls(table_path_for_document(doc_path))
+
+    def id_for(self, path):
+        """
+        Returns the short ID for path, registering it if it is new.
+        """
+        bookmark_id = self.paths.get(path)
+        if bookmark_id is not None:
+            return bookmark_id
+        length = ID_LENGTH
+        bookmark_id = short_bookmark_id(path, length)
+        while self.ids.get(bookmark_id, path) != path:
+            length += 2
+            bookmark_id = short_bookmark_id(path, length)
+        self.ids[bookmark_id] = path
+        self.paths[path] = bookmark_id
+        self.dirty = True
+        return bookmark_id
+
+    def path_for(self, name):
+        """
+        Returns the human-readable path for a bookmark name. Names that are
+        not short IDs (or are unknown) are returned unchanged.
+        """
+        return self.ids.get(name, name)
+
+    def forget(self, path):
+        """
+        Drops path and its ID from the table (after the bookmark was renamed).
+        """
+        bookmark_id = self.paths.pop(path, None)
+        if bookmark_id is not None:
+            del self.ids[bookmark_id]
+            self.dirty = True
+
+    def readable_names(self, names):
+        """
+        Returns names with every short ID replaced by its path, including
+        the ID of a TOC bookmark ("bm-k3v9q2mx7a Contents" -> "<path> Contents").
+        """
+        readable = []
+        for name in names:
+            head, _, rest = name.partition(" ")
+            readable.append(f"{self.path_for(head)} {rest}" if rest and is_short_id(head) else self.path_for(name))
+        return readable
+
+    def save(self):
+        """
+        Writes the table if it changed since it was loaded.
+        """
+        if not self.dirty or not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.ids, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
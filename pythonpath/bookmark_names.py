@@ -0,0 +1,148 @@
+"""
+Sorted in-memory index of a document's bookmark names.
+
+Parent bookmarks are typed from memory ("Section 3 Foo Bar"), and a typo
+silently starts a disconnected hierarchy. BookmarkNameIndex keeps the names
+in a sorted list so prefix completion, membership and "nearest existing
+ancestor" checks are bisect lookups, fast even with tens of thousands of
+bookmarks. The index is built once per document (one getElementNames call)
+and kept current by the macros that insert or rename bookmarks.
+"""
+import os
+from bisect import bisect_left, insort
+
+# Typing this at the end of a prompt answer asks for completions instead.
+COMPLETION_MARKER = "*"
+
+
+class BookmarkNameIndex:
+    def __init__(self, names=()):
+        self.names = sorted(set(names))
+        # Bumped on every change, so derived indexes know when to rebuild.
+        self.version = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        i = bisect_left(self.names, name)
+        return i < len(self.names) and self.names[i] == name
+
+    def add(self, name):
+        if name not in self:
+            insort(self.names, name)
+            self.version += 1
+
+    def discard(self, name):
+        i = bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            del self.names[i]
+            self.version += 1
+
+    def completions(self, prefix, limit=20):
+        """
+        Returns up to limit names starting with prefix, in sorted order.
+        """
+        result = []
+        i = bisect_left(self.names, prefix)
+        while i < len(self.names) and len(result) < limit and self.names[i].startswith(prefix):
+            result.append(self.names[i])
+            i += 1
+        return result
+
+    def count_completions(self, prefix):
+        """
+        Returns how many names start with prefix (two bisections).
+        """
+        if not prefix:
+            return len(self.names)
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return bisect_left(self.names, upper) - bisect_left(self.names, prefix)
+
+    def extend_prefix(self, prefix):
+        """
+        Returns the longest string every completion of prefix starts with
+        (prefix itself when the completions diverge right away).
+        """
+        first = bisect_left(self.names, prefix)
+        count = self.count_completions(prefix)
+        if not count:
+            return prefix
+        return os.path.commonprefix([self.names[first], self.names[first + count - 1]])
+
+    def nearest_ancestor(self, name):
+        """
+        Returns the longest existing bookmark that name extends by whole
+        words ("Section 3 Foo" for "Section 3 Foo Bar"), or None.
+        """
+        words = name.split(" ")
+        for end in range(len(words) - 1, 0, -1):
+            candidate = " ".join(words[:end])
+            if candidate in self:
+                return candidate
+        return None
+
+
+def check_parent_name(index, value):
+    """
+    Classifies a typed parent bookmark name against the index. Returns
+    (status, candidates):
+     - ("exact", [value])        the bookmark exists;
+     - ("complete", [name])      exactly one bookmark starts with value;
+     - ("ambiguous", names)      several do (the first 15 are returned);
+     - ("unknown", near)         none does; near lists completions of the
+                                 longest matching prefix, to spot typos.
+    A trailing COMPLETION_MARKER is ignored.
+    """
+    value = value.rstrip(COMPLETION_MARKER).rstrip()
+    if value in index:
+        return "exact", [value]
+    matches = index.completions(value, limit=15)
+    if len(matches) == 1:
+        return "complete", matches
+    if matches:
+        return "ambiguous", matches
+    stem = value
+    while stem and not index.count_completions(stem):
+        stem = stem[:-1]
+    return "unknown", index.completions(stem, limit=15) if stem else []
+
+
+class NameIndexCache:
+    """
+    One BookmarkNameIndex per open document, keyed by document key.
+    A cached index is trusted while its size matches the document's
+    bookmark count (one bridge call); otherwise it is rebuilt. With verify
+    (the document was edited since the last call) the names themselves are
+    compared, which also catches bookmarks renamed by hand.
+    """
+    def __init__(self):
+        self.indexes = {}
+
+    def get(self, doc_key, doc, verify=False):
+        bookmarks = doc.getBookmarks()
+        index = self.indexes.get(doc_key)
+        if index is not None and verify:
+            names = bookmarks.getElementNames()
+            if len(names) != len(index) or set(names) != set(index.names):
+                index = None
+        if index is None or len(index) != bookmarks.getCount():
+            index = BookmarkNameIndex(bookmarks.getElementNames())
+            self.indexes[doc_key] = index
+        return index
+
+    def note_inserted(self, doc_key, names):
+        index = self.indexes.get(doc_key)
+        if index is not None:
+            for name in names:
+                index.add(name)
+
+    def note_renamed(self, doc_key, mapping):
+        index = self.indexes.get(doc_key)
+        if index is not None:
+            for old, new in mapping.items():
+                index.discard(old)
+                index.add(new)
+
+
+NAME_INDEXES = NameIndexCache()
@@ -0,0 +1,263 @@
+"""
+Fuzzy bookmark search backed by a trigram index.
+
+Each bookmark name is split into lower-cased character trigrams (padded so
+word starts count). A query collects candidates from the posting lists of
+its rarest trigrams (intersecting posting sets while the set is too large
+and they still narrow it), then scores that bounded candidate set by
+trigram overlap (Dice coefficient) with bonuses for substring and prefix
+matches. A candidate set that stays too large (a query such as "Contents"
+that half the names contain) is ranked rather than truncated: the names
+starting with the query are scored in full, the others in order of
+trigram count, fewest first, and only until the Dice coefficient (which
+falls as names grow) leaves them no chance of ranking. Queries shorter
+than a trigram are matched as name and word prefixes instead. This keeps
+queries in the low milliseconds for ~50k bookmarks.
+
+Renames and new bookmarks are applied to a cached index in place: removed
+names leave tombstones (their id stays reserved but is taken out of every
+posting list), and the index is rebuilt only once most ids are tombstones.
+"""
+import heapq
+from itertools import islice
+
+# Stop intersecting posting sets once one keeps more than this share of the candidates.
+NARROWING_RATIO = 0.9
+
+
+def trigrams(text):
+    """
+    Returns the set of lower-cased trigrams of text, padded at the start
+    with two spaces and at the end with one.
+    """
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self, names=()):
+        self.clear()
+        self.extend(names)
+
+    def clear(self):
+        # Indexed by name id; a discarded name leaves None / "" / empty set / 0.
+        self.names = []
+        self.lowered = []
+        self.grams = []
+        self.gram_counts = []
+        # Live name -> id.
+        self.ids = {}
+        # Trigram count -> ids of the names with that many trigrams.
+        self.by_gram_count = {}
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def extend(self, names):
+        """
+        Adds names to the index (lets a large index be built in slices).
+        """
+        for name in names:
+            if name in self.ids:
+                continue
+            name_id = len(self.names)
+            self.ids[name] = name_id
+            grams = trigrams(name)
+            self.names.append(name)
+            self.lowered.append(name.lower())
+            self.grams.append(grams)
+            self.gram_counts.append(len(grams))
+            self.by_gram_count.setdefault(len(grams), set()).add(name_id)
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(name_id)
+
+    def discard(self, name):
+        """
+        Removes name from the index, leaving a tombstone at its id.
+        """
+        name_id = self.ids.pop(name, None)
+        if name_id is None:
+            return
+        count = self.gram_counts[name_id]
+        self.by_gram_count[count].discard(name_id)
+        if not self.by_gram_count[count]:
+            del self.by_gram_count[count]
+        for gram in self.grams[name_id]:
+            postings = self.postings[gram]
+            postings.discard(name_id)
+            if not postings:
+                del self.postings[gram]
+        self.names[name_id] = None
+        self.lowered[name_id] = ""
+        self.grams[name_id] = set()
+        self.gram_counts[name_id] = 0
+
+    def update(self, names):
+        """
+        Brings the index in line with names: discards the names that are
+        gone and adds the new ones. Rebuilds from scratch instead once
+        tombstones would outnumber the live names.
+        """
+        current = set(names)
+        removed = [name for name in self.ids if name not in current]
+        added = [name for name in names if name not in self.ids]
+        if 2 * (len(self.names) - len(self.ids) + len(removed)) > len(self.names) + len(added):
+            self.clear()
+            self.extend(names)
+            return
+        for name in removed:
+            self.discard(name)
+        self.extend(added)
+
+    def fewest_grams_first(self, *id_sets):
+        """
+        Yields the ids in the union of id_sets, the names with the fewest
+        trigrams first, without building the union.
+        """
+        for count in sorted(self.by_gram_count):
+            bucket = self.by_gram_count[count]
+            yield from set().union(*(bucket & ids for ids in id_sets))
+
+    def search(self, query, limit=20, max_candidates=2000):
+        """
+        Returns up to limit (score, name) pairs for query, best first.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        lowered_query = query.lower()
+        query_grams = trigrams(query)
+        query_size = len(query_grams)
+
+        def score(name_id):
+            common = len(query_grams & self.grams[name_id])
+            value = 2.0 * common / (query_size + self.gram_counts[name_id])
+            position = self.lowered[name_id].find(lowered_query)
+            if position == 0:
+                value += 0.75
+            elif position > 0:
+                value += 0.5
+            return value
+
+        def rank(name_ids, best=()):
+            scored = [(score(name_id), -self.gram_counts[name_id], name_id) for name_id in name_ids]
+            return heapq.nlargest(limit, scored + list(best))
+
+        if len(lowered_query) < 3:
+            best = rank(self.short_query_candidates(lowered_query, limit))
+        else:
+            candidates, rest, rest_bonus = self.trigram_candidates(query_grams, lowered_query, max_candidates)
+            best = rank(candidates)
+            budget = max_candidates - len(candidates)
+            # The rest is scored a trigram count at a time, fewest first, until
+            # no name left can make the cut: the Dice coefficient only falls
+            # as names grow.
+            for count in sorted(self.by_gram_count) if rest else ():
+                if budget <= 0 or (len(best) == limit and count >= query_size and
+                                   2.0 * query_size / (query_size + count) + rest_bonus <= best[-1][0]):
+                    break
+                hits = self.by_gram_count[count] & rest
+                best = rank(islice(hits, budget), best)
+                budget -= len(hits)
+        return [(value, self.names[name_id]) for value, _, name_id in best]
+
+    def short_query_candidates(self, lowered_query, limit):
+        """
+        Candidates for a query shorter than a trigram, which has no trigram
+        of its own to look up: the names starting with it, then the names
+        with a word starting with it, up to limit in all, fewest trigrams
+        first.
+        """
+        word_starts = [postings for gram, postings in self.postings.items()
+                       if gram.startswith(" " + lowered_query)]
+        prefixed = self.postings.get("  " + lowered_query[0], set())
+        if len(lowered_query) > 1:
+            prefixed = prefixed & self.postings.get(" " + lowered_query, set())
+        candidates = list(islice(self.fewest_grams_first(prefixed), limit))
+        if len(candidates) < limit:
+            taken = set(candidates)
+            rest = (name_id for name_id in self.fewest_grams_first(*word_starts) if name_id not in taken)
+            candidates.extend(islice(rest, limit - len(candidates)))
+        return candidates
+
+    def trigram_candidates(self, query_grams, lowered_query, max_candidates):
+        """
+        Splits the names worth scoring for a query of three or more
+        characters into (candidates, rest, rest_bonus): candidates are
+        scored in full; rest, a set too large for that (or None), is scored
+        a trigram count at a time for as long as its names can still rank,
+        its names earning at most rest_bonus for containing the query.
+        """
+        posting_sets = sorted((s for s in (self.postings.get(gram) for gram in query_grams) if s), key=len)
+        if not posting_sets:
+            return (), None, 0.0
+
+        # Start from the rarest trigram. Narrow a large candidate set with the
+        # next rarest ones (skipping any that would empty it, e.g. typos), or
+        # widen a small one so near misses still compete.
+        candidates = posting_sets[0]
+        if len(candidates) <= max_candidates:
+            for postings in posting_sets[1:]:
+                if len(candidates) + len(postings) > max_candidates:
+                    break
+                candidates = candidates | postings
+            return candidates, None, 0.0
+        for postings in posting_sets[1:]:
+            if 2 * len(postings) > len(self):
+                break  # the remaining trigrams are in most names and barely narrow
+            narrowed = candidates & postings
+            if not narrowed:
+                continue
+            shrunk = len(narrowed) < NARROWING_RATIO * len(candidates)
+            candidates = narrowed
+            if len(candidates) <= max_candidates:
+                return candidates, None, 0.0
+            if not shrunk:
+                break  # the trigrams left are mostly of the same words
+
+        # Names starting with the query get the largest bonus: score them all,
+        # unless there are too many to tell apart from the rest.
+        initial = candidates & self.postings.get("  " + lowered_query[0], set())
+        if len(initial) > max_candidates:
+            return (), candidates, 0.75
+        prefixed = {name_id for name_id in initial if self.lowered[name_id].startswith(lowered_query)}
+        return prefixed, candidates - prefixed, 0.5
+
+
+class TrigramIndexCache:
+    """
+    One TrigramIndex per open document, kept in line with the document's
+    BookmarkNameIndex: when that changes (its version or identity), only
+    the added and removed names are applied (see TrigramIndex.update).
+    """
+    def __init__(self):
+        self.entries = {}
+
+    @staticmethod
+    def stamp(name_index):
+        return id(name_index), name_index.version, len(name_index)
+
+    def get(self, doc_key, name_index):
+        entry = self.entries.get(doc_key)
+        if entry is None:
+            return self.store(doc_key, name_index, TrigramIndex(name_index.names))
+        if entry[0] != self.stamp(name_index):
+            entry[1].update(name_index.names)
+            return self.store(doc_key, name_index, entry[1])
+        return entry[1]
+
+    def is_current(self, doc_key, name_index):
+        entry = self.entries.get(doc_key)
+        return entry is not None and entry[0] == self.stamp(name_index)
+
+    def store(self, doc_key, name_index, index, stamp=None):
+        """
+        Caches index, built from the names of name_index as they were when
+        stamp was taken (by default: now).
+        """
+        self.entries[doc_key] = (stamp or self.stamp(name_index), index)
+        return index
+
+
+TRIGRAM_INDEXES = TrigramIndexCache()
@@ -0,0 +1,134 @@
+"""
+Tracks which paragraphs of an open document were edited, so warm caches can
+refresh just those paragraphs instead of being rebuilt.
+
+A ParagraphChangeListener is attached (once) to each document whose caches
+are in use. Every modify event parks a text cursor at the start of the
+paragraph holding the view cursor, which is where the user typed. Each
+cache (a "consumer", e.g. "links") takes its own list of dirty paragraphs
+when it is next used. Edits that cannot be pinned to one paragraph are
+flagged structural and the consumer rebuilds:
+ - edits made while the controllers are locked, i.e. by a macro;
+ - more dirty paragraphs than MAX_DIRTY (a rebuild is cheaper);
+ - the first use of a consumer.
+Edits outside the body text (headers, frames) are ignored: the caches only
+cover the body.
+"""
+import unohelper
+from com.sun.star.util import XModifyListener
+from edit_plan import document_key
+
+# Past this many dirty paragraphs a consumer rebuilds from scratch.
+MAX_DIRTY = 64
+
+# Consumer names.
+LINKS = "links"
+NAMES = "names"
+
+
+class DocumentChanges:
+    """
+    Dirty paragraphs of one document, kept separately for each consumer.
+    """
+    def __init__(self, doc, key):
+        self.doc = doc
+        self.key = key
+        self.pending = {}
+        self.structural = set()
+        self.last = None
+
+    def mark_paragraph(self, cursor):
+        """
+        Records the paragraph starting at cursor as dirty for every consumer.
+        """
+        for consumer, cursors in self.pending.items():
+            if consumer in self.structural:
+                continue
+            if len(cursors) >= MAX_DIRTY:
+                self.structural.add(consumer)
+                cursors.clear()
+            else:
+                cursors.append(cursor)
+
+    def mark_structural(self):
+        self.structural.update(self.pending)
+        for cursors in self.pending.values():
+            cursors.clear()
+        self.last = None
+
+    def take(self, consumer):
+        """
+        Returns (cursors, structural) for consumer and clears them: the
+        cursors sit in paragraphs edited since the consumer's last take;
+        structural means the consumer has to rebuild.
+        """
+        # The next edit has to be recorded even if it is in the same paragraph.
+        self.last = None
+        if consumer not in self.pending:
+            self.pending[consumer] = []
+            return [], True
+        cursors = self.pending[consumer]
+        self.pending[consumer] = []
+        structural = consumer in self.structural
+        self.structural.discard(consumer)
+        return ([] if structural else cursors), structural
+
+    def changed(self, consumer):
+        """
+        Like take(), but only reports whether anything changed.
+        """
+        cursors, structural = self.take(consumer)
+        return structural or bool(cursors)
+
+
+class ParagraphChangeListener(unohelper.Base, XModifyListener):
+    """
+    Marks the paragraph under the view cursor dirty on every modification.
+    """
+    def __init__(self, changes):
+        self.changes = changes
+
+    def modified(self, event):
+        changes = self.changes
+        doc = changes.doc
+        if doc.hasControllersLocked():
+            changes.mark_structural()
+            return
+        text = doc.Text
+        try:
+            cursor = text.createTextCursorByRange(doc.CurrentController.getViewCursor().getStart())
+        except Exception:  # the view cursor is in a header, frame, ...
+            return
+        cursor.gotoStartOfParagraph(False)
+        last = changes.last
+        if last is not None:
+            # Typing pushes the parked cursor right; bring it back first.
+            last.gotoStartOfParagraph(False)
+            if text.compareRegionStarts(cursor, last) == 0:
+                return
+        changes.last = cursor
+        changes.mark_paragraph(cursor)
+
+    def disposing(self, event):
+        DOCUMENT_CHANGES.documents.pop(self.changes.key, None)
+
+
+class ChangeRegistry:
+    """
+    One DocumentChanges per open document, keyed by document key. The
+    listener is attached the first time a document is watched.
+    """
+    def __init__(self):
+        self.documents = {}
+
+    def watch(self, doc):
+        key = document_key(doc)
+        changes = self.documents.get(key)
+        if changes is None:
+            changes = DocumentChanges(doc, key)
+            doc.addModifyListener(ParagraphChangeListener(changes))
+            self.documents[key] = changes
+        return changes
+
+
+DOCUMENT_CHANGES = ChangeRegistry()
@@ -0,0 +1,175 @@
+"""
+Duplicate detection for incoming attachments.
+
+An incoming file is compared with what is already filed in the note's
+attachment folders in stages, each cheaper stage ruling out most
+candidates before the next one reads more: equal size, then a hash of the
+first and last EDGE_BYTES, then a full hash read through mmap. Signatures
+are cached per folder: a folder whose mtime is unchanged is not listed
+again. Rewriting a file in place leaves its folder's mtime alone, so every
+candidate of the right size is statted again before its cached hashes are
+used; they are reused while its size and mtime are unchanged. A check
+against unchanged folders costs one stat per folder and per same-size
+file, plus a dict lookup.
+"""
+import hashlib
+import mmap
+import os
+
+from attachment_store import ATTACHMENT_FOLDERS
+
+EDGE_BYTES = 64 * 1024
+# Full hashes are fed in slices of this size, so mmap pages are released as it goes.
+HASH_SLICE = 8 * 1024 * 1024
+
+
+def edge_hash(path, size):
+    """
+    Hash of the size and the first and last EDGE_BYTES of the file.
+    """
+    digest = hashlib.blake2b(str(size).encode("ascii"), digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(EDGE_BYTES))
+        if size > 2 * EDGE_BYTES:
+            f.seek(size - EDGE_BYTES)
+            digest.update(f.read(EDGE_BYTES))
+        elif size > EDGE_BYTES:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for start in range(0, len(mapped), HASH_SLICE):
+                    digest.update(view[start:start + HASH_SLICE])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+class FileSignature:
+    """
+    Size of one file plus its edge and full hashes, computed on first use.
+    """
+    __slots__ = ("path", "size", "mtime", "_edge", "_full")
+
+    def __init__(self, path, size, mtime):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self._edge = None
+        self._full = None
+
+    @classmethod
+    def of(cls, path):
+        stat = os.stat(path)
+        return cls(path, stat.st_size, stat.st_mtime_ns)
+
+    def is_current(self):
+        """
+        Re-stats the file. Returns False if it is gone; if its size or mtime
+        changed, the cached hashes are dropped and the new size is taken.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if (self.size, self.mtime) != (stat.st_size, stat.st_mtime_ns):
+            self.size, self.mtime = stat.st_size, stat.st_mtime_ns
+            self._edge = self._full = None
+        return True
+
+    def edge(self):
+        if self._edge is None:
+            self._edge = edge_hash(self.path, self.size)
+        return self._edge
+
+    def full(self):
+        if self._full is None:
+            self._full = full_hash(self.path)
+        return self._full
+
+    def same_content(self, other):
+        return (self.size == other.size and self.edge() == other.edge()
+                and self.full() == other.full())
+
+
+class FolderSignatures:
+    """
+    Signatures of the files directly in one folder, grouped by size, from a
+    single scandir. Subfolders are listed separately.
+    """
+    def __init__(self, folder, previous=None):
+        self.folder = folder
+        self.mtime = os.stat(folder).st_mtime_ns
+        self.by_size = {}
+        self.subfolders = []
+        known = {}
+        if previous is not None:
+            for signatures in previous.by_size.values():
+                known.update((s.path, s) for s in signatures)
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    self.subfolders.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    signature = known.get(entry.path)
+                    if signature is None or (signature.size, signature.mtime) != (stat.st_size, stat.st_mtime_ns):
+                        signature = FileSignature(entry.path, stat.st_size, stat.st_mtime_ns)
+                    self.by_size.setdefault(stat.st_size, []).append(signature)
+
+
+# Folder -> FolderSignatures.
+_SIGNATURES = {}
+
+
+def folder_signatures(folder):
+    """
+    Returns the cached signatures of folder, relisting it (and keeping the
+    hashes of unchanged files) only if its mtime changed. None if the
+    folder does not exist.
+    """
+    cached = _SIGNATURES.get(folder)
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except FileNotFoundError:
+        _SIGNATURES.pop(folder, None)
+        return None
+    if cached is None or cached.mtime != mtime:
+        cached = _SIGNATURES[folder] = FolderSignatures(folder, cached)
+    return cached
+
+
+def find_duplicate(path, doc_dir, folders=ATTACHMENT_FOLDERS):
+    """
+    Returns the path of a file below the attachment folders of doc_dir with
+    the same content as path, or None (always for empty files).
+    """
+    incoming = FileSignature.of(path)
+    if incoming.size == 0:
+        return None
+    stack = [os.path.join(doc_dir, folder) for folder in folders]
+    while stack:
+        signatures = folder_signatures(stack.pop())
+        if signatures is None:
+            continue
+        stack.extend(signatures.subfolders)
+        for candidate in signatures.by_size.get(incoming.size, ()):
+            if candidate.path == incoming.path:
+                continue
+            if not candidate.is_current() or candidate.size != incoming.size:
+                # Rewritten or removed without a change to the folder: list it again next time.
+                _SIGNATURES.pop(signatures.folder, None)
+                continue
+            if incoming.same_content(candidate):
+                return candidate.path
+    return None
@@ -0,0 +1,447 @@
+"""
+Edit plans for the bullet-point and bidirectional-link macros.
+
+The managers used to decide what to change and make the change in the same
+loop, so every decision cost a UNO bridge call. Planning now happens in pure
+Python: a planner turns a list of ParagraphSnapshot tuples into an ordered
+list of EditOp tuples, and EditPlanExecutor applies a finished plan to the
+document in one locked, undoable batch.
+
+Plans are keyed by a digest of the snapshot and the planner arguments, so an
+unchanged selection reuses its cached plan, can be previewed (dry run) and
+diffed against the previous plan, and is not applied a second time.
+
+Paragraph references in an EditOp are either the index of a snapshot
+paragraph or the string label of a paragraph inserted by the same plan.
+"""
+import hashlib
+import json
+from collections import OrderedDict, namedtuple
+from itertools import groupby
+
+from bookmark_names import NAME_INDEXES
+
+CONTENTS_SUFFIX = " Contents"
+
+# com.sun.star.awt.FontWeight.BOLD, kept here so planning needs no UNO import.
+BOLD_WEIGHT = 150.0
+
+# --- Edit operation kinds ---
+INSERT_PARAGRAPH = "insert_paragraph"   # para=label, start=end=paragraph to insert before, value=text
+INSERT_BOOKMARK = "insert_bookmark"     # value=bookmark name
+SET_HYPERLINK = "set_hyperlink"         # value=(url, hyperlink name)
+SET_STYLE = "set_style"                 # value=((property, value), ...)
+REPLACE_TEXT = "replace_text"           # value=replacement string
+
+ParagraphSnapshot = namedtuple("ParagraphSnapshot", "index text level char_style")
+ParagraphSnapshot.__new__.__defaults__ = (0, None)
+
+EditOp = namedtuple("EditOp", "kind para start end value")
+
+
+# --- Pure helpers ---
+def title_of(text):
+    """
+    Returns the text before the first colon (stripped), or None if the
+    paragraph has no colon.
+    """
+    if ":" not in text:
+        return None
+    return text.split(":", 1)[0].strip()
+
+
+def link_url(doc_url, bookmark):
+    """
+    Returns the hyperlink URL that jumps to bookmark inside the document.
+    An empty doc_url gives a fragment-only link ("#bookmark").
+    """
+    return doc_url + "#" + bookmark
+
+
+def build_bookmark_chain(lines, levels, base_parent, naming=None):
+    """
+    Given lines and their bullet levels, returns (titles, bookmarks) where
+    each bookmark is the parent's bookmark followed by the line's title.
+    Lines without a colon are skipped. naming, if given, maps each full
+    hierarchical path to the name actually used (e.g. a short bookmark ID).
+    """
+    parent_chain = {}
+    bookmarks = []
+    titles = []
+    for i, line in enumerate(lines):
+        title = title_of(line)
+        if title is None:
+            continue
+        titles.append(title)
+        current_level = levels[i]
+        if current_level == 0:
+            full_bm = base_parent
+        else:
+            parent_bm = parent_chain.get(current_level - 1, base_parent)
+            full_bm = parent_bm + " " + title
+        parent_chain[current_level] = full_bm
+        # Clear any deeper levels from the chain.
+        for k in list(parent_chain.keys()):
+            if k > current_level:
+                del parent_chain[k]
+        bookmarks.append(full_bm)
+    if naming is not None:
+        bookmarks = [naming(path) for path in bookmarks]
+    return titles, bookmarks
+
+
+def _colon_link_ops(para, text, title, bookmark, doc_url):
+    """
+    Bookmarks the title at the start of a paragraph and, when a colon follows
+    it directly, hyperlinks that colon to the bookmark's " Contents" partner.
+    """
+    end = len(title)
+    ops = [EditOp(INSERT_BOOKMARK, para, 0, end, bookmark)]
+    if text[end:end + 1] == ":":
+        contents = bookmark + CONTENTS_SUFFIX
+        ops.append(EditOp(SET_HYPERLINK, para, end, end + 1, (link_url(doc_url, contents), contents)))
+    return ops
+
+
+def _marker_link_ops(snapshot, end, url, name, replacement_char=":"):
+    """
+    Hyperlinks the colon at end of the paragraph to url, replacing it with
+    replacement_char first; no operations if no colon follows the title.
+    """
+    if snapshot.text[end:end + 1] != ":":
+        return []
+    ops = []
+    if replacement_char != ":":
+        ops.append(EditOp(REPLACE_TEXT, snapshot.index, end, end + 1, replacement_char))
+    ops.append(EditOp(SET_HYPERLINK, snapshot.index, end, end + 1, (url, name)))
+    return ops
+
+
+# --- Planners ---
+def plan_bidirectional_link(snapshot, clean_title, main_bookmark, toc_bookmark, doc_url,
+                            replacement_char=":"):
+    """
+    Plans a bidirectional link for a single "Title:" paragraph:
+     1. Main bookmark over the title.
+     2. Marker (the colon) optionally replaced and hyperlinked to the TOC bookmark.
+     3. Navigation line above the paragraph, hyperlinked to the main bookmark
+        and covered by the TOC bookmark.
+    """
+    end = len(clean_title)
+    plan = [EditOp(INSERT_BOOKMARK, snapshot.index, 0, end, main_bookmark)]
+    plan += _marker_link_ops(snapshot, end, link_url(doc_url, toc_bookmark), toc_bookmark, replacement_char)
+    plan.append(EditOp(INSERT_PARAGRAPH, "navigation", snapshot.index, snapshot.index, clean_title))
+    plan.append(EditOp(SET_HYPERLINK, "navigation", 0, end, (link_url(doc_url, main_bookmark), "")))
+    plan.append(EditOp(INSERT_BOOKMARK, "navigation", 0, end, toc_bookmark))
+    return plan
+
+
+def plan_cross_document_link(snapshot, clean_title, main_bookmark, target_bookmark, forward_url,
+                             replacement_char=":"):
+    """
+    Plans a link from a "Title:" paragraph to a bookmark in another document
+    as (bookmark_plan, marker_plan): the main bookmark over the title, and
+    the marker hyperlinked to forward_url. They are applied separately, with
+    the return link in the other document inserted in between.
+    """
+    end = len(clean_title)
+    bookmark_plan = [EditOp(INSERT_BOOKMARK, snapshot.index, 0, end, main_bookmark)]
+    marker_plan = _marker_link_ops(snapshot, end, forward_url, target_bookmark, replacement_char)
+    return bookmark_plan, marker_plan
+
+
+LEVEL_MISMATCH = ("Mismatch between bullet levels and selected lines. "
+                  "Make sure the selection includes only the intended bullet paragraphs.")
+
+
+def levels_match_lines(snapshots, lines):
+    """
+    Tells whether the snapshots (one bullet level each) line up with the
+    selected text split into lines: one line per paragraph, each line part
+    of its paragraph's text (the first and last line may be partial). A
+    paragraph holding a line break, or a selection reaching into something
+    that is not a paragraph, breaks that.
+    """
+    return (len(snapshots) == len(lines)
+            and all(line.strip() in snapshot.text for snapshot, line in zip(snapshots, lines)))
+
+
+def plan_nested_bookmark_summary(snapshots, base_parent, doc_url, separator=", ",
+                                 add_extra_bookmarks=False, naming=None, lines=None):
+    """
+    Plans the nested bookmark summary for a bullet selection:
+     1. Root bullet bookmarked with base_parent, its colon linked to the contents bookmark.
+     2. Summary line inserted above the selection with one hyperlink per title
+        (and, with add_extra_bookmarks, a " Contents" bookmark on each title).
+     3. Every nested bullet bookmarked with its hierarchical name, its colon
+        linked back to the summary.
+    naming is passed on to build_bookmark_chain. lines, the selected text
+    split into lines, must match the snapshots (see levels_match_lines);
+    raises ValueError(LEVEL_MISMATCH) otherwise.
+    """
+    if lines is not None and not levels_match_lines(snapshots, lines):
+        raise ValueError(LEVEL_MISMATCH)
+    bullets = [s for s in snapshots if title_of(s.text) is not None]
+    if not bullets:
+        return []
+    titles, bookmarks = build_bookmark_chain([s.text for s in bullets],
+                                             [s.level for s in bullets], base_parent, naming)
+
+    plan = _colon_link_ops(bullets[0].index, bullets[0].text, titles[0], bookmarks[0], doc_url)
+
+    first = snapshots[0].index
+    plan.append(EditOp(INSERT_PARAGRAPH, "summary", first, first, separator.join(titles)))
+    offset = 0
+    for title, bookmark in zip(titles, bookmarks):
+        end = offset + len(title)
+        plan.append(EditOp(SET_HYPERLINK, "summary", offset, end, (link_url(doc_url, bookmark), title)))
+        if add_extra_bookmarks:
+            plan.append(EditOp(INSERT_BOOKMARK, "summary", offset, end, bookmark + CONTENTS_SUFFIX))
+        offset = end + len(separator)
+
+    for snapshot, title, bookmark in zip(bullets[1:], titles[1:], bookmarks[1:]):
+        plan.extend(_colon_link_ops(snapshot.index, snapshot.text, title, bookmark, doc_url))
+    return plan
+
+
+def plan_title_styles(snapshots):
+    """
+    Plans character-style propagation: the root bullet's title style (read
+    into its snapshot's char_style) is applied, in bold, to every nested title.
+    """
+    plan = []
+    style_stack = {}
+    for snapshot in snapshots:
+        title = title_of(snapshot.text)
+        if title is None:
+            continue
+        level = snapshot.level
+        if level == 0:
+            if snapshot.char_style and snapshot.char_style != "No Character Style":
+                style_stack[level] = snapshot.char_style
+        else:
+            inherited_style = None
+            for lvl in range(level - 1, -1, -1):
+                if lvl in style_stack:
+                    inherited_style = style_stack[lvl]
+                    break
+            if inherited_style:
+                plan.append(EditOp(SET_STYLE, snapshot.index, 0, len(title),
+                                   (("CharStyleName", inherited_style), ("CharWeight", BOLD_WEIGHT))))
+                style_stack[level] = inherited_style
+        for deeper_lvl in list(style_stack.keys()):
+            if deeper_lvl > level:
+                del style_stack[deeper_lvl]
+    return plan
+
+
+# --- Digests, dry runs and diffs ---
+def plan_key(planner_name, snapshots, **params):
+    """
+    Returns a stable digest of the planner name, its parameters and the
+    snapshot content. Equal keys always produce equal plans.
+    """
+    payload = json.dumps([planner_name, sorted(params.items()), [list(s) for s in snapshots]],
+                         ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def describe_op(op):
+    """
+    Returns a one-line, human-readable description of an edit operation.
+    """
+    where = f"[{op.para}] {op.start}:{op.end}"
+    if op.kind == INSERT_PARAGRAPH:
+        return f"insert paragraph '{op.para}' before [{op.start}]: {op.value}"
+    if op.kind == SET_HYPERLINK:
+        return f"hyperlink {where} -> {op.value[0]}"
+    if op.kind == SET_STYLE:
+        return f"style {where} " + ", ".join(f"{k}={v}" for k, v in op.value)
+    if op.kind == REPLACE_TEXT:
+        return f"replace {where} with '{op.value}'"
+    return f"bookmark {where} '{op.value}'"
+
+
+def describe_plan(plan, limit=40):
+    """
+    Returns a multi-line dry-run description of a plan, truncated to limit lines.
+    """
+    lines = [describe_op(op) for op in plan[:limit]]
+    if len(plan) > limit:
+        lines.append(f"... and {len(plan) - limit} more operations")
+    return "\n".join(lines)
+
+
+def diff_plans(old_plan, new_plan):
+    """
+    Returns (removed, added): the operations only in old_plan and only in
+    new_plan, each in plan order.
+    """
+    old_ops = set(old_plan or ())
+    new_ops = set(new_plan)
+    removed = [op for op in (old_plan or ()) if op not in new_ops]
+    added = [op for op in new_plan if op not in old_ops]
+    return removed, added
+
+
+def plan_bookmarks(plan):
+    """
+    Returns the set of bookmark names a plan inserts.
+    """
+    return {op.value for op in plan if op.kind == INSERT_BOOKMARK}
+
+
+class PlanCache:
+    """
+    Bounded LRU cache of plans keyed by plan_key(), plus per-document
+    bookkeeping of which plans were applied and which plan each planner
+    produced last (for diffs). Lives at module level, so it survives across
+    macro invocations for as long as LibreOffice keeps the module loaded.
+    """
+    def __init__(self, max_plans=64):
+        self.max_plans = max_plans
+        self.plans = OrderedDict()
+        self.applied = {}
+        self.last = {}
+
+    def get_or_build(self, key, build):
+        """
+        Returns the cached plan for key, building (and caching) it on a miss.
+        """
+        plan = self.plans.get(key)
+        if plan is None:
+            plan = build()
+            self.plans[key] = plan
+            if len(self.plans) > self.max_plans:
+                self.plans.popitem(last=False)
+        else:
+            self.plans.move_to_end(key)
+        return plan
+
+    def last_plan(self, doc_key, planner_name):
+        """
+        Returns the plan most recently recorded for this document and planner.
+        """
+        return self.last.get((doc_key, planner_name))
+
+    def remember(self, doc_key, planner_name, plan):
+        self.last[(doc_key, planner_name)] = plan
+
+    def was_applied(self, doc_key, key):
+        return key in self.applied.get(doc_key, ())
+
+    def mark_applied(self, doc_key, key):
+        self.applied.setdefault(doc_key, set()).add(key)
+
+
+PLAN_CACHE = PlanCache()
+
+
+def document_key(doc):
+    """
+    Returns a key identifying an open document for the lifetime of the session.
+    """
+    try:
+        return doc.RuntimeUID
+    except AttributeError:
+        return doc.URL
+
+
+# --- Executor ---
+class EditPlanExecutor:
+    """
+    Applies a plan to a Writer document. Paragraph inserts run first, then
+    the remaining operations run paragraph by paragraph with one reusable
+    cursor each, all inside a single undo context with the controllers
+    locked, so the view repaints once and one Undo reverts the whole plan.
+    """
+    def __init__(self, doc):
+        self.doc = doc
+        self.text = doc.Text
+        self.skipped = []
+
+    def is_applied(self, plan):
+        """
+        Returns True if every bookmark the plan would insert already exists.
+        Costs a single bridge call.
+        """
+        names = plan_bookmarks(plan)
+        return bool(names) and names.issubset(self.doc.getBookmarks().getElementNames())
+
+    def apply(self, plan, paragraphs, undo_title="Apply edit plan"):
+        """
+        Applies plan. paragraphs maps snapshot indices to paragraph objects
+        (a list aligned with the snapshot works). Returns the number of
+        operations applied; operations whose range could not be selected are
+        collected in self.skipped.
+        """
+        refs = dict(enumerate(paragraphs)) if isinstance(paragraphs, (list, tuple)) else dict(paragraphs)
+        self.skipped = []
+        undo_manager = self.doc.getUndoManager()
+        undo_manager.enterUndoContext(undo_title)
+        self.doc.lockControllers()
+        applied = 0
+        try:
+            # Consecutive inserts above the same paragraph go in with one call.
+            inserts = [op for op in plan if op.kind == INSERT_PARAGRAPH]
+            for before, ops in groupby(inserts, key=lambda op: op.start):
+                ops = list(ops)
+                for op, paragraph in zip(ops, self._insert_paragraphs(refs[before], [op.value for op in ops])):
+                    refs[op.para] = paragraph
+                    applied += 1
+
+            cursors = {}
+            for op in plan:
+                if op.kind == INSERT_PARAGRAPH:
+                    continue
+                cursor = cursors.get(op.para)
+                if cursor is None:
+                    cursor = self.text.createTextCursorByRange(refs[op.para].getStart())
+                    cursors[op.para] = cursor
+                if not self._select(cursor, op.start, op.end):
+                    self.skipped.append(op)
+                    continue
+                self._apply_op(cursor, op)
+                applied += 1
+        finally:
+            self.doc.unlockControllers()
+            undo_manager.leaveUndoContext()
+        NAME_INDEXES.note_inserted(document_key(self.doc),
+                                   [op.value for op in plan if op.kind == INSERT_BOOKMARK and op not in self.skipped])
+        return applied
+
+    def _insert_paragraphs(self, before, texts):
+        """
+        Inserts one new paragraph per entry of texts directly above the
+        paragraph before, with a single insertString call, and returns the
+        new paragraph objects in order.
+        """
+        block = chr(13).join(texts) + chr(13)
+        cursor = self.text.createTextCursorByRange(before.getStart())
+        self.text.insertString(cursor, block, False)
+        cursor.goLeft(len(block), True)
+        enum = cursor.createEnumeration()
+        return [enum.nextElement() for _ in texts]
+
+    @staticmethod
+    def _select(cursor, start, end):
+        cursor.gotoStartOfParagraph(False)
+        if start and not cursor.goRight(start, False):
+            return False
+        return cursor.goRight(end - start, True)
+
+    def _apply_op(self, cursor, op):
+        if op.kind == INSERT_BOOKMARK:
+            bookmark = self.doc.createInstance("com.sun.star.text.Bookmark")
+            bookmark.Name = op.value
+            self.text.insertTextContent(cursor, bookmark, True)
+        elif op.kind == SET_HYPERLINK:
+            url, name = op.value
+            # XMultiPropertySet expects the names in ascending order.
+            cursor.setPropertyValues(("HyperLinkName", "HyperLinkTarget", "HyperLinkURL"),
+                                     (name, "", url))
+        elif op.kind == SET_STYLE:
+            names, values = zip(*sorted(op.value))
+            cursor.setPropertyValues(names, values)
+        elif op.kind == REPLACE_TEXT:
+            cursor.setString(op.value)
@@ -0,0 +1,374 @@
+"""
+Hyperlink helpers shared by the link, bullet-point and file macros.
+
+Intra-document links used to embed the absolute document URL before
+"#bookmark", which repeats the file URL in every link and breaks every link
+when the document moves. In relative link mode the macros emit
+fragment-only links ("#bookmark") instead, and to_relative_url() turns
+existing absolute file:// links into their relative form.
+
+The mode is kept per document in the "RelativeLinks" user-defined property
+(File > Properties > Custom Properties, or the toggle_relative_links macro);
+RELATIVE_LINKS is the default for documents that do not have it.
+
+Links to other files are written absolute while the document is open:
+Writer resolves a relative HyperLinkURL against the document URL at
+runtime, but ODF resolves it against the package when the file is loaded,
+so "../x.png" only points at the right file after a save and reload, and a
+document-relative "x.png" only until then. Only the bulk rewriter
+(to_relative_url) writes the "../" form, which is what gets saved.
+
+The enumeration helpers only rely on the UNO text API (createEnumeration,
+supportsService), so this module does not import uno itself.
+"""
+import os
+import posixpath
+from collections import namedtuple
+from urllib.parse import quote, unquote, urljoin
+
+# Default link mode for the bookmark macros: True emits "#bookmark" links.
+RELATIVE_LINKS = False
+RELATIVE_LINKS_PROPERTY = "RelativeLinks"
+# com.sun.star.beans.PropertyAttribute.REMOVEABLE
+_REMOVEABLE = 128
+
+
+def relative_links_enabled(doc):
+    """
+    Returns the link mode of doc: its RelativeLinks property, or RELATIVE_LINKS.
+    """
+    properties = doc.getDocumentProperties().getUserDefinedProperties()
+    if properties.getPropertySetInfo().hasPropertyByName(RELATIVE_LINKS_PROPERTY):
+        return bool(properties.getPropertyValue(RELATIVE_LINKS_PROPERTY))
+    return RELATIVE_LINKS
+
+
+def set_relative_links(doc, enabled):
+    """
+    Stores the link mode in doc's RelativeLinks property (saved with the document).
+    """
+    properties = doc.getDocumentProperties().getUserDefinedProperties()
+    if properties.getPropertySetInfo().hasPropertyByName(RELATIVE_LINKS_PROPERTY):
+        properties.setPropertyValue(RELATIVE_LINKS_PROPERTY, bool(enabled))
+    else:
+        properties.addProperty(RELATIVE_LINKS_PROPERTY, _REMOVEABLE, bool(enabled))
+    doc.setModified(True)
+
+
+def document_link(doc_url, bookmark, relative=False):
+    """
+    Returns the hyperlink URL that jumps to bookmark in the document at doc_url.
+    """
+    if relative:
+        return "#" + bookmark
+    return doc_url + "#" + bookmark
+
+
+def to_relative_url(url, doc_url):
+    """
+    Returns the relative form of url as seen from the document at doc_url:
+     - links into the document itself become "#bookmark";
+     - file:// links to files near the document (e.g. FileManager's
+       References/Outputs/PDF folders) become a relative path. ODF resolves
+       relative links against the package, which counts as a folder, so a
+       file next to the document is "../References/x.png". Writer only
+       reads it that way after the document is saved and reopened (see
+       the module docstring).
+    Returns None when url is already relative, is not a file:// URL, shares
+    no folder with the document, or the relative form would not resolve
+    back to url.
+    """
+    if not url or url.startswith("#") or not doc_url:
+        return None
+    base, hash_sign, fragment = url.partition("#")
+    if base == doc_url:
+        return "#" + fragment if hash_sign else None
+    if not (base.startswith("file://") and doc_url.startswith("file://")):
+        return None
+    target_path = base[len("file://"):]
+    doc_dir = posixpath.dirname(doc_url[len("file://"):])
+    if posixpath.commonpath([target_path, doc_dir]) in ("", "/"):
+        return None
+    relative = "../" + posixpath.relpath(target_path, doc_dir)
+    if resolve_relative_url(relative, doc_url) != base:
+        return None
+    return relative + hash_sign + fragment
+
+
+def resolve_relative_url(url, doc_url):
+    """
+    Returns the absolute URL of a relative link in the document at doc_url,
+    resolved against the package the way ODF (and notes_index.resolve_href) does.
+    """
+    return urljoin(doc_url + "/", url)
+
+
+def iter_paragraphs(text):
+    """
+    Yields the paragraphs of a text in document order, descending into text tables.
+    """
+    for paragraph, _ in iter_nested_paragraphs(text):
+        yield paragraph
+
+
+def iter_nested_paragraphs(text, top_level=True):
+    """
+    Like iter_paragraphs, but yields (paragraph, top_level) pairs; top_level
+    is False for paragraphs inside text tables.
+    """
+    enum = text.createEnumeration()
+    while enum.hasMoreElements():
+        element = enum.nextElement()
+        if element.supportsService("com.sun.star.text.Paragraph"):
+            yield element, top_level
+        elif element.supportsService("com.sun.star.text.TextTable"):
+            for cell_name in element.getCellNames():
+                yield from iter_nested_paragraphs(element.getCellByName(cell_name), False)
+
+
+def iter_portions(paragraph):
+    """
+    Yields the text portions (text runs, bookmark marks, ...) of a paragraph.
+    """
+    enum = paragraph.createEnumeration()
+    while enum.hasMoreElements():
+        yield enum.nextElement()
+
+
+def link_target(url, doc_url):
+    """
+    Returns the bookmark an intra-document link points to, or None for links
+    to other documents, files or web pages. A file link with a fragment is
+    intra-document when its base names the document: by its URL, by a
+    relative path to it, or by a file of the same name that does not exist
+    (an absolute link written before the document was moved).
+    """
+    if not url:
+        return None
+    base, hash_sign, fragment = url.partition("#")
+    if hash_sign and (not base or base == doc_url or names_document(base, doc_url)):
+        return fragment
+    return None
+
+
+def names_document(base, doc_url):
+    """
+    Tells whether the file URL (or relative link) base refers to the saved
+    document at doc_url; see link_target.
+    """
+    if not doc_url.startswith("file://"):
+        return False
+    url = resolve_relative_url(base, doc_url)
+    if not url.startswith("file://"):
+        return False
+    path = posixpath.normpath(unquote(url[len("file://"):]))
+    doc_path = posixpath.normpath(unquote(doc_url[len("file://"):]))
+    if path == doc_path:
+        return True
+    return posixpath.basename(path) == posixpath.basename(doc_path) and not os.path.exists(path)
+
+
+LinkRef = namedtuple("LinkRef", "key paragraph text url target ranges")
+
+
+class LinkIndex:
+    """
+    Inverted index of the hyperlinks in a document, built in one pass over the
+    text portions:
+     - links: every hyperlink (consecutive portions with the same URL are
+       merged) with its paragraph number, text, target bookmark and ranges;
+     - inbound: bookmark name -> links that point at it;
+     - bookmarks: the names of the bookmarks present in the document.
+    Entries are grouped by paragraph key (the paragraph number) so single
+    paragraphs can be re-indexed; body keeps the top-level paragraphs in
+    order as (paragraph, key) so refresh() can find an edited one by bisection.
+    """
+    def __init__(self, doc_url=""):
+        self.doc_url = doc_url
+        self.bookmarks = set()
+        self.by_paragraph = {}
+        self.inbound = {}
+        self.body = []
+        self.paragraph_count = 0
+
+    @classmethod
+    def build(cls, doc):
+        """
+        Indexes every paragraph of doc: one property read per text portion,
+        plus a single call for the bookmark names.
+        """
+        index = cls(doc.URL)
+        for _ in index.index_document(doc):
+            pass
+        return index
+
+    def index_document(self, doc):
+        """
+        Fills an empty index from doc, yielding after each paragraph so the
+        work can be spread over several short slices (see CachePrewarmer).
+        """
+        self.bookmarks = set(doc.getBookmarks().getElementNames())
+        for number, (paragraph, top_level) in enumerate(iter_nested_paragraphs(doc.Text)):
+            self.index_paragraph(number, paragraph, number)
+            if top_level:
+                self.body.append((paragraph, number))
+            self.paragraph_count = number + 1
+            yield
+
+    def refresh(self, text, cursors):
+        """
+        Re-indexes the paragraphs holding cursors (text cursors parked in
+        edited paragraphs, see document_changes). Each paragraph is found by
+        bisecting body with compareRegionStarts, so the cost is logarithmic
+        bridge calls plus the portions of the edited paragraphs. Returns False
+        when a paragraph cannot be matched or its neighbours changed
+        (paragraphs were added or removed); the index must then be rebuilt.
+        """
+        refreshed = set()
+        for cursor in cursors:
+            try:
+                cursor.gotoStartOfParagraph(False)
+                position = self._locate(text, cursor)
+                if position is None or not self._same_neighbours(text, position):
+                    return False
+            except Exception:  # a disposed paragraph, or a range in another text
+                return False
+            paragraph, key = self.body[position]
+            if key not in refreshed:
+                refreshed.add(key)
+                self.index_paragraph(key, paragraph, key)
+        return True
+
+    def _locate(self, text, cursor):
+        """
+        Returns the position in body of the paragraph starting at cursor, or None.
+        """
+        low, high = 0, len(self.body)
+        while low < high:
+            middle = (low + high) // 2
+            # 1: cursor starts before the paragraph, -1: after it.
+            order = text.compareRegionStarts(cursor, self.body[middle][0])
+            if order == 0:
+                return middle
+            if order > 0:
+                high = middle
+            else:
+                low = middle + 1
+        return None
+
+    def _same_neighbours(self, text, position):
+        """
+        Returns True when the paragraphs before and after body[position] are
+        still the ones that were indexed next to it.
+        """
+        paragraph, key = self.body[position]
+        for step, move in ((-1, "gotoPreviousParagraph"), (1, "gotoNextParagraph")):
+            cursor = text.createTextCursorByRange(paragraph.getStart())
+            moved = getattr(cursor, move)(False)
+            neighbour = position + step
+            if 0 <= neighbour < len(self.body) and self.body[neighbour][1] == key + step:
+                if not moved or text.compareRegionStarts(cursor, self.body[neighbour][0]) != 0:
+                    return False
+            elif 0 <= key + step < self.paragraph_count:
+                return False  # next to a table; be conservative
+            elif moved:
+                return False
+        return True
+
+    @property
+    def links(self):
+        return [ref for refs in self.by_paragraph.values() for ref in refs]
+
+    def index_paragraph(self, key, paragraph, number=None):
+        """
+        (Re-)indexes the links of one paragraph under key.
+        """
+        self.drop_paragraph(key)
+        refs = []
+        current = None
+        for portion in iter_portions(paragraph):
+            url, portion_type = portion.getPropertyValues(("HyperLinkURL", "TextPortionType"))
+            if portion_type != "Text":
+                continue
+            if not url:
+                current = None
+                continue
+            if current is not None and current.url == url:
+                current.ranges.append(portion)
+                current = current._replace(text=current.text + portion.getString())
+                refs[-1] = current
+                continue
+            current = LinkRef(key, number, portion.getString(), url, link_target(url, self.doc_url), [portion])
+            refs.append(current)
+        self.by_paragraph[key] = refs
+        for ref in refs:
+            if ref.target is not None:
+                self.inbound.setdefault(ref.target, []).append(ref)
+
+    def drop_paragraph(self, key):
+        """
+        Removes the links indexed under key.
+        """
+        for ref in self.by_paragraph.pop(key, ()):
+            if ref.target is None:
+                continue
+            refs = self.inbound.get(ref.target, [])
+            if ref in refs:
+                refs.remove(ref)
+            if not refs:
+                self.inbound.pop(ref.target, None)
+
+    def resolve(self, target):
+        """
+        Returns the existing bookmark a link target names, allowing for
+        percent-encoded fragments, or None if it is dangling.
+        """
+        if target in self.bookmarks:
+            return target
+        decoded = unquote(target)
+        return decoded if decoded in self.bookmarks else None
+
+    def links_to(self, bookmark):
+        """
+        Returns the links whose target is bookmark.
+        """
+        refs = list(self.inbound.get(bookmark, ()))
+        encoded = quote(bookmark)
+        if encoded != bookmark:
+            refs.extend(self.inbound.get(encoded, ()))
+        return refs
+
+    def broken_links(self):
+        """
+        Returns the intra-document links whose target bookmark does not exist.
+        """
+        return [ref for ref in self.links if ref.target is not None and self.resolve(ref.target) is None]
+
+    def orphaned_bookmarks(self):
+        """
+        Returns the bookmarks no link points to, sorted by name.
+        """
+        linked = {self.resolve(target) for target in self.inbound}
+        return sorted(self.bookmarks - linked)
+
+    def retarget(self, ref, new_target, new_url):
+        """
+        Records that the link ref now points at new_target through new_url.
+        Touches only the entries of that link.
+        """
+        old_refs = self.inbound.get(ref.target, [])
+        if ref in old_refs:
+            old_refs.remove(ref)
+        if not old_refs:
+            self.inbound.pop(ref.target, None)
+        new_ref = ref._replace(url=new_url, target=new_target)
+        refs = self.by_paragraph.get(ref.key, [])
+        if ref in refs:
+            refs[refs.index(ref)] = new_ref
+        self.inbound.setdefault(new_target, []).append(new_ref)
+        return new_ref
+
+
+# Link indexes of the open documents, keyed by document key and reused
+# across macro calls.
+LINK_INDEXES = {}
@@ -0,0 +1,418 @@
+"""
+Navigation-graph analytics over one or many notes documents.
+
+Bidirectional links and nested summaries turn the notes into a graph: every
+bookmark is a node, and a hyperlink is an edge from the section it sits in
+(the nearest bookmark opened before it, or the document start) to the
+bookmark it targets. This module extracts that graph by stream-parsing
+content.xml of each .odt (fanned out over a process pool, like
+notes_index) and reports:
+ - broken links: edges to a bookmark that does not exist;
+ - unreachable sections: bookmarks no chain of links leads to from an entry
+   point (by default, the start of every document and its first section,
+   i.e. its first bookmark and that bookmark's "X Contents" partner);
+ - dead ends: bookmarks whose section links nowhere;
+ - missing back-links: "X" / "X Contents" pairs where X does not link to
+   "X Contents" or "X Contents" does not link back to X;
+ - cycles: strongly connected components (iterative Tarjan) other than the
+   expected "X" <-> "X Contents" pairs.
+The graph can be exported as Graphviz DOT or JSON for visualisation.
+
+Run as a script:
+
+    python link_graph.py ~/Notes --dot graph.dot --json graph.json
+"""
+import argparse
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+from notes_index import (BOOKMARK_TAGS, DOCUMENT_EXTENSIONS, HREF_ATTR, LINK_TAG, NAME_ATTR,
+                         resolve_href, scan_documents)
+
+CONTENTS_SUFFIX = " Contents"
+# Bookmark name of the node standing for the start of a document.
+DOCUMENT_START = ""
+
+
+# --- Parsing (runs in worker processes) ---
+def parse_links(doc_path):
+    """
+    Stream-parses content.xml of an ODF package and returns (bookmarks,
+    edges): the bookmark names in document order, and (source bookmark,
+    target document or None for this one, fragment) for every link to a
+    document. The source is the last bookmark opened before the link ends.
+    """
+    bookmarks = []
+    edges = []
+    current = DOCUMENT_START
+    with zipfile.ZipFile(doc_path) as package, package.open("content.xml") as content:
+        for _, element in ElementTree.iterparse(content, events=("end",)):
+            if element.tag in BOOKMARK_TAGS:
+                current = element.get(NAME_ATTR, "")
+                bookmarks.append(current)
+            elif element.tag == LINK_TAG:
+                href = element.get(HREF_ATTR, "")
+                target_path, fragment = resolve_href(href, doc_path)
+                if target_path is None and href.partition("#")[0]:
+                    pass  # web link
+                elif target_path is None or target_path.lower().endswith(DOCUMENT_EXTENSIONS):
+                    edges.append((current, target_path, fragment))
+            element.clear()
+    return bookmarks, edges
+
+
+def _parse_path(path):
+    try:
+        return path, parse_links(path), None
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError) as e:
+        return path, None, str(e)
+
+
+def collect_documents(paths):
+    """
+    Expands folders in paths to the ODF documents below them.
+    """
+    documents = []
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        if os.path.isdir(path):
+            documents.extend(found for found, _, _ in scan_documents(path))
+        else:
+            documents.append(path)
+    return sorted(set(documents))
+
+
+def node_label(node):
+    path, bookmark = node
+    return f"{os.path.basename(path)}#{bookmark}" if bookmark else os.path.basename(path)
+
+
+# --- Graph ---
+class LinkGraph:
+    """
+    Bookmark/hyperlink graph of a set of documents. Nodes are (document
+    path, bookmark name) pairs; (path, DOCUMENT_START) is the document start.
+    """
+    def __init__(self):
+        self.bookmarks = {}
+        # Path -> bookmark names in document order.
+        self.order = {}
+        self.raw_edges = {}
+        self.edges = {}
+        self.broken = []
+        self.errors = {}
+
+    @classmethod
+    def load(cls, paths, parallel="process", workers=None):
+        """
+        Parses every document under paths (files or folders). parallel is
+        "process", "thread" or None (serial), as in NotesIndex.update.
+        """
+        documents = collect_documents(paths)
+        if parallel == "process" and len(documents) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_path, documents, chunksize=8))
+        elif parallel == "thread" and len(documents) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_path, documents))
+        else:
+            results = [_parse_path(path) for path in documents]
+        graph = cls()
+        for path, parsed, error in results:
+            if parsed is None:
+                graph.errors[path] = error
+            else:
+                graph.add_document(path, *parsed)
+        graph.resolve()
+        return graph
+
+    def add_document(self, path, bookmarks, edges):
+        self.bookmarks[path] = set(bookmarks)
+        self.order[path] = list(bookmarks)
+        self.raw_edges[path] = edges
+
+    def resolve(self):
+        """
+        Turns the parsed links into edges between existing nodes. Links to
+        missing bookmarks are collected in broken; links to documents outside
+        the set cannot be checked and are left out.
+        """
+        self.edges = {node: set() for node in self.nodes()}
+        self.broken = []
+        for path, edges in self.raw_edges.items():
+            for source_bookmark, target_path, fragment in edges:
+                source = (path, source_bookmark)
+                target_path = target_path or path
+                names = self.bookmarks.get(target_path)
+                if names is None:
+                    continue
+                if not fragment:
+                    target = (target_path, DOCUMENT_START)
+                elif fragment in names:
+                    target = (target_path, fragment)
+                elif unquote(fragment) in names:
+                    target = (target_path, unquote(fragment))
+                else:
+                    self.broken.append((source, (target_path, fragment)))
+                    continue
+                self.edges[source].add(target)
+
+    def nodes(self):
+        for path, names in self.bookmarks.items():
+            yield path, DOCUMENT_START
+            for name in names:
+                yield path, name
+
+    def bookmark_nodes(self):
+        return [node for node in self.edges if node[1] != DOCUMENT_START]
+
+    # --- Analyses ---
+    def section_of(self, node):
+        """
+        Returns the node of the section node belongs to: "X" for both "X"
+        and "X Contents" (when "X" exists).
+        """
+        path, name = node
+        if name.endswith(CONTENTS_SUFFIX) and name[:-len(CONTENTS_SUFFIX)] in self.bookmarks.get(path, ()):
+            return path, name[:-len(CONTENTS_SUFFIX)]
+        return node
+
+    def default_entries(self):
+        """
+        Returns the entry points a reader starts from: every document start,
+        plus the first section of the document (its first bookmark and the
+        other half of that bookmark's "X" / "X Contents" pair).
+        """
+        entries = []
+        for path, names in self.order.items():
+            entries.append((path, DOCUMENT_START))
+            if names:
+                section = self.section_of((path, names[0]))
+                entries.append(section)
+                contents = (path, section[1] + CONTENTS_SUFFIX)
+                if contents[1] in self.bookmarks[path]:
+                    entries.append(contents)
+        return entries
+
+    def reachable(self, entries=None):
+        """
+        Returns the nodes reachable through links from entries (default:
+        default_entries). A section is only reachable through a chain of
+        links, so an "X" / "X Contents" pair that only links to itself is not.
+        """
+        if entries is None:
+            entries = self.default_entries()
+        seen = set(entries)
+        stack = list(seen)
+        while stack:
+            node = stack.pop()
+            for target in self.edges.get(node, ()):
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return seen
+
+    def unreachable(self, entries=None):
+        reachable = self.reachable(entries)
+        return sorted(node for node in self.bookmark_nodes() if node not in reachable)
+
+    def dead_ends(self):
+        return sorted(node for node in self.bookmark_nodes() if not self.edges[node])
+
+    def missing_backlinks(self):
+        """
+        Returns (node, contents node, missing) for every "X" / "X Contents"
+        pair, missing naming the direction(s) without a link.
+        """
+        result = []
+        for path, names in self.bookmarks.items():
+            for name in names:
+                contents = name + CONTENTS_SUFFIX
+                if contents not in names:
+                    continue
+                node, contents_node = (path, name), (path, contents)
+                missing = []
+                if contents_node not in self.edges[node]:
+                    missing.append("to contents")
+                if node not in self.edges[contents_node]:
+                    missing.append("back to section")
+                if missing:
+                    result.append((node, contents_node, " and ".join(missing)))
+        return sorted(result)
+
+    def strongly_connected_components(self):
+        """
+        Returns the strongly connected components with more than one node
+        (Tarjan's algorithm, iterative so deep chains cannot overflow the stack).
+        """
+        index_of = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        components = []
+        counter = 0
+        for root in self.edges:
+            if root in index_of:
+                continue
+            work = [(root, iter(self.edges[root]))]
+            index_of[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, targets = work[-1]
+                for target in targets:
+                    if target not in index_of:
+                        index_of[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.edges[target])))
+                        break
+                    if target in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index_of[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1:
+                            components.append(sorted(component))
+        return components
+
+    def cycles(self):
+        """
+        Returns the strongly connected components that are not just an
+        "X" <-> "X Contents" pair, largest first.
+        """
+        def is_contents_pair(component):
+            if len(component) != 2:
+                return False
+            (path_a, a), (path_b, b) = component
+            return path_a == path_b and CONTENTS_SUFFIX in (a[len(b):], b[len(a):])
+        return sorted((c for c in self.strongly_connected_components() if not is_contents_pair(c)),
+                      key=len, reverse=True)
+
+    def report(self, entries=None, limit=25):
+        """
+        Returns the analyses as a plain-text report, each list truncated to
+        limit entries (None for no limit).
+        """
+        def section(title, lines):
+            shown = lines if limit is None else lines[:limit]
+            body = "".join("\n  " + line for line in shown)
+            if limit is not None and len(lines) > limit:
+                body += f"\n  ... and {len(lines) - limit} more"
+            return f"{title} ({len(lines)}):{body}"
+
+        edge_count = sum(len(targets) for targets in self.edges.values())
+        header = f"{len(self.bookmarks)} documents, {len(self.bookmark_nodes())} bookmarks, {edge_count} links."
+        sections = [
+            header,
+            section("Broken links", [f"{node_label(s)} -> {node_label(t)}" for s, t in self.broken]),
+            section("Unreachable sections", [node_label(n) for n in self.unreachable(entries)]),
+            section("Dead ends", [node_label(n) for n in self.dead_ends()]),
+            section("Missing back-links", [f"{node_label(n)}: {missing}"
+                                           for n, _, missing in self.missing_backlinks()]),
+            section("Cycles", [f"{len(c)} sections: " + ", ".join(node_label(n) for n in c[:6])
+                               + (" ..." if len(c) > 6 else "") for c in self.cycles()]),
+        ]
+        if self.errors:
+            sections.append(section("Skipped documents", [f"{path}: {error}" for path, error in self.errors.items()]))
+        return "\n\n".join(sections)
+
+    # --- Export ---
+    def to_dot(self, entries=None):
+        """
+        Returns the graph in Graphviz DOT, one cluster per document;
+        unreachable sections are drawn dashed, broken links in red.
+        """
+        def quote(text):
+            return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+        unreachable = set(self.unreachable(entries))
+        ids = {}
+        lines = ["digraph notes {", "  rankdir=LR;", "  node [shape=box, fontsize=10];"]
+        for number, path in enumerate(sorted(self.bookmarks)):
+            lines.append(f"  subgraph cluster_{number} {{")
+            lines.append(f"    label={quote(os.path.basename(path))};")
+            for name in [DOCUMENT_START] + sorted(self.bookmarks[path]):
+                node = (path, name)
+                ids[node] = f"n{len(ids)}"
+                style = ", style=dashed" if node in unreachable else ""
+                lines.append(f"    {ids[node]} [label={quote(name or '(start)')}{style}];")
+            lines.append("  }")
+        for source in sorted(self.edges):
+            for target in sorted(self.edges[source]):
+                lines.append(f"  {ids[source]} -> {ids[target]};")
+        for number, (source, (path, fragment)) in enumerate(self.broken):
+            lines.append(f"  broken{number} [label={quote(fragment)}, color=red, fontcolor=red];")
+            lines.append(f"  {ids[source]} -> broken{number} [color=red];")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self, entries=None):
+        """
+        Returns the graph and its analyses as a JSON-serialisable dict.
+        """
+        reachable = self.reachable(entries)
+        dead_ends = set(self.dead_ends())
+
+        def node_id(node):
+            return f"{node[0]}#{node[1]}"
+
+        return {
+            "nodes": [{"id": node_id(node), "document": node[0], "bookmark": node[1],
+                       "reachable": node in reachable, "dead_end": node in dead_ends}
+                      for node in sorted(self.edges)],
+            "edges": [{"source": node_id(source), "target": node_id(target)}
+                      for source in sorted(self.edges) for target in sorted(self.edges[source])],
+            "broken": [{"source": node_id(source), "document": path, "bookmark": fragment}
+                       for source, (path, fragment) in self.broken],
+            "missing_backlinks": [{"section": node_id(node), "contents": node_id(contents), "missing": missing}
+                                  for node, contents, missing in self.missing_backlinks()],
+            "cycles": [[node_id(node) for node in component] for component in self.cycles()],
+            "errors": self.errors,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the bookmark/hyperlink graph of notes documents.")
+    parser.add_argument("paths", nargs="+", help=".odt files or folders to scan")
+    parser.add_argument("--entry", action="append", default=[],
+                        help="bookmark to treat as an entry point (repeatable; default: the start and "
+                             "first section of every document)")
+    parser.add_argument("--dot", help="write the graph as Graphviz DOT to this file")
+    parser.add_argument("--json", help="write the graph and analyses as JSON to this file")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    parser.add_argument("--limit", type=int, default=25, help="entries shown per section (0 for all)")
+    args = parser.parse_args(argv)
+
+    graph = LinkGraph.load(args.paths, workers=args.workers)
+    entries = None
+    if args.entry:
+        wanted = set(args.entry)
+        entries = [node for node in graph.bookmark_nodes() if node[1] in wanted]
+    print(graph.report(entries, limit=args.limit or None))
+    if args.dot:
+        with open(args.dot, "w", encoding="utf-8") as stream:
+            stream.write(graph.to_dot(entries))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as stream:
+            json.dump(graph.to_json(entries), stream, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+Workspace-wide index of bookmarks, hyperlinks and attached media.
+
+The macros only see the open document. This module keeps a SQLite index of
+every .odt under a notes root so cross-document questions ("which document
+has bookmark X?", "who links to this PDF?") become queries instead of
+opening files:
+
+    files(id, path, mtime, size)
+    bookmarks(file_id, name)
+    links(file_id, href, target_path, fragment, text)
+    media(file_id, path)
+    paragraph_text(id, file_id, bookmark, text) + paragraph_search (FTS5)
+
+paragraph_text holds every paragraph with its nearest enclosing bookmark
+(the last bookmark opened before the end of the paragraph), and the FTS5
+table paragraph_search indexes it for full-text search().
+
+update() is incremental: only documents whose mtime or size changed are
+re-parsed, by stream-parsing content.xml straight out of the zip package,
+fanned out over a process pool. Inside LibreOffice, sys.executable is the
+office binary, so callers there should pass parallel="thread".
+
+Run as a script to refresh an index from the command line:
+
+    python notes_index.py ~/Notes
+"""
+import argparse
+import os
+import sqlite3
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import unquote, urljoin
+from xml.etree import ElementTree
+
+INDEX_FILENAME = ".notes_index.sqlite"
+# Notes root used by the macros. Without it, the macros ask once and
+# remember the answer in NOTES_ROOT_FILE.
+NOTES_ROOT_ENV = "NOTES_ROOT"
+NOTES_ROOT_FILE = os.path.join("~", ".notes_root")
+# A root pointed at the wrong folder (e.g. the home folder) must not turn
+# into a scan of the whole disk.
+MAX_SCAN_DEPTH = 8
+MAX_SCAN_FILES = 20000
+DOCUMENT_EXTENSIONS = (".odt",)
+
+TEXT_NS = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+DRAW_NS = "urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"
+BOOKMARK_TAGS = {f"{{{TEXT_NS}}}bookmark", f"{{{TEXT_NS}}}bookmark-start"}
+PARAGRAPH_TAGS = {f"{{{TEXT_NS}}}p", f"{{{TEXT_NS}}}h"}
+LINK_TAG = f"{{{TEXT_NS}}}a"
+IMAGE_TAG = f"{{{DRAW_NS}}}image"
+NAME_ATTR = f"{{{TEXT_NS}}}name"
+HREF_ATTR = f"{{{XLINK_NS}}}href"
+
+# Bumped when the parser output changes; older indexes are rebuilt from scratch.
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bookmarks (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    href TEXT NOT NULL,
+    target_path TEXT,
+    fragment TEXT,
+    text TEXT
+);
+CREATE TABLE IF NOT EXISTS media (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paragraph_text (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    bookmark TEXT,
+    text TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS paragraph_search USING fts5(
+    text, content='paragraph_text', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS paragraph_text_insert AFTER INSERT ON paragraph_text BEGIN
+    INSERT INTO paragraph_search(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS paragraph_text_delete AFTER DELETE ON paragraph_text BEGIN
+    INSERT INTO paragraph_search(paragraph_search, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE INDEX IF NOT EXISTS paragraph_text_file ON paragraph_text(file_id);
+CREATE INDEX IF NOT EXISTS bookmarks_name ON bookmarks(name);
+CREATE INDEX IF NOT EXISTS bookmarks_file ON bookmarks(file_id);
+CREATE INDEX IF NOT EXISTS links_file ON links(file_id);
+CREATE INDEX IF NOT EXISTS links_target ON links(target_path, fragment);
+CREATE INDEX IF NOT EXISTS media_path ON media(path);
+CREATE INDEX IF NOT EXISTS media_file ON media(file_id);
+"""
+
+
+# --- Parsing (runs in worker processes) ---
+def resolve_href(href, doc_path):
+    """
+    Resolves an ODF hyperlink against the document it appears in.
+    Returns (target_path, fragment): target_path is None for links into the
+    same document and for non-file URLs (web links keep only their fragment).
+    Relative ODF links are relative to the package, i.e. "../x" is next to the file.
+    """
+    base, _, fragment = href.partition("#")
+    if not base:
+        return None, fragment
+    doc_url = "file://" + os.path.abspath(doc_path).replace(os.sep, "/") + "/"
+    url = urljoin(doc_url, base)
+    if not url.startswith("file://"):
+        return None, fragment
+    path = os.path.normpath(unquote(url[len("file://"):]))
+    if path == os.path.abspath(doc_path):
+        return None, fragment
+    return path, fragment
+
+
+def parse_document(doc_path):
+    """
+    Stream-parses content.xml of an ODF package and returns
+    (bookmarks, links, media, paragraphs): bookmark names, (href,
+    target_path, fragment, text) tuples, the attached local files that are
+    not ODF documents themselves (hyperlinked, or shown as linked images),
+    and (bookmark, text) for every non-empty paragraph, bookmark being the
+    nearest one opened before it ends.
+    """
+    package_prefix = os.path.abspath(doc_path) + os.sep
+    bookmarks = []
+    links = []
+    media = []
+    paragraphs = []
+    current_bookmark = None
+    with zipfile.ZipFile(doc_path) as package, package.open("content.xml") as content:
+        link_stack = []
+        paragraph_depth = 0
+        for event, element in ElementTree.iterparse(content, events=("start", "end")):
+            if event == "start":
+                if element.tag == LINK_TAG:
+                    link_stack.append(element.get(HREF_ATTR, ""))
+                elif element.tag in PARAGRAPH_TAGS:
+                    paragraph_depth += 1
+                continue
+            if element.tag in BOOKMARK_TAGS:
+                current_bookmark = element.get(NAME_ATTR, "")
+                bookmarks.append(current_bookmark)
+            elif element.tag == LINK_TAG:
+                href = link_stack.pop()
+                target_path, fragment = resolve_href(href, doc_path)
+                links.append((href, target_path, fragment, "".join(element.itertext())))
+                if target_path and not target_path.lower().endswith(DOCUMENT_EXTENSIONS):
+                    media.append(target_path)
+            elif element.tag == IMAGE_TAG:
+                target_path, _ = resolve_href(element.get(HREF_ATTR, ""), doc_path)
+                # Images embedded in the package ("Pictures/...") are not attachments.
+                if target_path and not target_path.startswith(package_prefix):
+                    media.append(target_path)
+            elif element.tag in PARAGRAPH_TAGS:
+                paragraph_depth -= 1
+                text = "".join(element.itertext()).strip()
+                if text:
+                    paragraphs.append((current_bookmark, text))
+            if not link_stack and not paragraph_depth:
+                # Keep memory flat on large documents; links and paragraphs
+                # still need the text of their children until they end.
+                element.clear()
+    return bookmarks, links, media, paragraphs
+
+
+def _parse_entry(entry):
+    path, mtime, size = entry
+    try:
+        return path, mtime, size, parse_document(path), None
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError) as e:
+        return path, mtime, size, None, str(e)
+
+
+def scan_documents(root, max_depth=MAX_SCAN_DEPTH, max_files=MAX_SCAN_FILES):
+    """
+    Yields (path, mtime, size) for every ODF document under root,
+    skipping hidden folders and LibreOffice lock files. Folders more than
+    max_depth levels below root are not entered; raises ValueError once
+    more than max_files documents were found.
+    """
+    stack = [(root, 0)]
+    found = 0
+    while stack:
+        folder, depth = stack.pop()
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if depth < max_depth:
+                    stack.append((entry.path, depth + 1))
+            elif entry.name.lower().endswith(DOCUMENT_EXTENSIONS):
+                found += 1
+                if found > max_files:
+                    raise ValueError(f"More than {max_files} documents under {root}; "
+                                     f"point {NOTES_ROOT_ENV} or {NOTES_ROOT_FILE} at your notes folder.")
+                stat = entry.stat()
+                yield os.path.abspath(entry.path), stat.st_mtime, stat.st_size
+
+
+def configured_root():
+    """
+    Returns the configured notes root: $NOTES_ROOT, otherwise the root
+    remembered in NOTES_ROOT_FILE, otherwise None.
+    """
+    root = os.environ.get(NOTES_ROOT_ENV)
+    if not root:
+        try:
+            with open(os.path.expanduser(NOTES_ROOT_FILE), encoding="utf-8") as f:
+                root = f.read().strip()
+        except OSError:
+            return None
+    return os.path.abspath(os.path.expanduser(root)) if root else None
+
+
+def remember_root(root):
+    """
+    Stores root in NOTES_ROOT_FILE for configured_root().
+    """
+    with open(os.path.expanduser(NOTES_ROOT_FILE), "w", encoding="utf-8") as f:
+        f.write(root + "\n")
+
+
+def workspace_root_for(doc_path, ask=None):
+    """
+    Returns the notes root for a document (see configured_root). The root is
+    never guessed: when none is configured, ask(suggestion) is called with
+    the folder above the document's own folder (each note lives in a folder
+    next to its References/Outputs/PDF subfolders), and a folder it returns
+    is remembered. Returns None when no root is configured or chosen.
+    """
+    root = configured_root()
+    if root or ask is None:
+        return root
+    root = ask(os.path.dirname(os.path.dirname(os.path.abspath(doc_path))))
+    if not root or not os.path.isdir(os.path.expanduser(root)):
+        return None
+    root = os.path.abspath(os.path.expanduser(root))
+    remember_root(root)
+    return root
+
+
+def fts_query(text):
+    """
+    Turns free text into an FTS5 query: every word quoted (so punctuation is
+    literal) and required, the last one matched as a prefix.
+    """
+    words = text.split()
+    if not words:
+        return ""
+    quoted = ['"' + word.replace('"', '""') + '"' for word in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+# --- Index ---
+class NotesIndex:
+    """
+    Incrementally maintained SQLite index of a notes folder.
+    """
+    def __init__(self, root, db_path=None):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.db_path = db_path or os.path.join(self.root, INDEX_FILENAME)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with self.db:
+                self.db.execute("DELETE FROM files")
+                self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.errors = {}
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, parallel="process", workers=None):
+        """
+        Re-indexes documents that are new or whose mtime/size changed and
+        drops documents that disappeared. parallel is "process", "thread" or
+        None (serial). Returns (updated, removed) counts.
+        """
+        known = {path: (mtime, size) for path, mtime, size in
+                 self.db.execute("SELECT path, mtime, size FROM files")}
+        changed = []
+        seen = set()
+        for path, mtime, size in scan_documents(self.root):
+            seen.add(path)
+            if known.get(path) != (mtime, size):
+                changed.append((path, mtime, size))
+        removed = [path for path in known if path not in seen]
+
+        if parallel == "process" and len(changed) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_entry, changed, chunksize=8))
+        elif parallel == "thread" and len(changed) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_entry, changed))
+        else:
+            results = [_parse_entry(entry) for entry in changed]
+
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+            for path, mtime, size, parsed, error in results:
+                self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                if parsed is None:
+                    self.errors[path] = error
+                    continue
+                self.errors.pop(path, None)
+                self.store(path, mtime, size, parsed)
+        return len(results), len(removed)
+
+    def store(self, path, mtime, size, parsed):
+        """
+        Writes the parse result of one document (inside the caller's transaction).
+        """
+        bookmarks, links, media, paragraphs = parsed
+        file_id = self.db.execute("INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                                  (path, mtime, size)).lastrowid
+        self.db.executemany("INSERT INTO bookmarks (file_id, name) VALUES (?, ?)",
+                            [(file_id, name) for name in bookmarks])
+        self.db.executemany("INSERT INTO links (file_id, href, target_path, fragment, text) "
+                            "VALUES (?, ?, ?, ?, ?)", [(file_id,) + link for link in links])
+        self.db.executemany("INSERT INTO media (file_id, path) VALUES (?, ?)",
+                            [(file_id, media_path) for media_path in media])
+        self.db.executemany("INSERT INTO paragraph_text (file_id, bookmark, text) VALUES (?, ?, ?)",
+                            [(file_id,) + paragraph for paragraph in paragraphs])
+
+    # --- Queries ---
+    def documents_with_bookmark(self, name):
+        """
+        Returns the paths of the documents that contain bookmark name.
+        """
+        return [row[0] for row in self.db.execute(
+            "SELECT f.path FROM bookmarks b JOIN files f ON f.id = b.file_id WHERE b.name = ?", (name,))]
+
+    def bookmarks_with_prefix(self, prefix, limit=50):
+        """
+        Returns (name, path) pairs for bookmarks starting with prefix, using
+        the name index as a range scan.
+        """
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+        if upper is None:
+            query = ("SELECT b.name, f.path FROM bookmarks b JOIN files f ON f.id = b.file_id "
+                     "ORDER BY b.name LIMIT ?")
+            return self.db.execute(query, (limit,)).fetchall()
+        query = ("SELECT b.name, f.path FROM bookmarks b JOIN files f ON f.id = b.file_id "
+                 "WHERE b.name >= ? AND b.name < ? ORDER BY b.name LIMIT ?")
+        return self.db.execute(query, (prefix, upper, limit)).fetchall()
+
+    def links_to(self, target_path, fragment=None):
+        """
+        Returns (source path, href, text) for links pointing at target_path
+        (optionally at one of its bookmarks).
+        """
+        query = ("SELECT f.path, l.href, l.text FROM links l JOIN files f ON f.id = l.file_id "
+                 "WHERE l.target_path = ?")
+        params = [os.path.normpath(target_path)]
+        if fragment is not None:
+            query += " AND l.fragment = ?"
+            params.append(fragment)
+        return self.db.execute(query, params).fetchall()
+
+    def documents_using_media(self, media_path):
+        """
+        Returns the documents that link to the attachment at media_path.
+        """
+        return [row[0] for row in self.db.execute(
+            "SELECT DISTINCT f.path FROM media m JOIN files f ON f.id = m.file_id WHERE m.path = ?",
+            (os.path.normpath(media_path),))]
+
+    def search(self, text, limit=20):
+        """
+        Full-text search over all indexed paragraphs. Every word of text must
+        match (the last one as a prefix, for search-as-you-type). Returns
+        (document path, bookmark, snippet) tuples, best match first.
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        return self.db.execute(
+            "SELECT f.path, p.bookmark, snippet(paragraph_search, 0, '[', ']', '…', 12) "
+            "FROM paragraph_search JOIN paragraph_text p ON p.id = paragraph_search.rowid "
+            "JOIN files f ON f.id = p.file_id "
+            "WHERE paragraph_search MATCH ? ORDER BY rank LIMIT ?", (query, limit)).fetchall()
+
+    def stats(self):
+        """
+        Returns a dict with the number of indexed documents, bookmarks, links and media.
+        """
+        return {table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("files", "bookmarks", "links", "media", "paragraph_text")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the notes workspace index.")
+    parser.add_argument("root", help="notes folder to index")
+    parser.add_argument("--db", help=f"index file (default: <root>/{INDEX_FILENAME})")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    args = parser.parse_args(argv)
+    with NotesIndex(args.root, args.db) as index:
+        updated, removed = index.update(workers=args.workers)
+        print(f"{updated} documents re-indexed, {removed} removed.")
+        for path, error in index.errors.items():
+            print(f"  skipped {path}: {error}")
+        print(", ".join(f"{count} {table}" for table, count in index.stats().items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Outline export and import for bullet hierarchies.
+
+An outline is a sequence of OutlineItem tuples, one per paragraph:
+ - level: hierarchy level as the bullet macros see it (the first paragraph
+   is 0, the others their NumberingLevel + 1);
+ - numbering_level: the paragraph's list level, or None outside a list;
+ - text: the paragraph text;
+ - bookmarks: ((name, start, end), ...) character offsets in text;
+ - links: ((start, end, url, name), ...) hyperlinked ranges.
+
+Two file formats are written and read line by line, so large outlines
+stream through without being held in memory twice:
+ - JSON Lines (.jsonl): one item per line, a lossless round trip;
+ - Markdown (.md): nested "- " bullets (two spaces per list level), links as
+   [text](<url>) and bookmarks as <a id="name"></a> anchors. Anchors only
+   mark where a bookmark starts; on import, an anchor at the start of a
+   "Title:" line covers the title again, as the bullet macros do.
+   Paragraphs outside a list that start with spaces or "-" have those
+   characters backslash-escaped, so they are not read back as bullets.
+
+plan_outline_import turns an outline into an edit plan, so the whole
+outline is inserted by EditPlanExecutor in one batch.
+"""
+import json
+import re
+from collections import namedtuple
+
+from edit_plan import INSERT_BOOKMARK, INSERT_PARAGRAPH, SET_HYPERLINK, SET_STYLE, EditOp, link_url, title_of
+
+# Programmatic name of LibreOffice's first bullet list style.
+DEFAULT_LIST_STYLE = "List 1"
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+
+OutlineItem = namedtuple("OutlineItem", "level numbering_level text bookmarks links")
+
+_MARKDOWN_BULLET = re.compile(r"^( *)- (.*)$")
+_MARKDOWN_TOKEN = re.compile(
+    r'<a id="((?:[^"\\]|\\.)*)"></a>'                      # bookmark anchor
+    r'|\[((?:[^\]\\]|\\.)*)\]\(<((?:[^>\\]|\\.)*)>\)'        # [text](<url>)
+    r'|\\(.)'                                               # escaped character
+    r'|([^\\\[<]+|.)',                                      # plain text
+    re.S)
+_UNESCAPE = re.compile(r"\\(.)", re.S)
+
+
+def _escape(text, specials):
+    return "".join("\\" + ch if ch in specials else ch for ch in text)
+
+
+def _unescape(text):
+    return _UNESCAPE.sub(r"\1", text)
+
+
+# --- JSON Lines ---
+def write_jsonl(items, stream):
+    """
+    Writes items to stream, one JSON object per line. Returns the count.
+    """
+    count = 0
+    for item in items:
+        stream.write(json.dumps(item._asdict(), ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def read_jsonl(stream):
+    """
+    Yields the OutlineItem of every non-blank line of stream.
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        yield OutlineItem(record.get("level", 0), record.get("numbering_level"), record["text"],
+                          tuple(tuple(b) for b in record.get("bookmarks", ())),
+                          tuple(tuple(link) for link in record.get("links", ())))
+
+
+# --- Markdown ---
+def markdown_line(item):
+    """
+    Renders one item as a Markdown line. Outside a list, leading spaces and
+    a leading "-" are escaped so the line does not parse as a bullet.
+    """
+    starts = {}
+    for name, start, _ in item.bookmarks:
+        starts.setdefault(start, []).append(name)
+    links = {start: (end, url) for start, end, url, _ in item.links}
+
+    def anchors(position):
+        return "".join('<a id="' + _escape(name, '\\"') + '"></a>' for name in starts.get(position, ()))
+
+    parts = []
+    position = 0
+    text = item.text
+    leading = 0
+    if item.numbering_level is None:
+        leading = len(text) - len(text.lstrip(" "))
+        if text[leading:leading + 1] == "-":
+            leading += 1
+    while position < len(text):
+        parts.append(anchors(position))
+        if position in links:
+            end, url = links[position]
+            label = _escape(text[position:end], "\\[]<")
+            parts.append(f"[{label}](<" + _escape(url, "\\>") + ">)")
+            position = max(end, position + 1)
+        else:
+            parts.append(_escape(text[position], "\\[]<- " if position < leading else "\\[]<"))
+            position += 1
+    parts.append(anchors(len(text)))
+    line = "".join(parts)
+    if item.numbering_level is None:
+        return line
+    return "  " * item.numbering_level + "- " + line
+
+
+def write_markdown(items, stream):
+    """
+    Writes items to stream as Markdown lines. Returns the count.
+    """
+    count = 0
+    for item in items:
+        stream.write(markdown_line(item) + "\n")
+        count += 1
+    return count
+
+
+def parse_markdown_line(line, index=0):
+    """
+    Parses a line written by markdown_line back into an OutlineItem.
+    index is the line's position in the outline (0 makes it the root).
+    Only an unescaped "- " after the indentation makes a bullet; escaped
+    characters (such as a leading "\\-" or "\\ ") are unescaped.
+    """
+    bullet = _MARKDOWN_BULLET.match(line)
+    numbering_level = len(bullet.group(1)) // 2 if bullet else None
+    body = bullet.group(2) if bullet else line
+
+    text = []
+    length = 0
+    bookmarks = []
+    links = []
+    for match in _MARKDOWN_TOKEN.finditer(body):
+        anchor, label, url, escaped, plain = match.groups()
+        if anchor is not None:
+            bookmarks.append([_unescape(anchor), length])
+        elif label is not None:
+            label = _unescape(label)
+            links.append((length, length + len(label), _unescape(url), ""))
+            text.append(label)
+            length += len(label)
+        else:
+            piece = escaped if escaped is not None else plain
+            text.append(piece)
+            length += len(piece)
+    text = "".join(text)
+
+    title = title_of(text)
+    spans = tuple((name, start, len(title) if start == 0 and title else start) for name, start in bookmarks)
+    if index == 0:
+        level = 0
+    else:
+        level = (numbering_level or 0) + 1
+    return OutlineItem(level, numbering_level, text, spans, tuple(links))
+
+
+def read_markdown(stream):
+    """
+    Yields the OutlineItem of every non-blank line of stream.
+    """
+    index = 0
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        yield parse_markdown_line(line, index)
+        index += 1
+
+
+# --- Files ---
+def is_markdown(path):
+    return path.lower().endswith(MARKDOWN_SUFFIXES)
+
+
+def write_outline(items, path):
+    """
+    Streams items into path (Markdown for .md/.markdown, JSON Lines
+    otherwise). Returns the number of items written.
+    """
+    with open(path, "w", encoding="utf-8") as stream:
+        return write_markdown(items, stream) if is_markdown(path) else write_jsonl(items, stream)
+
+
+def read_outline(path):
+    """
+    Returns the items stored in path, in the format write_outline chose for it.
+    """
+    with open(path, encoding="utf-8") as stream:
+        return list(read_markdown(stream) if is_markdown(path) else read_jsonl(stream))
+
+
+# --- Import planning ---
+def plan_outline_import(items, before, doc_url, existing=(), list_style=DEFAULT_LIST_STYLE):
+    """
+    Plans the insertion of items as new paragraphs above paragraph before:
+    one paragraph per item, with its list style and level, bookmarks and
+    hyperlinks. Bookmarks named in existing (or repeated in items) are left
+    out, since Writer would silently rename them. Fragment-only links
+    ("#bookmark") are rewritten with doc_url, as the link macros write them.
+    """
+    plan = []
+    formatting = []
+    seen = set(existing)
+    for number, item in enumerate(items):
+        label = f"outline {number}"
+        text = item.text.replace("\r", " ").replace("\n", " ")
+        plan.append(EditOp(INSERT_PARAGRAPH, label, before, before, text))
+        if item.numbering_level is None:
+            style = (("NumberingStyleName", ""),)
+        else:
+            style = (("NumberingLevel", item.numbering_level), ("NumberingStyleName", list_style))
+        formatting.append(EditOp(SET_STYLE, label, 0, len(text), style))
+        for name, start, end in item.bookmarks:
+            if name in seen:
+                continue
+            seen.add(name)
+            formatting.append(EditOp(INSERT_BOOKMARK, label, start, end, name))
+        for start, end, url, name in item.links:
+            if url.startswith("#"):
+                url = link_url(doc_url, url[1:])
+            formatting.append(EditOp(SET_HYPERLINK, label, start, end, (url, name)))
+    return plan + formatting
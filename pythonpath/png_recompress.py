@@ -0,0 +1,131 @@
+"""
+Lossless PNG recompression for attached screenshots.
+
+Capture tools favour speed and write PNGs with light zlib compression.
+recompress_png() inflates the image data (the IDAT chunks), deflates it
+again at the highest level with a couple of zlib strategies, and rewrites
+the file with a single IDAT chunk when that is smaller. Pixels, filters
+and every other chunk stay byte-for-byte the same, so the result is
+lossless. zlib releases the GIL, so a burst of files recompresses in
+parallel on threads.
+"""
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+# Cumulative savings are recorded in this file in the attachment's note folder.
+STATS_FILENAME = ".attachment_stats.json"
+
+
+def read_chunks(data):
+    """
+    Returns the (type, payload) chunks of PNG data. Raises ValueError if
+    data is not a well-formed PNG.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    chunks = []
+    offset = len(PNG_SIGNATURE)
+    while offset < len(data):
+        if offset + 8 > len(data):
+            raise ValueError("truncated PNG chunk")
+        length, kind = struct.unpack(">I4s", data[offset:offset + 8])
+        payload = data[offset + 8:offset + 8 + length]
+        if len(payload) != length:
+            raise ValueError("truncated PNG chunk")
+        chunks.append((kind, payload))
+        offset += 12 + length
+        if kind == b"IEND":
+            break
+    return chunks
+
+
+def write_chunk(kind, payload):
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+
+def recompress_data(data):
+    """
+    Returns data with its image data deflated again as tightly as zlib
+    allows, or data itself when that is not smaller.
+    """
+    chunks = read_chunks(data)
+    image_data = b"".join(payload for kind, payload in chunks if kind == b"IDAT")
+    if not image_data:
+        return data
+    raw = zlib.decompress(image_data)
+    best = image_data
+    for strategy in STRATEGIES:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        candidate = compressor.compress(raw) + compressor.flush()
+        if len(candidate) < len(best):
+            best = candidate
+    if best is image_data:
+        return data
+
+    parts = [PNG_SIGNATURE]
+    idat_written = False
+    for kind, payload in chunks:
+        if kind == b"IDAT":
+            if not idat_written:
+                parts.append(write_chunk(b"IDAT", best))
+                idat_written = True
+            continue
+        parts.append(write_chunk(kind, payload))
+    result = b"".join(parts)
+    return result if len(result) < len(data) else data
+
+
+def recompress_png(path):
+    """
+    Recompresses the PNG at path in place (atomically, keeping its mtime),
+    unless that would not make it smaller. Returns the bytes saved.
+    """
+    with open(path, "rb") as stream:
+        data = stream.read()
+    try:
+        smaller = recompress_data(data)
+    except (ValueError, zlib.error):
+        return 0
+    if len(smaller) >= len(data):
+        return 0
+    stat = os.stat(path)
+    temp_path = path + ".recompress.tmp"
+    with open(temp_path, "wb") as stream:
+        stream.write(smaller)
+    os.utime(temp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(temp_path, path)
+    return len(data) - len(smaller)
+
+
+def recompress_pngs(paths, workers=None):
+    """
+    Recompresses every .png among paths concurrently. Returns {path: bytes saved}.
+    """
+    pngs = [path for path in paths if path.lower().endswith(".png")]
+    if len(pngs) < 2:
+        return {path: recompress_png(path) for path in pngs}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(pngs, pool.map(recompress_png, pngs)))
+
+
+def record_savings(folder, saved):
+    """
+    Adds saved ({path: bytes}) to the running totals kept in folder.
+    Returns the totals.
+    """
+    stats_path = os.path.join(folder, STATS_FILENAME)
+    try:
+        with open(stats_path, encoding="utf-8") as stream:
+            stats = json.load(stream)
+    except (OSError, ValueError):
+        stats = {}
+    stats["png_files_recompressed"] = stats.get("png_files_recompressed", 0) + sum(1 for v in saved.values() if v)
+    stats["png_bytes_saved"] = stats.get("png_bytes_saved", 0) + sum(saved.values())
+    with open(stats_path, "w", encoding="utf-8") as stream:
+        json.dump(stats, stream, indent=1)
+    return stats
@@ -0,0 +1,130 @@
+"""
+Finding the newest files across several source folders.
+
+FileManager picks up screenshots and documents from folders that can be
+slow: the VM share answers every stat with a network round trip. Each
+SourceRoot is scanned on its own thread, and a per-root stat cache keeps
+the mtimes of files seen less than STAT_CACHE_TTL seconds ago, so a
+repeated scan stats only the files that are new since the last one. The
+whole lookup has a latency budget: roots that have not answered by then
+(a hung mount) are abandoned, a scan stops statting when the budget runs
+out, and the best candidates found so far are returned.
+
+Each scan works on its own copy of the root's stat cache, and only scans
+that answered in time merge their copy back, so a scan still hanging on a
+dead mount never writes into a cache another scan is reading. Workers
+stuck that way are counted, and the pool is replaced once they would
+leave too few workers for the next lookup.
+"""
+import heapq
+import os
+import stat
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# path may start with "~"; extensions are lower-case suffixes such as ".png".
+SourceRoot = namedtuple("SourceRoot", "path extensions")
+
+STAT_CACHE_TTL = 30.0
+LATENCY_BUDGET = 2.0
+SCAN_WORKERS = 8
+
+# Kept across calls: a scan stuck on a dead mount must not block the next
+# macro run (a with-block would wait for it on exit).
+_POOL = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="source-scan")
+# Scans of _POOL that missed their deadline and may still hold a worker.
+_STUCK = set()
+_POOL_LOCK = threading.Lock()
+# Root folder -> {path: (mtime, time it was statted)}; read and replaced under _CACHE_LOCK.
+_STAT_CACHES = {}
+_CACHE_LOCK = threading.Lock()
+
+ScanResult = namedtuple("ScanResult", "files complete unreachable")
+
+
+def scan_root(root, deadline, ttl=STAT_CACHE_TTL, cache=None):
+    """
+    Returns ([(mtime, path), ...], complete, cache) for the matching files
+    of one root. complete is False if the deadline passed before every file
+    was statted. Mtimes in cache (the root's stat cache, which is not
+    modified) younger than ttl are reused; the returned cache is the updated
+    copy.
+    """
+    folder = os.path.expanduser(root.path)
+    cache = dict(cache or {})
+    now = time.monotonic()
+    with os.scandir(folder) as entries:
+        names = [entry.path for entry in entries if entry.name.lower().endswith(root.extensions)]
+    files = []
+    complete = True
+    for path in names:
+        cached = cache.get(path)
+        if cached and now - cached[1] < ttl:
+            files.append((cached[0], path))
+            continue
+        if time.monotonic() > deadline:
+            complete = False
+            continue
+        try:
+            info = os.stat(path)
+        except OSError:
+            continue
+        if stat.S_ISREG(info.st_mode):
+            cache[path] = (info.st_mtime, time.monotonic())
+            files.append((info.st_mtime, path))
+    live = set(names)
+    for path in [p for p in cache if p not in live]:
+        del cache[path]
+    return files, complete, cache
+
+
+def _scan_pool(jobs):
+    """
+    Returns the pool for a lookup of jobs roots. Scans stuck on a hung mount
+    cannot be cancelled; when they leave fewer than jobs workers free, the
+    pool is abandoned to them and a fresh one is started.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        _STUCK.difference_update([future for future in _STUCK if future.done()])
+        if SCAN_WORKERS - len(_STUCK) < min(jobs, SCAN_WORKERS):
+            _POOL.shutdown(wait=False)
+            _POOL = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="source-scan")
+            _STUCK.clear()
+        return _POOL
+
+
+def newest_across(roots, count=1, budget=LATENCY_BUDGET):
+    """
+    Scans roots concurrently and returns a ScanResult: files holds the
+    count newest matching paths, oldest first; complete is False if some
+    root was cut short by the budget; unreachable lists the roots that
+    failed or did not answer in time.
+    """
+    deadline = time.monotonic() + budget
+    pool = _scan_pool(len(roots))
+    with _CACHE_LOCK:
+        snapshots = {root: dict(_STAT_CACHES.get(os.path.expanduser(root.path), {})) for root in roots}
+    futures = {pool.submit(scan_root, root, deadline, cache=snapshots[root]): root for root in roots}
+    done, pending = wait(futures, timeout=budget)
+    with _POOL_LOCK:
+        if pool is _POOL:
+            _STUCK.update(pending)
+    candidates = []
+    complete = not pending
+    unreachable = [futures[f].path for f in pending]
+    for future in done:
+        try:
+            files, root_complete, cache = future.result()
+        except Exception:
+            # One failing root (unreadable folder, odd file names) leaves the others usable.
+            unreachable.append(futures[future].path)
+            continue
+        with _CACHE_LOCK:
+            _STAT_CACHES[os.path.expanduser(futures[future].path)] = cache
+        candidates.extend(files)
+        complete = complete and root_complete
+    newest = [path for _, path in sorted(heapq.nlargest(count, candidates))]
+    return ScanResult(newest, complete, unreachable)